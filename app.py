@@ -1,9 +1,20 @@
+import time
+SCRIPT_START = time.perf_counter()
+
 import streamlit as st
-import yfinance as yf
-import pandas_ta as ta
-import plotly.graph_objects as go
-import pandas as pd
-from datetime import datetime
+from datetime import datetime, timezone
+import os
+# Bare lette moduler her (numpy og standardbiblioteket): pandas, analysekjernen, yfinance og
+# plotly importeres først der de brukes, så første visning ikke venter på dem.
+# Måles med scripts/bench_startup.py.
+from engine import DATA_DIR
+from engine.alerts import AlertEngine, AlertLog
+from engine.cache import SharedCache, SharedSnapshotStore, default_backend
+from engine.fundamentals import FundamentalsService
+from engine.metrics import METRICS
+from engine.scheduler import OSLO, Refresher, daily_version, is_open
+from engine.signals import SIGNALS
+from engine.universe import DEFAULT as DEFAULT_UNIVERSE, WATCHLIST, UniverseStore
 
 # ============================================
 # 1. KONFIGURASJON
@@ -18,6 +29,21 @@ if 'selected_ticker' not in st.session_state:
     st.session_state.selected_ticker = None
 if 'view' not in st.session_state:
     st.session_state.view = 'Dashboard'
+if 'interval' not in st.session_state:
+    st.session_state.interval = '1d'
+if 'universe' not in st.session_state:
+    st.session_state.universe = DEFAULT_UNIVERSE
+# Resultattabellen og grafen: side, filtre og valg. Widgetverdiene tilordnes på nytt ved
+# hver kjøring, så de beholdes når en visning uten widgeten vises
+for key, default in (("tbl_page", 0), ("tbl_signals", ["BUY", "HOLD", "SELL"]), ("tbl_desc", True),
+                     ("chart_range", "3M"), ("chart_overlays", []), ("pf_capital", 100_000), ("pf_risk", 1.0),
+                     ("pf_open", False)):
+    if key not in st.session_state:
+        st.session_state[key] = default
+for key in ("tbl_signals", "tbl_search", "tbl_sort", "tbl_desc", "chart_range", "chart_overlays",
+            "pf_capital", "pf_risk", "pf_open"):
+    if key in st.session_state:
+        st.session_state[key] = st.session_state[key]
 
 # ============================================
 # 2. DESIGN
@@ -272,100 +298,172 @@ st.markdown("""
 # ============================================
 # 3. DATA MOTOR
 # ============================================
-watchlist = [
-    "NOD.OL", "SATS.OL", "KID.OL", "VAR.OL", "PROT.OL", "AKSO.OL", "NEL.OL", 
-    "FRO.OL", "GOGL.OL", "NAS.OL", "DNB.OL", "EQNR.OL", "YAR.OL", "NHY.OL", 
-    "MOWI.OL", "SUBC.OL", "TGS.OL", "AKRBP.OL", "ADE.OL", "IDEX.OL", "AUTO.OL", 
-    "LSG.OL", "SALM.OL", "BAKK.OL", "TOM.OL", "KOG.OL", "BORR.OL", "OKEA.OL"
-]
-
-@st.cache_data(ttl=1800)
-def fetch_and_analyze():
-    results = []
-    for t in watchlist:
-        try:
-            df = yf.download(t, period="1y", interval="1d", progress=False)
-            if df.empty or len(df) < 60: continue
-            if isinstance(df.columns, pd.MultiIndex): df.columns = df.columns.droplevel(1)
-            
-            close = float(df['Close'].iloc[-1])
-            prev_close = float(df['Close'].iloc[-2])
-            change_pct = ((close - prev_close) / prev_close) * 100
-            
-            rsi = ta.rsi(df['Close'], length=14).iloc[-1]
-            sma20 = ta.sma(df['Close'], length=20).iloc[-1]
-            sma50 = ta.sma(df['Close'], length=50).iloc[-1]
-            atr = ta.atr(df['High'], df['Low'], df['Close'], length=14).iloc[-1]
-            ema12 = ta.ema(df['Close'], length=12).iloc[-1]
-            ema26 = ta.ema(df['Close'], length=26).iloc[-1]
-            
-            if pd.isna(rsi) or pd.isna(sma20) or pd.isna(atr): continue
-            
-            # Finn target
-            recent_highs = df['High'].tail(60).values
-            resistance = [recent_highs[i] for i in range(1, len(recent_highs)-1) 
-                         if recent_highs[i] > recent_highs[i-1] and recent_highs[i] > recent_highs[i+1]]
-            above = [r for r in resistance if r > close]
-            target = min(above) if above else close * 1.10
-            
-            stop_loss = close - (2 * atr)
-            pot_kr = target - close
-            pot_pct = (pot_kr / close) * 100
-            risk_kr = close - stop_loss
-            risk_pct = (risk_kr / close) * 100
-            
-            five_day = (close / float(df['Close'].iloc[-5])) - 1 if len(df) >= 5 else 0
-            
-            # Signal-logikk
-            is_buy = (rsi < 55 and close > sma20 and close > sma50 and ema12 > ema26 and five_day > 0)
-            is_sell = rsi > 75 or (close < sma20 and close < sma50)
-            signal = "BUY" if is_buy else "SELL" if is_sell else "HOLD"
-            
-            # Sannsynlighet beregning - basert på ALLE faktorer
-            # Teller hvor mange bullish-kriterier som er oppfylt
-            bullish_score = 0
-            if rsi < 55: bullish_score += 20  # RSI i kjøpssone
-            if rsi < 45: bullish_score += 10  # Ekstra bonus for lav RSI
-            if close > sma20: bullish_score += 15  # Over SMA20
-            if close > sma50: bullish_score += 15  # Over SMA50
-            if ema12 > ema26: bullish_score += 15  # Bullish EMA crossover
-            if five_day > 0: bullish_score += 10  # Positiv momentum
-            if five_day > 0.02: bullish_score += 5  # Sterk momentum (+2%)
-            if pot_pct > 5: bullish_score += 10  # God oppside
-            
-            # BUY-signal gir bonus, SELL gir straff
-            if signal == "BUY":
-                prob = min(bullish_score + 15, 95)  # Bonus for å møte alle kriterier
-            elif signal == "SELL":
-                prob = max(bullish_score - 30, 10)  # Straff for salgssignal
-            else:
-                prob = max(bullish_score - 10, 20)  # Litt lavere for HOLD
-            
-            results.append({
-                "ticker": t, "ticker_short": t.replace('.OL', ''),
-                "pris": round(close, 2), "endring": round(change_pct, 2), "rsi": round(rsi, 1),
-                "signal": signal, "target": round(target, 2), "stop_loss": round(stop_loss, 2),
-                "pot_kr": round(pot_kr, 2), "pot_pct": round(pot_pct, 1),
-                "risk_kr": round(risk_kr, 2), "risk_pct": round(risk_pct, 1),
-                "prob": prob, "df": df
-            })
-        except: continue
-    
-    # Sorter etter sannsynlighet (høyest først), prioriter BUY
-    # Sortering: 1) Signal (BUY først), 2) Sannsynlighet (høyest), 3) Gevinstpotensial (høyest)
-    return sorted(results, key=lambda x: (
-        0 if x['signal'] == 'BUY' else 1 if x['signal'] == 'HOLD' else 2,
-        -x['prob'],
-        -x['pot_pct']
-    ))
+@st.cache_resource
+def get_universes():
+    # Navngitte tickerlister (python -m engine.universe import ...); standardlisten er de 28 faste
+    return UniverseStore().ensure(DEFAULT_UNIVERSE, WATCHLIST)
+
+universes = get_universes()
+
+@st.cache_resource
+def get_engine():
+    # Analysekjernen (pandas, indikatorer, nedlasting) importeres og bygges først her: i tråden
+    # som kjører første analyse, eller når en graf åpnes. Dashboardet tegnes fra siste snapshot.
+    from engine.prices import default_loader
+    from engine.screener import Screener
+    from engine.streaming import IncrementalIndicators
+
+    loader = default_loader()
+    return loader, Screener(loader, IncrementalIndicators(), get_universes())
+
+# Prometheus-tekst for lokal skraping (textfile-collector); ?diag=1 viser diagnosepanelet
+METRICS_PATH = os.path.join(DATA_DIR, "metrics.prom")
+METRICS_EVERY = 30  # sekunder mellom skrivinger fra reruns (analysen skriver i tillegg etter hver kjøring)
+# Signalskifter, sannsynlighetskryss og stop/target-treff mellom to snapshots
+alert_log = AlertLog()
+
+@st.cache_resource
+def get_fundamentals():
+    # Én delt cache for alle økter; innsidehandel/eiere/nyheter har egne TTL-er
+    return FundamentalsService()
+
+fundamentals = get_fundamentals()
+
+def fetch_and_analyze(name=DEFAULT_UNIVERSE):
+    # Selve analysen ligger i engine.screener (også brukt av kommandolinjen og cron).
+    # Listen deles i shards som lastes og analyseres parallelt, og radene samles i en
+    # kompakt kolonnetabell rangert på 1) Signal (BUY først), 2) Sannsynlighet, 3) Gevinstpotensial
+    _, screener = get_engine()
+    result = screener.run(name)
+    METRICS.write(METRICS_PATH)
+    return result
+
+SNAPSHOT_VERSION = 4  # økes når formatet på resultatet fra fetch_and_analyze endres
+
+# Delt mellom prosesser og replikaer (KMAN_CACHE: SQLite i DATA_DIR, eller redis://…):
+# snapshots per liste og nedlastede dagsbars, med versjonerte nøkler
+snapshot_cache = SharedCache(default_backend(), "snapshot", SNAPSHOT_VERSION)
+bars_cache = SharedCache(default_backend(), "bars")
+
+@st.cache_resource
+def seen_generation():
+    return {"bars": bars_cache.generation()}
+
+# «Oppdater» i en annen replika øker generasjonen; tøm de lokale cachene her også
+generation = bars_cache.generation()
+if seen_generation()["bars"] != generation:
+    seen_generation()["bars"] = generation
+    fundamentals.clear()
+
+@st.cache_resource
+def get_refresher(name):
+    # Analysen kjøres i en bakgrunnstråd etter børsens åpningstider; siden leser siste snapshot.
+    # Ett snapshot og én tråd per liste, startet første gang listen vises. Snapshotet er delt,
+    # og bare én replika kjører analysen om gangen (single-flight); de andre bruker resultatet.
+    # Hvert nye snapshot sammenlignes med forrige, og endringene blir varsler.
+    store = SharedSnapshotStore(snapshot_cache, name)
+    alerts = AlertEngine(name, alert_log)
+    return Refresher(lambda: fetch_and_analyze(name), store, on_publish=alerts.on_publish).start()
+
+@st.cache_resource
+def get_intraday(interval):
+    # Ringbuffer og indikatorer per ticker i minnet; hver tick henter bare nye bars
+    from engine.intraday import IntradayScreener
+    from engine.prices import default_loader
+
+    return IntradayScreener(default_loader(), interval)
+
+@st.cache_resource
+def get_risk_model(name):
+    # Løpende summer per liste: nye dager legges til, dager som faller ut av vinduet trekkes fra
+    from engine.portfolio import RiskModel
+
+    return RiskModel()
+
+@st.cache_resource(max_entries=8)
+def portfolio_risk(name, version, tickers):
+    # Korrelasjon/kovarians fra de lagrede dagsbarene, én gang per liste og dagsversjon
+    # (daily_version: en gang per handelsdag og igjen etter sluttkurs, ikke ved hver intradagstick)
+    from engine.panel import PricePanel
+    from engine.prices import period_start
+
+    price_loader, _ = get_engine()
+    frames = price_loader.store.read_many(list(tickers), period_start("1y"))
+    return get_risk_model(name).update(PricePanel.from_frames(frames, list(tickers)))
+
+STATUS_LIMIT = 50  # tickere som listes i statusboksen
+ALERT_LIMIT = 10  # siste varsler i sidepanelet
+
+INTERVALS = {"1d": "Dag", "5m": "5 min", "15m": "15 min", "60m": "60 min"}
+
+PAGE_SIZE = 25
+SIGNAL_LABELS = {"BUY": "Kjøp", "HOLD": "Hold", "SELL": "Selg"}
+SORT_FIELDS = {"rank": "Rangering", "prob": "Sannsynlighet", "pot_pct": "Gevinstpotensial %",
+               "risk_pct": "Risiko %", "rs_rank": "Relativ styrke", "rs_sektor": "Relativ styrke i sektor",
+               "rs_3m": "Mot OSEBX 3 mnd", "rsi": "RSI", "endring": "Endring %", "pris": "Pris", "ticker": "Ticker"}
+TABLE_COLUMNS = {"ticker_short": "Ticker", "signal": "Signal", "prob": "Sannsynlighet", "pris": "Pris",
+                 "endring": "Endring %", "rsi": "RSI", "pot_pct": "Potensial %", "risk_pct": "Risiko %",
+                 "target": "Target", "stop_loss": "Stop", "trend_uke": "Uke", "trend_mnd": "Måned",
+                 "rs_3m": "Mot OSEBX 3m %", "rs_rank": "RS-rang", "rs_sektor": "RS sektor"}
+POSITION_COLUMNS = {"ticker": "Ticker", "sektor": "Sektor", "pris": "Pris", "aksjer": "Aksjer",
+                    "verdi": "Verdi (kr)", "vekt": "Vekt %", "risiko": "Risiko (kr)"}
+EXPOSURE_COLUMNS = {"verdi": "Verdi (kr)", "risiko": "Risiko (kr)", "andel": "Andel %"}
+TREND_MARKS = {1.0: "✓", 0.0: "✗"}  # trend bekreftet på uke/måned (tom = for kort historikk)
+
+def reset_page():
+    st.session_state.tbl_page = 0
+
+def open_from_table():
+    st.session_state.selected_ticker = st.session_state.tbl_open
+    st.session_state.tbl_open = None
+
+def set_universe():
+    st.session_state.universe = st.session_state.universe_choice
+    reset_page()
+
+def set_interval():
+    # Valget lagres utenfor widgeten, så det overlever visninger der velgeren ikke tegnes
+    st.session_state.interval = st.session_state.interval_choice
+
+@st.cache_resource(max_entries=32)
+def chart_figure(ticker, interval, version, period, overlays, stop_loss, target):
+    # Figuren bygges én gang per ticker, dataversjon (snapshot-tid) og valg; reruns gjenbruker den.
+    # Prishistorikk leses fra lageret (eller intradagsbufferen) først her, og plotly importeres her.
+    from engine.charts import LOAD_PERIOD, build_figure
+
+    METRICS.incr("chart_builds")
+    if interval != '1d':
+        df = get_intraday(interval).history(ticker, get_intraday(interval).capacity)
+        period = "max"
+    else:
+        price_loader, _ = get_engine()
+        df = price_loader.history(ticker, LOAD_PERIOD.get(period, period))
+    return build_figure(df, stop_loss, target, period, overlays)
 
 # ============================================
 # 4. HOVEDINNHOLD
 # ============================================
-data = fetch_and_analyze()
+if st.session_state.universe not in universes.names():
+    st.session_state.universe = DEFAULT_UNIVERSE
+watchlist = universes.get(st.session_state.universe)
+refresher = get_refresher(st.session_state.universe)
+if st.session_state.interval == '1d':
+    with st.spinner("Henter og analyserer kurser..."):
+        snapshot = refresher.latest()
+    data, failed, stale = snapshot.result if snapshot else (None, {}, {})
+    updated_at = snapshot.created if snapshot else None
+else:
+    # Intradag: nye bars hentes og endrede tickere evalueres på nytt ved hver tick
+    intraday = get_intraday(st.session_state.interval)
+    with st.spinner("Henter nye bars..."):
+        data, failed, stale = intraday.tick(watchlist)
+    updated_at = intraday.updated
 
 if not data:
     st.warning("Kunne ikke hente data. Børsen kan være stengt.")
+    if st.session_state.interval != '1d' and st.button("Tilbake til dagsbars"):
+        st.session_state.interval = '1d'
+        st.rerun()
     st.stop()
 
 c_main, c_side = st.columns([3, 1])
@@ -376,10 +474,33 @@ with c_main:
         h1, h2 = st.columns([3, 1])
         with h1:
             st.markdown("<h1 style='font-size: 2.2rem; font-weight: 800; margin-bottom: 8px;'>Oversikt</h1>", unsafe_allow_html=True)
+            st.radio("Tidsramme", list(INTERVALS), index=list(INTERVALS).index(st.session_state.interval),
+                     format_func=INTERVALS.get, horizontal=True, label_visibility="collapsed",
+                     key="interval_choice", on_change=set_interval)
+            names = universes.names()
+            if len(names) > 1:
+                st.selectbox("Liste", names, index=names.index(st.session_state.universe),
+                             label_visibility="collapsed", key="universe_choice", on_change=set_universe)
         with h2:
             if st.button("🔄 Oppdater", use_container_width=True):
-                st.cache_data.clear()
+                # Gjelder alle replikaer: delte bars blir ugyldige, og de andre tømmer sine lokale cacher
+                bars_cache.invalidate()
+                seen_generation()["bars"] = bars_cache.generation()
+                fundamentals.clear()
+                with st.spinner("Oppdaterer..."):
+                    try:
+                        if st.session_state.interval == '1d':
+                            refresher.refresh()
+                        else:
+                            intraday.tick(watchlist, force=True)
+                        METRICS.incr("manual_refreshes", outcome="ok")
+                    except Exception as e:
+                        # Forrige snapshot vises fortsatt; meldingen vises etter st.rerun
+                        METRICS.incr("manual_refreshes", outcome="feil")
+                        st.session_state.refresh_error = f"{type(e).__name__}: {e}"
                 st.rerun()
+            if error := st.session_state.pop("refresh_error", None):
+                st.warning(f"Oppdateringen feilet, viser forrige data. {error}")
         
         # Profilkort
         st.markdown("""
@@ -395,9 +516,8 @@ with c_main:
         """, unsafe_allow_html=True)
         
         # Status-kort
-        buys = len([d for d in data if d['signal'] == 'BUY'])
-        holds = len([d for d in data if d['signal'] == 'HOLD'])
-        sells = len([d for d in data if d['signal'] == 'SELL'])
+        counts = data.counts()
+        buys, holds, sells = counts['BUY'], counts['HOLD'], counts['SELL']
         
         s1, s2, s3 = st.columns(3)
         with s1:
@@ -411,9 +531,10 @@ with c_main:
         st.markdown("<h2 style='font-size: 1.5rem; font-weight: 800;'>🎯 Dagens Muligheter</h2>", unsafe_allow_html=True)
         st.markdown("<p style='color: #6b7280; margin-bottom: 24px;'>Sortert etter høyest sannsynlighet</p>", unsafe_allow_html=True)
         
-        # Aksjekort
+        # Aksjekort: bare de seks beste velges ut, resten sorteres ikke
+        top = data.top(6)
         cols = st.columns(2)
-        for i, stock in enumerate(data[:6]):
+        for i, stock in enumerate(top):
             with cols[i % 2]:
                 badge_class = "badge-buy" if stock['signal'] == "BUY" else "badge-sell" if stock['signal'] == "SELL" else "badge-hold"
                 badge_text = "KJØP" if stock['signal'] == "BUY" else "SELG" if stock['signal'] == "SELL" else "HOLD"
@@ -471,9 +592,96 @@ with c_main:
                 </div>
                 """, unsafe_allow_html=True)
 
+        # Alle resultater: filtreres og sorteres på kolonnene, og bare siden som vises blir rader
+        st.markdown("<br>", unsafe_allow_html=True)
+        st.markdown("<h2 style='font-size: 1.5rem; font-weight: 800;'>📋 Alle resultater</h2>", unsafe_allow_html=True)
+        f1, f2, f3, f4 = st.columns([2, 2, 2, 1])
+        with f1:
+            signals = st.multiselect("Signal", SIGNALS, key="tbl_signals",
+                                     format_func=SIGNAL_LABELS.get, on_change=reset_page)
+        with f2:
+            search = st.text_input("Søk", key="tbl_search", placeholder="Ticker", on_change=reset_page)
+        with f3:
+            sort = st.selectbox("Sorter etter", list(SORT_FIELDS), key="tbl_sort",
+                                format_func=SORT_FIELDS.get, on_change=reset_page)
+        with f4:
+            descending = st.toggle("Synkende", key="tbl_desc", on_change=reset_page)
+        query = dict(signals=signals, search=search, sort=None if sort == "rank" else sort,
+                     descending=descending, size=PAGE_SIZE)
+        page_rows, total = data.query(page=st.session_state.tbl_page, **query)
+        pages = max(1, -(-total // PAGE_SIZE))
+        if st.session_state.tbl_page >= pages:
+            # Færre treff enn før (ny liste eller oppdatering): gå til siste side
+            st.session_state.tbl_page = pages - 1
+            page_rows, total = data.query(page=st.session_state.tbl_page, **query)
+        if page_rows:
+            import pandas as pd  # først her: kortene over er allerede tegnet
+
+            page_frame = pd.DataFrame(page_rows, columns=list(TABLE_COLUMNS))
+            for column in ("trend_uke", "trend_mnd"):
+                page_frame[column] = page_frame[column].map(TREND_MARKS)
+            st.dataframe(page_frame.rename(columns=TABLE_COLUMNS), use_container_width=True, hide_index=True)
+        else:
+            st.info("Ingen treff.")
+        n1, n2, n3, n4 = st.columns([1, 2, 1, 2])
+        with n1:
+            if st.button("◀", disabled=st.session_state.tbl_page == 0, use_container_width=True):
+                st.session_state.tbl_page -= 1
+                st.rerun()
+        with n2:
+            st.caption(f"Side {st.session_state.tbl_page + 1} av {pages} · {total} treff")
+        with n3:
+            if st.button("▶", disabled=st.session_state.tbl_page >= pages - 1, use_container_width=True):
+                st.session_state.tbl_page += 1
+                st.rerun()
+        with n4:
+            st.selectbox("Åpne analyse", [r['ticker'] for r in page_rows], index=None,
+                         placeholder="Åpne analyse …", label_visibility="collapsed",
+                         key="tbl_open", on_change=open_from_table)
+
+        # Porteføljerisiko: posisjonsstørrelser for kjøpssignalene, sektorer og korrelerte klynger.
+        # Regnes bare når seksjonen er åpen, så første visning ikke importerer pandas og analysekjernen
+        st.markdown("<br>", unsafe_allow_html=True)
+        st.markdown("<h2 style='font-size: 1.5rem; font-weight: 800;'>📊 Porteføljerisiko</h2>", unsafe_allow_html=True)
+        if st.toggle("Vis posisjoner, sektorer og korrelasjon", key="pf_open"):
+            from engine.portfolio import CLUSTER_CORR, WINDOW, cluster_report, position_sizes, sector_exposure
+
+            k1, k2 = st.columns(2)
+            with k1:
+                capital = st.number_input("Kapital (kr)", min_value=0, step=10_000, key="pf_capital")
+            with k2:
+                risk_pct = st.number_input("Risiko per handel %", min_value=0.1, max_value=10.0, step=0.25, key="pf_risk")
+            sizes = position_sizes(data, capital, risk_pct)
+            if sizes.empty:
+                st.info("Ingen kjøpssignaler å fordele kapital på.")
+            else:
+                risk = portfolio_risk(st.session_state.universe, daily_version(updated_at),
+                                      tuple(data.ticker))
+                st.dataframe(sizes.assign(ticker=sizes["ticker"].str.replace(".OL", ""), vekt=sizes["vekt"] * 100)
+                             .rename(columns=POSITION_COLUMNS).round(2), use_container_width=True, hide_index=True)
+                invested, total_risk = sizes["verdi"].sum(), sizes["risiko"].sum()
+                volatility = risk.portfolio_volatility(dict(zip(sizes["ticker"], sizes["verdi"])))
+                st.caption(f"Investert {invested:.0f} kr ({invested / capital * 100 if capital else 0:.0f} %) · "
+                           f"risiko ved stop {total_risk:.0f} kr · volatilitet {volatility:.0f} kr/år "
+                           f"(korrelasjon over siste {WINDOW} dager)")
+                for cluster in cluster_report(risk, sizes, capital):
+                    names = ", ".join(t.replace(".OL", "") for t in cluster["tickere"])
+                    st.warning(f"Korrelert klynge: {names} (korrelasjon ≥ {cluster['min_korrelasjon']:.2f}) · "
+                               f"samlet risiko {cluster['risiko']:.0f} kr ({cluster['risiko_pct']:.1f} % av kapitalen)")
+                exposure = sector_exposure(sizes)
+                st.dataframe(exposure.assign(andel=exposure["andel"] * 100).rename(columns=EXPOSURE_COLUMNS).round(1),
+                             use_container_width=True)
+                matrix = risk.frame(sizes["ticker"])
+                matrix.index = matrix.columns = [t.replace(".OL", "") for t in matrix.columns]
+                with st.expander(f"Korrelasjon mellom kjøpssignalene (klynge ved ≥ {CLUSTER_CORR})"):
+                    st.dataframe(matrix.round(2), use_container_width=True)
+
+        # Varm opp innsidedata og nyheter for kortene i bakgrunnen
+        fundamentals.prefetch([stock['ticker'] for stock in top])
+
     # Analyse-visning
     elif st.session_state.selected_ticker:
-        stock = next((d for d in data if d['ticker'] == st.session_state.selected_ticker), None)
+        stock = data.find(st.session_state.selected_ticker)
         if not stock:
             st.error("Fant ikke aksjen")
             st.stop()
@@ -500,181 +708,241 @@ with c_main:
         with i5:
             st.markdown(f'<div class="info-box"><div class="info-value">{stock["prob"]}%</div><div class="info-label">Sannsynlighet</div></div>', unsafe_allow_html=True)
         
-        # Tabs for ulike seksjoner
-        tab1, tab2, tab3, tab4 = st.tabs(["📈 Graf & Analyse", "📋 Handelsplan", "👤 Innsidehandel", "📰 Nyheter"])
+        # Seksjoner: bare den valgte tegnes, så innsidedata og nyheter
+        # hentes først når de faktisk vises (st.tabs kjører alle fanene)
+        sections = ["📈 Graf & Analyse", "📋 Handelsplan", "👤 Innsidehandel", "📰 Nyheter"]
+        SECTION_NAMES = ["graf", "handelsplan", "innsidehandel", "nyheter"]
+        section = st.radio("Seksjon", sections, horizontal=True, label_visibility="collapsed", key="section")
         
-        with tab1:
-            # Graf
-            df_p = stock['df'].tail(90)
-            fig = go.Figure(data=[go.Candlestick(
-                x=df_p.index, open=df_p['Open'], high=df_p['High'], low=df_p['Low'], close=df_p['Close'],
-                increasing_line_color='#22c55e', decreasing_line_color='#ef4444'
-            )])
-            fig.add_hline(y=stock['stop_loss'], line_dash="dash", line_color="#ef4444", annotation_text=f"Stop: {stock['stop_loss']:.2f}")
-            fig.add_hline(y=stock['target'], line_dash="dash", line_color="#22c55e", annotation_text=f"Target: {stock['target']:.2f}")
-            fig.update_layout(height=450, xaxis_rangeslider_visible=False, template="plotly_white", margin=dict(l=0,r=0,t=20,b=0))
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # Teknisk analyse forklaring
-            st.markdown("### 🔍 Teknisk Analyse")
+        # Tidsspenn per seksjon (diagnosepanelet viser hvor tiden går)
+        with METRICS.span("seksjon", section=SECTION_NAMES[sections.index(section)]):
+            if section == sections[0]:
+                # Graf (grafmodulen og plotly lastes først når grafen vises)
+                from engine.charts import OVERLAYS, RANGES
+
+                if st.session_state.interval == '1d':
+                    st.radio("Periode", list(RANGES), horizontal=True, label_visibility="collapsed", key="chart_range")
+                st.multiselect("Overlegg", OVERLAYS, key="chart_overlays", placeholder="Overlegg (SMA, EMA, ATR, RSI)",
+                               label_visibility="collapsed")
+                with METRICS.span("graf_figur"):
+                    fig = chart_figure(stock['ticker'], st.session_state.interval, updated_at,
+                                       RANGES[st.session_state.chart_range], tuple(st.session_state.chart_overlays),
+                                       stock['stop_loss'], stock['target'])
+                with METRICS.span("graf_tegning"):
+                    st.plotly_chart(fig, use_container_width=True)
+                if fig.layout.meta and fig.layout.meta.get("resolution"):
+                    st.caption(f"Vist som {fig.layout.meta['resolution']}sbars for å holde grafen lett")
+                
+                # Teknisk analyse forklaring
+                st.markdown("### 🔍 Teknisk Analyse")
             
-            if stock['signal'] == "BUY":
-                st.success(f"""
-                **Kjøpssignal identifisert** for {stock['ticker_short']}
+                if stock['signal'] == "BUY":
+                    st.success(f"""
+                    **Kjøpssignal identifisert** for {stock['ticker_short']}
                 
-                Aksjen oppfyller alle kriterier for et kjøpssignal:
-                - ✅ RSI ({stock['rsi']:.1f}) er under 55 - ikke overkjøpt
-                - ✅ Pris er over SMA20 og SMA50 - positiv trend
-                - ✅ EMA12 er over EMA26 - bullish momentum
-                - ✅ Positiv utvikling siste 5 dager
-                """)
-            elif stock['signal'] == "SELL":
-                st.error(f"""
-                **Salgssignal identifisert** for {stock['ticker_short']}
+                    Aksjen oppfyller alle kriterier for et kjøpssignal:
+                    - ✅ RSI ({stock['rsi']:.1f}) er under 55 - ikke overkjøpt
+                    - ✅ Pris er over SMA20 og SMA50 - positiv trend
+                    - ✅ EMA12 er over EMA26 - bullish momentum
+                    - ✅ Positiv utvikling siste 5 dager
+                    """)
+                elif stock['signal'] == "SELL":
+                    st.error(f"""
+                    **Salgssignal identifisert** for {stock['ticker_short']}
                 
-                Tekniske indikatorer viser svakhet:
-                - ⚠️ RSI kan være overkjøpt (>{stock['rsi']:.1f})
-                - ⚠️ Pris kan være under viktige støttenivåer
-                """)
-            else:
-                st.warning(f"""
-                **Hold/Avvent** for {stock['ticker_short']}
+                    Tekniske indikatorer viser svakhet:
+                    - ⚠️ RSI kan være overkjøpt (>{stock['rsi']:.1f})
+                    - ⚠️ Pris kan være under viktige støttenivåer
+                    """)
+                else:
+                    st.warning(f"""
+                    **Hold/Avvent** for {stock['ticker_short']}
                 
-                Aksjen mangler klar retning. Noen, men ikke alle kriterier er oppfylt.
-                Avvent bekreftet breakout før du handler.
-                """)
+                    Aksjen mangler klar retning. Noen, men ikke alle kriterier er oppfylt.
+                    Avvent bekreftet breakout før du handler.
+                    """)
         
-        with tab2:
-            st.markdown("### 📋 Handelsplan")
+            elif section == sections[1]:
+                st.markdown("### 📋 Handelsplan")
             
-            p1, p2, p3 = st.columns(3)
-            with p1:
-                st.markdown(f'<div class="info-box"><div class="info-value">{stock["pris"]:.2f} kr</div><div class="info-label">Anbefalt Inngang</div></div>', unsafe_allow_html=True)
-            with p2:
-                st.markdown(f'<div class="info-box"><div class="info-value negative">{stock["stop_loss"]:.2f} kr</div><div class="info-label">Stop Loss (2x ATR)</div></div>', unsafe_allow_html=True)
-            with p3:
-                st.markdown(f'<div class="info-box"><div class="info-value positive">{stock["target"]:.2f} kr</div><div class="info-label">Teknisk Target</div></div>', unsafe_allow_html=True)
+                p1, p2, p3 = st.columns(3)
+                with p1:
+                    st.markdown(f'<div class="info-box"><div class="info-value">{stock["pris"]:.2f} kr</div><div class="info-label">Anbefalt Inngang</div></div>', unsafe_allow_html=True)
+                with p2:
+                    st.markdown(f'<div class="info-box"><div class="info-value negative">{stock["stop_loss"]:.2f} kr</div><div class="info-label">Stop Loss (2x ATR)</div></div>', unsafe_allow_html=True)
+                with p3:
+                    st.markdown(f'<div class="info-box"><div class="info-value positive">{stock["target"]:.2f} kr</div><div class="info-label">Teknisk Target</div></div>', unsafe_allow_html=True)
             
-            st.markdown("<br>", unsafe_allow_html=True)
+                st.markdown("<br>", unsafe_allow_html=True)
             
-            # R:R Ratio
-            rr_ratio = stock['pot_kr'] / stock['risk_kr'] if stock['risk_kr'] > 0 else 0
-            rr_color = "#22c55e" if rr_ratio >= 2 else "#f59e0b" if rr_ratio >= 1 else "#ef4444"
-            rr_status = "✅ God" if rr_ratio >= 2 else "⚠️ Moderat" if rr_ratio >= 1 else "❌ Lav"
+                # R:R Ratio
+                rr_ratio = stock['pot_kr'] / stock['risk_kr'] if stock['risk_kr'] > 0 else 0
+                rr_color = "#22c55e" if rr_ratio >= 2 else "#f59e0b" if rr_ratio >= 1 else "#ef4444"
+                rr_status = "✅ God" if rr_ratio >= 2 else "⚠️ Moderat" if rr_ratio >= 1 else "❌ Lav"
             
-            r1, r2 = st.columns(2)
-            with r1:
-                st.markdown(f"""
-                <div class="info-box">
-                    <div class="info-value" style="color: {rr_color};">{rr_ratio:.2f}</div>
-                    <div class="info-label">Risiko/Belønning Ratio</div>
-                    <div style="font-size: 0.8rem; color: #6b7280; margin-top: 4px;">{rr_status} · Anbefalt: over 2.0</div>
-                </div>
-                """, unsafe_allow_html=True)
-            with r2:
-                st.markdown(f"""
-                <div class="info-box">
-                    <div class="info-value">3-6 uker</div>
-                    <div class="info-label">Tidsestimat (Swing)</div>
-                </div>
-                """, unsafe_allow_html=True)
+                r1, r2, r3 = st.columns(3)
+                with r1:
+                    st.markdown(f"""
+                    <div class="info-box">
+                        <div class="info-value" style="color: {rr_color};">{rr_ratio:.2f}</div>
+                        <div class="info-label">Risiko/Belønning Ratio</div>
+                        <div style="font-size: 0.8rem; color: #6b7280; margin-top: 4px;">{rr_status} · Anbefalt: over 2.0</div>
+                    </div>
+                    """, unsafe_allow_html=True)
+                with r2:
+                    st.markdown(f"""
+                    <div class="info-box">
+                        <div class="info-value">3-6 uker</div>
+                        <div class="info-label">Tidsestimat (Swing)</div>
+                    </div>
+                    """, unsafe_allow_html=True)
+                with r3:
+                    support_txt = f"{stock['support']:.2f} kr" if stock['support'] is not None else "–"
+                    st.markdown(f"""
+                    <div class="info-box">
+                        <div class="info-value">{support_txt}</div>
+                        <div class="info-label">Nærmeste Støtte (60d)</div>
+                    </div>
+                    """, unsafe_allow_html=True)
         
-        with tab3:
-            st.markdown("### 👤 Innsidehandel & Eierskap")
+            elif section == sections[2]:
+                st.markdown("### 👤 Innsidehandel & Eierskap")
             
-            # Hent innsidehandel data fra yfinance
-            try:
-                ticker_obj = yf.Ticker(stock['ticker'])
-                
-                # Insider transactions
-                insider_trades = ticker_obj.insider_transactions
-                if insider_trades is not None and not insider_trades.empty:
-                    st.markdown("**Siste innsidehandler:**")
-                    # Vis de siste 10 transaksjonene
-                    display_insider = insider_trades.head(10).copy()
-                    st.dataframe(display_insider, use_container_width=True, hide_index=True)
-                else:
-                    st.info("Ingen innsidehandler tilgjengelig fra yfinance for denne aksjen.")
+                # Hent innsidehandel data fra yfinance (cachet)
+                try:
+                    # Insider transactions
+                    insider_trades = fundamentals.insider(stock['ticker'])
+                    if insider_trades is not None and not insider_trades.empty:
+                        st.markdown("**Siste innsidehandler:**")
+                        # Vis de siste 10 transaksjonene
+                        display_insider = insider_trades.head(10).copy()
+                        st.dataframe(display_insider, use_container_width=True, hide_index=True)
+                    else:
+                        st.info("Ingen innsidehandler tilgjengelig fra yfinance for denne aksjen.")
                 
-                # Major holders
-                st.markdown("<br>", unsafe_allow_html=True)
-                st.markdown("**Største eiere:**")
-                major_holders = ticker_obj.major_holders
-                if major_holders is not None and not major_holders.empty:
-                    st.dataframe(major_holders, use_container_width=True, hide_index=True)
-                else:
-                    st.info("Eierskapsdata ikke tilgjengelig.")
+                    # Major holders
+                    st.markdown("<br>", unsafe_allow_html=True)
+                    st.markdown("**Største eiere:**")
+                    major_holders = fundamentals.holders(stock['ticker'])
+                    if major_holders is not None and not major_holders.empty:
+                        st.dataframe(major_holders, use_container_width=True, hide_index=True)
+                    else:
+                        st.info("Eierskapsdata ikke tilgjengelig.")
                     
-            except Exception as e:
-                st.info("Kunne ikke hente innsidedata. Prøv å sjekke Newsweb direkte.")
+                except Exception as e:
+                    st.info("Kunne ikke hente innsidedata. Prøv å sjekke Newsweb direkte.")
             
-            # Link til Newsweb
-            st.markdown("<br>", unsafe_allow_html=True)
-            st.markdown(f"""
-            <div style="background: #fef3c7; padding: 16px; border-radius: 12px; border: 2px solid #fbbf24;">
-                <h4 style="margin: 0 0 8px 0; color: #92400e;">⚠️ Sjekk Newsweb</h4>
-                <p style="margin: 0 0 12px 0; color: #78350f; font-size: 0.9rem;">
-                    For fullstendig oversikt over meldepliktige handler og flaggemeldinger, 
-                    sjekk alltid Newsweb før du handler.
-                </p>
-                <a href="https://newsweb.oslobors.no/search?category=1&issuer={stock['ticker_short']}" 
-                   target="_blank" 
-                   style="display: inline-block; background: #1a1a1a; color: white; padding: 10px 20px; 
-                          border-radius: 8px; text-decoration: none; font-weight: 700;">
-                    🔗 Åpne Newsweb for {stock['ticker_short']}
-                </a>
-            </div>
-            """, unsafe_allow_html=True)
+                # Link til Newsweb
+                st.markdown("<br>", unsafe_allow_html=True)
+                st.markdown(f"""
+                <div style="background: #fef3c7; padding: 16px; border-radius: 12px; border: 2px solid #fbbf24;">
+                    <h4 style="margin: 0 0 8px 0; color: #92400e;">⚠️ Sjekk Newsweb</h4>
+                    <p style="margin: 0 0 12px 0; color: #78350f; font-size: 0.9rem;">
+                        For fullstendig oversikt over meldepliktige handler og flaggemeldinger, 
+                        sjekk alltid Newsweb før du handler.
+                    </p>
+                    <a href="https://newsweb.oslobors.no/search?category=1&issuer={stock['ticker_short']}" 
+                       target="_blank" 
+                       style="display: inline-block; background: #1a1a1a; color: white; padding: 10px 20px; 
+                              border-radius: 8px; text-decoration: none; font-weight: 700;">
+                        🔗 Åpne Newsweb for {stock['ticker_short']}
+                    </a>
+                </div>
+                """, unsafe_allow_html=True)
         
-        with tab4:
-            st.markdown("### 📰 Siste Nyheter")
+            elif section == sections[3]:
+                st.markdown("### 📰 Siste Nyheter")
             
-            # Hent nyheter fra yfinance
-            try:
-                ticker_obj = yf.Ticker(stock['ticker'])
-                news = ticker_obj.news
+                # Hent nyheter fra yfinance (cachet)
+                try:
+                    news = fundamentals.news(stock['ticker'])
                 
-                if news and len(news) > 0:
-                    for article in news[:8]:
-                        pub_date = datetime.fromtimestamp(article.get('providerPublishTime', 0)).strftime('%d.%m.%Y')
-                        st.markdown(f"""
-                        <div style="background: white; padding: 16px; border-radius: 12px; border: 1px solid #e5e7eb; margin-bottom: 12px;">
-                            <a href="{article.get('link', '#')}" target="_blank" style="text-decoration: none;">
-                                <h4 style="margin: 0 0 8px 0; color: #1a1a1a; font-size: 1rem;">{article.get('title', 'Ingen tittel')}</h4>
-                            </a>
-                            <div style="display: flex; gap: 16px; font-size: 0.8rem; color: #6b7280;">
-                                <span>📅 {pub_date}</span>
-                                <span>📰 {article.get('publisher', 'Ukjent kilde')}</span>
+                    if news and len(news) > 0:
+                        for article in news[:8]:
+                            pub_date = datetime.fromtimestamp(article.get('providerPublishTime', 0)).strftime('%d.%m.%Y')
+                            st.markdown(f"""
+                            <div style="background: white; padding: 16px; border-radius: 12px; border: 1px solid #e5e7eb; margin-bottom: 12px;">
+                                <a href="{article.get('link', '#')}" target="_blank" style="text-decoration: none;">
+                                    <h4 style="margin: 0 0 8px 0; color: #1a1a1a; font-size: 1rem;">{article.get('title', 'Ingen tittel')}</h4>
+                                </a>
+                                <div style="display: flex; gap: 16px; font-size: 0.8rem; color: #6b7280;">
+                                    <span>📅 {pub_date}</span>
+                                    <span>📰 {article.get('publisher', 'Ukjent kilde')}</span>
+                                </div>
                             </div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                else:
-                    st.info("Ingen nyheter tilgjengelig fra yfinance.")
+                            """, unsafe_allow_html=True)
+                    else:
+                        st.info("Ingen nyheter tilgjengelig fra yfinance.")
                     
-            except Exception as e:
-                st.info("Kunne ikke hente nyheter.")
+                except Exception as e:
+                    st.info("Kunne ikke hente nyheter.")
             
-            # Eksterne kilder
-            st.markdown("<br>", unsafe_allow_html=True)
-            st.markdown("**🔗 Eksterne kilder:**")
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.markdown(f"[📊 Yahoo Finance](https://finance.yahoo.com/quote/{stock['ticker']})")
-            with col2:
-                st.markdown(f"[📈 TradingView](https://www.tradingview.com/symbols/OSL-{stock['ticker_short']}/)")
-            with col3:
-                st.markdown(f"[📰 Google News](https://news.google.com/search?q={stock['ticker_short']}+Oslo+Børs)")
+                # Eksterne kilder
+                st.markdown("<br>", unsafe_allow_html=True)
+                st.markdown("**🔗 Eksterne kilder:**")
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.markdown(f"[📊 Yahoo Finance](https://finance.yahoo.com/quote/{stock['ticker']})")
+                with col2:
+                    st.markdown(f"[📈 TradingView](https://www.tradingview.com/symbols/OSL-{stock['ticker_short']}/)")
+                with col3:
+                    st.markdown(f"[📰 Google News](https://news.google.com/search?q={stock['ticker_short']}+Oslo+Børs)")
 
 with c_side:
     st.markdown("<br><br>", unsafe_allow_html=True)
     
+    age_min = int((datetime.now(timezone.utc) - updated_at).total_seconds() // 60)
+    age_txt = "nå nettopp" if age_min < 1 else f"for {age_min} min siden" if age_min < 120 else f"for {age_min // 60} t siden"
+    market_txt = "åpen" if is_open() else "stengt"
+    
     st.markdown(f"""
     <div class="widget-box">
         <h3 style="margin:0 0 16px 0;font-weight:700;font-size:1rem;">Markedsstatus</h3>
-        <p style="color:#6b7280;font-size:0.9rem;margin:0;">{len(data)} aksjer analysert</p>
+        <p style="color:#6b7280;font-size:0.9rem;margin:0;">{len(data)} av {len(watchlist)} aksjer analysert</p>
+        <p style="color:#6b7280;font-size:0.8rem;margin:4px 0 0 0;">Oppdatert {age_txt} · Børsen er {market_txt}</p>
     </div>
     """, unsafe_allow_html=True)
     
+    # Status per ticker fra siste henting: ok, utdatert (lagrede bars) eller feilet
+    if failed or stale:
+        n_ok = len(data) - len(stale)
+        with st.expander(f"✅ {n_ok} ok · ⏳ {len(stale)} utdatert · ⚠️ {len(failed)} feilet"):
+            # Store lister kan ha hundrevis av avviste tickere; vis bare de første
+            shown = [("⏳", t, r) for t, r in stale.items()] + [("⚠️", t, r) for t, r in failed.items()]
+            for icon, t, reason in shown[:STATUS_LIMIT]:
+                st.caption(f"{icon} {t}: {reason}")
+            if len(shown) > STATUS_LIMIT:
+                st.caption(f"… og {len(shown) - STATUS_LIMIT} til")
+    
+    # Siste varsler for listen (hele loggen ligger i DATA_DIR/alerts.jsonl)
+    recent_alerts = alert_log.recent(ALERT_LIMIT, st.session_state.universe)
+    if recent_alerts:
+        with st.expander(f"🔔 Varsler ({len(recent_alerts)})"):
+            for a in recent_alerts:
+                st.caption(f"{datetime.fromisoformat(a.time).astimezone(OSLO):%d.%m %H:%M} · {a.text}")
+    
+    # Skjult diagnosepanel (?diag=1): tidsspenn, cache-treff og hentetid per ticker
+    if st.query_params.get("diag") == "1":
+        with st.expander("🩺 Diagnostikk"):
+            import pandas as pd
+
+            diag = METRICS.snapshot()
+            spans = pd.DataFrame(diag["timings"])
+            if not spans.empty:
+                spans["snitt"] = spans["sum"] / spans["count"]
+                st.markdown("**Tidsspenn (s)**")
+                st.dataframe(spans.drop(columns="sum").round(4), use_container_width=True, hide_index=True)
+            counters = pd.DataFrame(diag["counters"])
+            if not counters.empty:
+                st.markdown("**Tellere**")
+                st.dataframe(counters, use_container_width=True, hide_index=True)
+            gauges = pd.DataFrame(diag["gauges"])
+            if not gauges.empty:
+                st.markdown("**Hentetid per ticker (s)**")
+                st.dataframe(gauges.sort_values("value", ascending=False).round(4),
+                             use_container_width=True, hide_index=True)
+            st.download_button("Last ned (Prometheus)", METRICS.prometheus(), "metrics.prom", "text/plain")
+    
     st.markdown("""
     <div class="help-card">
         <h3 style="margin:0 0 8px 0;font-weight:700;">Trenger du hjelp?</h3>
@@ -687,3 +955,7 @@ with c_side:
 
 st.markdown("---")
 st.caption("K-man Island © 2026 · Ikke finansiell rådgivning")
+# Kjøretid per rerun (budsjett: scripts/bench_startup.py)
+METRICS.observe("script_seconds", time.perf_counter() - SCRIPT_START,
+                view="analyse" if st.session_state.selected_ticker else "oversikt")
+METRICS.write_every(METRICS_PATH, METRICS_EVERY)
@@ -0,0 +1,11 @@
+"""Datamotor for K-man Island: prislasting og analyse uten UI-avhengigheter.
+
+Modulene importerer pandas, plotly og yfinance først når de trengs, så
+dashboardet kan tegnes fra et lagret snapshot uten analysestakken.
+"""
+import os
+
+# Lagring (priser, snapshots, cache, varsler); KMAN_DATA_DIR overstyrer
+DATA_DIR = os.environ.get(
+    "KMAN_DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+)
@@ -0,0 +1,245 @@
+"""Varsler når screeneren endrer seg mellom to snapshots.
+
+Etter hver oppdatering sammenlignes det nye resultatet med forrige snapshot:
+
+  signal   signalet er endret (f.eks. HOLD -> BUY)
+  prob     sannsynligheten har krysset et av ``PROB_LEVELS``
+  stop     kursen har falt til eller under forrige stop loss
+  target   kursen har nådd forrige target
+
+Sammenligningen er ett vektorisert pass over kolonnene i ``SummaryTable``;
+bare tickere som faktisk har endret seg blir til Python-objekter, så den
+tåler å kjøres hvert minutt på et stort univers.
+
+Hendelsene legges til i en JSON-linjelogg (``AlertLog``, bare tillegg) og
+sendes videre til sinkene: fil, webhook og e-post (se ``default_sinks``).
+En sink som feiler logges og stopper ikke de andre.
+"""
+import json
+import logging
+import os
+import smtplib
+import threading
+import urllib.request
+from dataclasses import asdict, dataclass
+from email.message import EmailMessage
+
+import numpy as np
+
+from engine import DATA_DIR
+from engine.metrics import METRICS
+from engine.signals import SIGNALS
+
+PROB_LEVELS = (70,)
+KINDS = ("signal", "prob", "stop", "target")
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Alert:
+    time: str       # snapshot-tid (ISO 8601)
+    universe: str
+    ticker: str
+    kind: str       # en av KINDS
+    old: object     # signal, prob eller nivået som ble krysset
+    new: object     # signal, prob eller kursen
+    text: str
+
+
+def _align(old, new):
+    """Radindekser (i, j) for tickere som finnes i begge tabellene."""
+    if len(old) == len(new) and np.array_equal(old.ticker, new.ticker):
+        i = np.arange(len(new))
+        return i, i  # vanlig tilfelle: samme liste i samme rekkefølge
+    _, i, j = np.intersect1d(old.ticker, new.ticker, assume_unique=True, return_indices=True)
+    return i, j
+
+
+def diff(old, new, time="", universe="", levels=PROB_LEVELS):
+    """Hendelsene mellom to resultattabeller, i rekkefølgen til ``new``."""
+    if old is None or new is None or not len(old) or not len(new):
+        return []
+    i, j = _align(old, new)
+    old_code, new_code = old.code[i], new.code[j]
+    old_prob, new_prob = old.prob[i].astype(int), new.prob[j].astype(int)
+    price = new.column("pris")[j]
+    # Nivåene fra forrige kjøring; de nye er regnet fra dagens kurs og ligger alltid på riktig side
+    stop, target = old.column("stop_loss")[i], old.column("target")[i]
+
+    crossed = np.zeros(len(j), dtype=bool)
+    for level in levels:
+        crossed |= (old_prob < level) != (new_prob < level)
+    hits = {
+        "signal": old_code != new_code,
+        "prob": crossed,
+        "stop": price <= stop,      # NaN gir False
+        "target": price >= target,
+    }
+    changed = np.flatnonzero(hits["signal"] | hits["prob"] | hits["stop"] | hits["target"])
+
+    alerts = []
+    for k in changed[np.argsort(j[changed], kind="stable")]:
+        t = str(new.ticker[j[k]])
+        short = t.replace(".OL", "")
+        p = float(price[k])
+        if hits["signal"][k]:
+            a, b = SIGNALS[old_code[k]], SIGNALS[new_code[k]]
+            alerts.append(Alert(time, universe, t, "signal", a, b, f"{short}: {a} → {b}"))
+        if hits["prob"][k]:
+            a, b = int(old_prob[k]), int(new_prob[k])
+            level = next(lv for lv in levels if (a < lv) != (b < lv))
+            side = "over" if b > a else "under"
+            alerts.append(Alert(time, universe, t, "prob", a, b,
+                                f"{short}: sannsynlighet {a}% → {b}% ({side} {level}%)"))
+        if hits["stop"][k]:
+            alerts.append(Alert(time, universe, t, "stop", float(stop[k]), p,
+                                f"{short}: kurs {p:.2f} under stop {stop[k]:.2f}"))
+        if hits["target"][k]:
+            alerts.append(Alert(time, universe, t, "target", float(target[k]), p,
+                                f"{short}: kurs {p:.2f} over target {target[k]:.2f}"))
+    return alerts
+
+
+class AlertLog:
+    """Hendelser som JSON-linjer; filen skrives bare til på slutten."""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(DATA_DIR, "alerts.jsonl")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+
+    def append(self, alerts):
+        if not alerts:
+            return
+        lines = "".join(json.dumps(asdict(a), ensure_ascii=False) + "\n" for a in alerts)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+    def recent(self, n=50, universe=None, block=65536):
+        """De ``n`` siste hendelsene (nyeste først), eventuelt bare for én liste.
+
+        Leser bakfra i blokker, så kostnaden ikke vokser med loggen.
+        """
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return []
+        with f:
+            end = f.seek(0, os.SEEK_END)
+            start = end
+            while True:
+                start = max(0, start - block)
+                f.seek(start)
+                lines = f.read(end - start).splitlines()
+                if start > 0:
+                    lines = lines[1:]  # første linje kan være kuttet
+                out = []
+                for line in reversed(lines):
+                    try:
+                        alert = Alert(**json.loads(line))
+                    except (ValueError, TypeError):
+                        continue  # avbrutt skriving
+                    if universe is None or alert.universe == universe:
+                        out.append(alert)
+                        if len(out) >= n:
+                            return out
+                if start == 0:
+                    return out
+                block *= 2
+
+
+class FileSink:
+    """Én tekstlinje per hendelse, f.eks. for ``tail -f``."""
+
+    name = "file"
+
+    def __init__(self, path):
+        self.path = path
+
+    def send(self, alerts):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(f"{a.time} [{a.universe}] {a.text}\n" for a in alerts)
+
+
+class WebhookSink:
+    """POST med JSON (``text`` + hendelsene) til en webhook, f.eks. Slack eller Teams."""
+
+    name = "webhook"
+
+    def __init__(self, url, timeout=10):
+        self.url, self.timeout = url, timeout
+
+    def send(self, alerts):
+        body = json.dumps({"text": "\n".join(a.text for a in alerts),
+                           "alerts": [asdict(a) for a in alerts]}, ensure_ascii=False).encode()
+        req = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=self.timeout):
+            pass
+
+
+class EmailSink:
+    """Én e-post per oppdatering med alle hendelsene."""
+
+    name = "email"
+
+    def __init__(self, to, host="localhost", port=25, sender="kman@localhost", timeout=10):
+        self.to, self.host, self.port, self.sender, self.timeout = to, host, port, sender, timeout
+
+    def send(self, alerts):
+        msg = EmailMessage()
+        msg["Subject"] = f"K-man: {len(alerts)} varsler"
+        msg["From"], msg["To"] = self.sender, self.to
+        msg.set_content("\n".join(a.text for a in alerts))
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            smtp.send_message(msg)
+
+
+def default_sinks():
+    """Sinker fra miljøet: KMAN_ALERT_FILE, KMAN_ALERT_WEBHOOK og KMAN_ALERT_EMAIL (+ KMAN_SMTP_HOST)."""
+    sinks = []
+    if os.environ.get("KMAN_ALERT_FILE"):
+        sinks.append(FileSink(os.environ["KMAN_ALERT_FILE"]))
+    if os.environ.get("KMAN_ALERT_WEBHOOK"):
+        sinks.append(WebhookSink(os.environ["KMAN_ALERT_WEBHOOK"]))
+    if os.environ.get("KMAN_ALERT_EMAIL"):
+        sinks.append(EmailSink(os.environ["KMAN_ALERT_EMAIL"], os.environ.get("KMAN_SMTP_HOST", "localhost")))
+    return sinks
+
+
+class AlertEngine:
+    """Sammenligner hvert nytt snapshot med forrige, logger og leverer hendelsene."""
+
+    def __init__(self, universe="", log=None, sinks=None, levels=PROB_LEVELS, metrics=None):
+        self.universe = universe
+        self.log = log or AlertLog()
+        self.sinks = default_sinks() if sinks is None else list(sinks)
+        self.levels = levels
+        self.metrics = metrics or METRICS
+
+    def process(self, old, new, time=""):
+        """Hendelsene mellom to resultattabeller; logges og sendes før de returneres."""
+        with self.metrics.span("varsler"):
+            alerts = diff(old, new, time, self.universe, self.levels)
+        for a in alerts:
+            self.metrics.incr("alerts", kind=a.kind)
+        if alerts:
+            self.log.append(alerts)
+            self.deliver(alerts)
+        return alerts
+
+    def deliver(self, alerts):
+        for sink in self.sinks:
+            try:
+                sink.send(alerts)
+                outcome = "ok"
+            except Exception:
+                outcome = "feil"
+                log.exception("Varsler kunne ikke sendes til %s", sink.name)
+            self.metrics.incr("alert_deliveries", sink=sink.name, outcome=outcome)
+
+    def on_publish(self, previous, snapshot):
+        """Krok for ``Refresher``: snapshots med resultat ``(tabell, feilet, utdatert)``."""
+        if previous is None:
+            return []
+        return self.process(previous.result[0], snapshot.result[0], snapshot.created.isoformat())
@@ -0,0 +1,217 @@
+"""Vektorisert backtest av BUY/SELL/HOLD-signalet og prob-scoren.
+
+Reglene fra fetch_and_analyze (``engine.signals``) evalueres på hver
+historiske bar for hver ticker. Hver bar som ville fått et kort i
+dashboardet behandles som en uavhengig inngang på lukkekurs, med stop
+``close - 2×ATR`` og target = nærmeste motstand (ellers +10 %). Handelen
+lukkes når stop eller target treffes, eller på lukkekurs etter ``horizon``
+bars. Alt regnes på (bars × ticker)-matriser, og data leses fra det lokale
+prislageret, så kjøringen er helt offline.
+
+Trendflaggene fra uke og måned (``engine.timeframes.trend_history``) tas
+med slik de sto på hver bar, så prob-en som kalibreres er den samme som
+dashboardet viser (``Rules.w_weekly``/``w_monthly``).
+
+Kjør: python -m engine.backtest [--period 5y] [--horizon 30] [--tickers A.OL B.OL]
+"""
+import argparse
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from engine.indicators import compacted, compute_arrays
+from engine.levels import rolling_resistance
+from engine.panel import compact
+from engine.signals import RULES, SIGNALS, evaluate
+from engine.timeframes import Timeframes
+
+MIN_BARS = 60  # samme krav som fetch_and_analyze (len(df) < 60)
+PROB_BINS = [0, 30, 40, 50, 60, 70, 80, 90, 100]
+
+
+def _shift(a, n):
+    """Forskyv rader: n > 0 henter fortid, n < 0 henter fremtid."""
+    out = np.full(a.shape, np.nan)
+    if n > 0:
+        out[n:] = a[:-n]
+    elif n < 0:
+        out[:n] = a[-n:]
+    else:
+        out[:] = a
+    return out
+
+
+def trend_features(panel, where, timeframes=None):
+    """Uke-/månedsflaggene per bar, kompakte som ``o`` (``where`` fra ``compacted``)."""
+    flags = (timeframes or Timeframes()).history(panel)
+    return {column: compact(v, where) for column, v in flags.items()}
+
+
+def features(o, lookback=60, width=1, trend=None):
+    """Alt som ikke avhenger av terskler/vekter: indikatorer, momentum, motstand og ``trend``."""
+    f = compute_arrays(o)
+    close = o["Close"]
+    f["five_day"] = close / _shift(close, 4) - 1
+    f["resistance"] = rolling_resistance(o["High"], close, lookback, width)
+    # Som i dashboardet: nok historikk og gyldige RSI/SMA20/ATR
+    bars = np.cumsum(~np.isnan(close), axis=0)
+    f["eligible"] = (bars >= MIN_BARS) & ~np.isnan(f["rsi"]) & ~np.isnan(f["sma20"]) & ~np.isnan(f["atr"])
+    f.update(trend or {})
+    return f
+
+
+def apply_rules(o, f, rules=RULES):
+    """Signal, prob, stop og target for hver bar (kompakte matriser)."""
+    close = o["Close"]
+    target = np.where(np.isnan(f["resistance"]), close * rules.fallback_target, f["resistance"])
+    stop = close - rules.stop_atr * f["atr"]
+    pot_pct = (target - close) / close * 100
+    code, prob = evaluate(close, f["rsi"], f["sma20"], f["sma50"],
+                          f["ema12"], f["ema26"], f["five_day"], pot_pct, rules,
+                          weekly=f.get("trend_uke"), monthly=f.get("trend_mnd"))
+    return {"code": code, "prob": prob, "stop": stop, "target": target, "eligible": f["eligible"]}
+
+
+def signal_history(o, rules=RULES, lookback=60, width=1, trend=None):
+    return apply_rules(o, features(o, lookback, width, trend), rules)
+
+
+def simulate(o, stop, target, horizon=30):
+    """Første treff av stop/target innen ``horizon`` bars for en inngang på hver bar.
+
+    Returnerer (utfall, exit-kurs, bars holdt). Utfall: 1 = target, -1 = stop,
+    0 = tidsutløp, NaN = fortsatt åpen ved slutten av historikken. Treffes
+    begge samme bar, regnes stop (konservativt); gap forbi et nivå fylles på
+    åpningskurs.
+    """
+    close = o["Close"]
+    outcome = np.full(close.shape, np.nan)
+    exit_px = np.full(close.shape, np.nan)
+    held = np.zeros(close.shape, dtype=np.int32)
+    for k in range(1, horizon + 1):
+        open_k, high_k, low_k = _shift(o["Open"], -k), _shift(o["High"], -k), _shift(o["Low"], -k)
+        active = np.isnan(outcome) & ~np.isnan(low_k)
+        hit_stop = active & (low_k <= stop)
+        hit_target = active & (high_k >= target) & ~hit_stop
+        outcome[hit_stop] = -1
+        exit_px[hit_stop] = np.fmin(stop, open_k)[hit_stop]
+        outcome[hit_target] = 1
+        exit_px[hit_target] = np.fmax(target, open_k)[hit_target]
+        held[hit_stop | hit_target] = k
+
+    timeout = np.isnan(outcome) & ~np.isnan(_shift(close, -horizon))
+    outcome[timeout] = 0
+    exit_px[timeout] = _shift(close, -horizon)[timeout]
+    held[timeout] = horizon
+    return outcome, exit_px, held
+
+
+@dataclass
+class BacktestResult:
+    trades: pd.DataFrame
+
+    def summary(self):
+        """Treffrate og forventning per signal (BUY/HOLD/SELL)."""
+        return _stats(self.trades.groupby("signal", observed=True)).reindex(list(SIGNALS)).dropna(how="all")
+
+    def calibration(self, bins=PROB_BINS):
+        """Predikert ``prob`` mot faktisk treffrate, per prob-bøtte."""
+        buckets = pd.cut(self.trades["prob"], bins, right=False)
+        stats = _stats(self.trades.groupby(buckets, observed=True))
+        stats.insert(1, "prob_snitt", self.trades.groupby(buckets, observed=True)["prob"].mean().round(1))
+        return stats
+
+
+def _stats(groups):
+    return pd.DataFrame({
+        "handler": groups.size(),
+        "treffrate": groups["outcome"].apply(lambda s: (s == 1).mean() * 100).round(1),
+        "stoppet": groups["outcome"].apply(lambda s: (s == -1).mean() * 100).round(1),
+        "snitt_pct": groups["ret_pct"].mean().round(2),
+        "forventning_r": groups["r"].mean().round(3),
+        "snitt_bars": groups["held"].mean().round(1),
+    })
+
+
+def run(panel, rules=RULES, horizon=30, lookback=60, width=1, timeframes=True):
+    """Backtest for alle tickere i panelet (``timeframes=False``: bare dagskriteriene)."""
+    o, where = compacted(panel)
+    trend = trend_features(panel, where) if timeframes else None
+    hist = signal_history(o, rules, lookback, width, trend)
+    outcome, exit_px, held = simulate(o, hist["stop"], hist["target"], horizon)
+
+    # Bare handler med utfall (ikke åpne ved slutten av historikken)
+    close = o["Close"]
+    mask = hist["eligible"] & ~np.isnan(outcome)
+    rows, cols = np.nonzero(mask)
+
+    # Dato for hver kompakt celle
+    r, c, dst, shape = where
+    dates = np.full(shape, np.datetime64("NaT"), dtype="datetime64[ns]")
+    dates[dst, c] = panel.index.to_numpy(dtype="datetime64[ns]")[r]
+
+    entry = close[rows, cols]
+    stop = hist["stop"][rows, cols]
+    exit_ = exit_px[rows, cols]
+    trades = pd.DataFrame({
+        "date": dates[rows, cols],
+        "ticker": np.asarray(panel.tickers, dtype=object)[cols],
+        "signal": pd.Categorical.from_codes(hist["code"][rows, cols], SIGNALS),
+        "prob": hist["prob"][rows, cols],
+        "entry": entry,
+        "stop": stop,
+        "target": hist["target"][rows, cols],
+        "exit": exit_,
+        "outcome": outcome[rows, cols].astype(np.int8),
+        "held": held[rows, cols],
+        "ret_pct": (exit_ - entry) / entry * 100,
+        "r": (exit_ - entry) / (entry - stop),
+    })
+    return BacktestResult(trades.sort_values(["date", "ticker"], ignore_index=True))
+
+
+def history_frames(period="5y", tickers=None, fake=0):
+    """Lagrede bars for backtest/sweep, eller ``fake`` syntetiske tickere.
+
+    Uten ``tickers`` brukes alle lagrede aksjer; indeksen (``strength.INDEX``,
+    lagret for relativ styrke) handles ikke.
+    """
+    from engine.prices import FakeSource, period_start
+    from engine.store import PriceStore
+    from engine.strength import INDEX
+
+    start = period_start(period)
+    if fake:
+        source = FakeSource(bars=2600)
+        frames = {f"F{i:04d}.OL": source.frame(f"F{i:04d}.OL") for i in range(fake)}
+        frames = {t: df[df.index >= start] if start is not None else df for t, df in frames.items()}
+    else:
+        store = PriceStore()
+        frames = store.read_many(tickers or sorted(t for t in store.spans() if t != INDEX), start)
+    if not frames:
+        raise SystemExit("Ingen lagrede bars. Åpne dashboardet eller kjør med --fake N.")
+    return frames
+
+
+def main():
+    from engine.panel import PricePanel
+
+    parser = argparse.ArgumentParser(description="Backtest av signal og prob over lagrede bars")
+    parser.add_argument("--period", default="5y")
+    parser.add_argument("--horizon", type=int, default=30, help="maks bars i en handel")
+    parser.add_argument("--tickers", nargs="*", help="standard: alle aksjer i lageret (uten indeksen)")
+    parser.add_argument("--fake", type=int, default=0, help="bruk N syntetiske tickere i stedet for lageret")
+    args = parser.parse_args()
+
+    frames = history_frames(args.period, args.tickers, args.fake)
+
+    result = run(PricePanel.from_frames(frames), horizon=args.horizon)
+    with pd.option_context("display.width", 140, "display.max_columns", 20):
+        print(f"{len(frames)} tickere, {len(result.trades)} handler\n")
+        print(result.summary(), "\n")
+        print(result.calibration())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,454 @@
+"""Delt cache på tvers av prosesser og replikaer: snapshots og nedlastede bars.
+
+``st.cache_data`` og ``st.cache_resource`` lever i én prosess. Her ligger verdiene i en felles backend med et lite Redis-kompatibelt
+grensesnitt (``get``/``mget``/``set(ex, nx)``/``set_many``/``delete``/``incr``,
+pluss ``expire_if``/``delete_if``, som bare rører nøkkelen så lenge den har
+en gitt verdi):
+
+  SqliteBackend   fil (standard: DATA_DIR/cache.sqlite), delt mellom prosesser
+  MemoryBackend   i prosessen, for tester og enkeltkjøringer
+  RedisBackend    ``redis.Redis`` (valgfri avhengighet) når KMAN_CACHE=redis://…
+
+Nøklene er versjonerte (``navnerom:v<versjon>:g<generasjon>:navn``):
+et nytt resultatformat gir nye nøkler, og ``invalidate`` øker generasjonen,
+så alle replikaer ser cachen som tom samtidig. ``lock`` er en single-flight-
+lås med utløpstid, så bare én replika regner ut på nytt når noe går ut.
+Eieren fornyer utløpstiden mens den holder låsen (sammenlign-og-sett, så en
+lås som har gått ut og blitt tatt av en annen ikke overskrives), og den som
+venter for lenge får ``LockTimeout`` i stedet for å regne ut samtidig med eieren.
+"""
+import logging
+import math
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing, contextmanager
+from datetime import datetime, timezone
+
+from engine import DATA_DIR
+from engine.metrics import METRICS
+from engine.scheduler import Snapshot
+
+LOCK_TTL = 60    # sekunder; en låseier som dør blokkerer ikke lenger enn dette
+LOCK_WAIT = 900  # sekunder vi venter på en opptatt lås før LockTimeout
+BARS_TTL = 300   # nedlastede bars deles så lenge
+POLL = 0.2       # sekunder mellom forsøk på å ta en opptatt lås
+
+log = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    key     TEXT PRIMARY KEY,
+    value   BLOB NOT NULL,
+    expires REAL
+) WITHOUT ROWID
+"""
+
+
+class LockTimeout(TimeoutError):
+    """Låsen var fortsatt opptatt da ventetiden gikk ut."""
+
+
+class MemoryBackend:
+    """Stand-in for Redis i én prosess (trådsikker)."""
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._data = {}  # nøkkel -> (verdi, utløper)
+        self._lock = threading.Lock()
+
+    def _live(self, key):
+        item = self._data.get(key)
+        if item is not None and item[1] is not None and item[1] <= self.clock():
+            del self._data[key]
+            return None
+        return item
+
+    def get(self, key):
+        with self._lock:
+            item = self._live(key)
+            return None if item is None else item[0]
+
+    def mget(self, keys):
+        with self._lock:
+            return [None if (item := self._live(k)) is None else item[0] for k in keys]
+
+    def set(self, key, value, ex=None, nx=False):
+        with self._lock:
+            if nx and self._live(key) is not None:
+                return False
+            self._data[key] = (value, None if ex is None else self.clock() + ex)
+            return True
+
+    def set_many(self, items, ex=None):
+        for key, value in items.items():
+            self.set(key, value, ex)
+
+    def delete(self, *keys):
+        with self._lock:
+            return sum(self._data.pop(k, None) is not None for k in keys)
+
+    def incr(self, key):
+        with self._lock:
+            item = self._live(key)
+            value = int(item[0]) + 1 if item else 1
+            self._data[key] = (str(value).encode(), item[1] if item else None)
+            return value
+
+    def expire_if(self, key, value, ex):
+        with self._lock:
+            item = self._live(key)
+            if item is None or item[0] != value:
+                return False
+            self._data[key] = (value, self.clock() + ex)
+            return True
+
+    def delete_if(self, key, value):
+        with self._lock:
+            item = self._live(key)
+            if item is None or item[0] != value:
+                return False
+            del self._data[key]
+            return True
+
+
+class SqliteBackend:
+    """Nøkkel/verdi i SQLite; flere prosesser på samme disk deler filen."""
+
+    def __init__(self, path=None, clock=time.time):
+        self.path = path or os.path.join(DATA_DIR, "cache.sqlite")
+        self.clock = clock
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with closing(self._connect()) as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute(_SCHEMA)
+            con.execute("DELETE FROM kv WHERE expires <= ?", (self.clock(),))
+
+    def _connect(self):
+        # Autocommit; skrivinger som må være atomiske bruker BEGIN IMMEDIATE
+        con = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        con.execute("PRAGMA synchronous=NORMAL")  # trygt med WAL, og uten fsync per skriving
+        return con
+
+    def get(self, key):
+        return self.mget([key])[0]
+
+    def mget(self, keys):
+        keys = list(keys)
+        found = {}
+        with closing(self._connect()) as con:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows = con.execute(
+                    f"SELECT key, value FROM kv WHERE key IN ({','.join('?' * len(chunk))}) "
+                    "AND (expires IS NULL OR expires > ?)", [*chunk, self.clock()])
+                found.update(rows)
+        return [found.get(k) for k in keys]
+
+    def set(self, key, value, ex=None, nx=False):
+        now = self.clock()
+        expires = None if ex is None else now + ex
+        with closing(self._connect()) as con:
+            if not nx:
+                con.execute("INSERT OR REPLACE INTO kv VALUES (?, ?, ?)", (key, value, expires))
+                return True
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                con.execute("DELETE FROM kv WHERE key = ? AND expires <= ?", (key, now))
+                added = con.execute("INSERT OR IGNORE INTO kv VALUES (?, ?, ?)", (key, value, expires)).rowcount
+                con.execute("COMMIT")
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+            return added == 1
+
+    def set_many(self, items, ex=None):
+        expires = None if ex is None else self.clock() + ex
+        with closing(self._connect()) as con:
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                con.executemany("INSERT OR REPLACE INTO kv VALUES (?, ?, ?)",
+                                [(k, v, expires) for k, v in items.items()])
+                con.execute("COMMIT")
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+
+    def delete(self, *keys):
+        with closing(self._connect()) as con:
+            return sum(con.execute("DELETE FROM kv WHERE key = ?", (k,)).rowcount for k in keys)
+
+    def incr(self, key):
+        with closing(self._connect()) as con:
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                row = con.execute("SELECT value FROM kv WHERE key = ? AND (expires IS NULL OR expires > ?)",
+                                  (key, self.clock())).fetchone()
+                value = int(row[0]) + 1 if row else 1
+                con.execute("INSERT OR REPLACE INTO kv VALUES (?, ?, NULL)", (key, str(value).encode()))
+                con.execute("COMMIT")
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+            return value
+
+    def expire_if(self, key, value, ex):
+        now = self.clock()
+        with closing(self._connect()) as con:
+            return con.execute("UPDATE kv SET expires = ? WHERE key = ? AND value = ? "
+                               "AND (expires IS NULL OR expires > ?)", (now + ex, key, value, now)).rowcount == 1
+
+    def delete_if(self, key, value):
+        with closing(self._connect()) as con:
+            return con.execute("DELETE FROM kv WHERE key = ? AND value = ? AND (expires IS NULL OR expires > ?)",
+                               (key, value, self.clock())).rowcount == 1
+
+
+# Sammenlign-og-sett på serveren: bare eieren (samme verdi) fornyer eller sletter
+_EXPIRE_IF = """
+if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('pexpire', KEYS[1], ARGV[2]) end
+return 0
+"""
+_DELETE_IF = """
+if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end
+return 0
+"""
+
+
+class RedisBackend:
+    """Tynt lag rundt en ``redis.Redis``; ``set_many`` går i én pipeline."""
+
+    def __init__(self, client):
+        self.client = client
+        self._expire_if = client.register_script(_EXPIRE_IF)
+        self._delete_if = client.register_script(_DELETE_IF)
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def mget(self, keys):
+        return self.client.mget(keys) if keys else []
+
+    def set(self, key, value, ex=None, nx=False):
+        return bool(self.client.set(key, value, ex=ex, nx=nx))
+
+    def set_many(self, items, ex=None):
+        with self.client.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                pipe.set(key, value, ex=ex)
+            pipe.execute()
+
+    def delete(self, *keys):
+        return self.client.delete(*keys) if keys else 0
+
+    def incr(self, key):
+        return self.client.incr(key)
+
+    def expire_if(self, key, value, ex):
+        return bool(self._expire_if(keys=[key], args=[value, int(ex * 1000)]))
+
+    def delete_if(self, key, value):
+        return bool(self._delete_if(keys=[key], args=[value]))
+
+
+def backend_from_env():
+    """Backend valgt via ``KMAN_CACHE``: tom = SQLite i DATA_DIR, ``memory`` eller ``redis://…``."""
+    spec = os.environ.get("KMAN_CACHE", "")
+    if spec == "memory":
+        return MemoryBackend()
+    if spec.startswith(("redis://", "rediss://", "unix://")):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError(f"KMAN_CACHE={spec} krever pakken redis") from e
+        return RedisBackend(redis.Redis.from_url(spec))
+    return SqliteBackend(spec or None)
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_backend():
+    """Én backend per prosess fra ``backend_from_env`` (delt av loader, snapshots og app)."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = backend_from_env()
+        return _default
+
+
+class SharedCache:
+    """Versjonerte, picklede verdier i en delt backend, med single-flight-lås."""
+
+    def __init__(self, backend, namespace, version=1, poll=POLL):
+        self.backend = backend
+        self.namespace = namespace
+        self.version = version
+        self.poll = poll
+
+    def generation(self):
+        return int(self.backend.get(f"{self.namespace}:gen") or 0)
+
+    def invalidate(self):
+        """Tømmer navnerommet for alle replikaer (nye nøkler; de gamle går ut av seg selv)."""
+        return self.backend.incr(f"{self.namespace}:gen")
+
+    def key(self, name, generation=None):
+        gen = self.generation() if generation is None else generation
+        return f"{self.namespace}:v{self.version}:g{gen}:{name}"
+
+    def get(self, name):
+        return self.get_many([name])[name]
+
+    def get_many(self, names):
+        names = list(names)
+        gen = self.generation()
+        blobs = self.backend.mget([self.key(n, gen) for n in names]) if names else []
+        return {n: None if b is None else pickle.loads(b) for n, b in zip(names, blobs)}
+
+    def set(self, name, value, ttl=None):
+        self.backend.set(self.key(name), pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                         ex=None if ttl is None else math.ceil(ttl))
+
+    def set_many(self, values, ttl=None):
+        gen = self.generation()
+        self.backend.set_many({self.key(n, gen): pickle.dumps(v, pickle.HIGHEST_PROTOCOL)
+                               for n, v in values.items()}, ex=None if ttl is None else math.ceil(ttl))
+
+    @contextmanager
+    def lock(self, name, ttl=LOCK_TTL, timeout=LOCK_WAIT):
+        """Eksklusiv lås på tvers av replikaer; gir True hvis en annen holdt den og vi ventet.
+
+        Mens låsen holdes, fornyes utløpstiden hvert ``ttl / 3`` sekund, så en
+        lang utregning beholder den, mens en replika som dør ikke blokkerer de
+        andre lenger enn ``ttl``. Er låsen fortsatt opptatt etter ``timeout``
+        sekunder, kastes ``LockTimeout``; vi kjører aldri uten låsen.
+        """
+        key = f"{self.namespace}:lock:{name}"
+        token = uuid.uuid4().hex.encode()
+        deadline = time.monotonic() + timeout
+        waited = False
+        while not self.backend.set(key, token, ex=math.ceil(ttl), nx=True):
+            waited = True
+            if time.monotonic() >= deadline:
+                METRICS.incr("lock_timeouts", namespace=self.namespace)
+                raise LockTimeout(f"{key} var fortsatt låst etter {timeout:g} s")
+            time.sleep(self.poll)
+        done = threading.Event()
+        keeper = threading.Thread(target=self._keep, args=(key, token, ttl, done),
+                                  name=f"lock:{name}", daemon=True)
+        keeper.start()
+        try:
+            yield waited
+        finally:
+            done.set()
+            keeper.join()
+            self.backend.delete_if(key, token)
+
+    def _keep(self, key, token, ttl, done):
+        # Fornyer låsen til eieren er ferdig; gir opp hvis den har gått ut eller en annen har tatt den
+        while not done.wait(ttl / 3):
+            try:
+                if not self.backend.expire_if(key, token, math.ceil(ttl)):
+                    log.warning("Mistet låsen %s før utregningen var ferdig", key)
+                    return
+            except Exception:
+                log.exception("Kunne ikke fornye låsen %s", key)
+
+    def get_or_compute(self, name, compute, ttl=None):
+        """Verdien for ``name``; regnes ut av én replika om gangen når den mangler.
+
+        Holder en annen replika låsen lenger enn ``LOCK_WAIT``, kastes ``LockTimeout``.
+        """
+        value = self.get(name)
+        if value is None:
+            with self.lock(name):
+                value = self.get(name)  # en annen kan ha regnet den ut mens vi ventet
+                if value is None:
+                    value = compute()
+                    self.set(name, value, ttl)
+        return value
+
+
+class SharedSnapshotStore:
+    """Siste snapshot for en liste i en ``SharedCache`` som alle replikaene leser.
+
+    Et lite stempel (opprettet-tid) leses ved hvert kall; selve bildet hentes
+    og pickles ut bare når stempelet er endret. Snapshots er ikke med i
+    generasjonen, så ``invalidate`` tar ikke bort det som vises.
+    """
+
+    def __init__(self, cache, name, lock_ttl=LOCK_TTL):
+        self.cache = cache
+        self.name = name
+        self.lock_ttl = lock_ttl
+        self.version = cache.version
+        prefix = f"{cache.namespace}:v{cache.version}:{name}"  # utenfor generasjonen
+        self._blob_key, self._stamp_key = prefix, prefix + ":stamp"
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._snapshot = None
+
+    def publish(self, result, created=None):
+        snap = Snapshot(created or datetime.now(timezone.utc), result, self.version)
+        stamp = snap.created.isoformat().encode()
+        # Bildet før stempelet: den som ser et nytt stempel, får også det nye bildet
+        self.cache.backend.set(self._blob_key, pickle.dumps(snap, pickle.HIGHEST_PROTOCOL))
+        self.cache.backend.set(self._stamp_key, stamp)
+        with self._lock:
+            self._snapshot, self._stamp = snap, stamp
+        return snap
+
+    def latest(self):
+        with self._lock:
+            stamp = self.cache.backend.get(self._stamp_key)
+            if stamp is not None and stamp != self._stamp:
+                blob = self.cache.backend.get(self._blob_key)
+                if blob is not None:
+                    self._snapshot, self._stamp = pickle.loads(blob), stamp
+            return self._snapshot
+
+    def lock(self):
+        """Single-flight for oppdateringen av denne listen (se ``Refresher.refresh``)."""
+        return self.cache.lock(f"snapshot:{self.name}", ttl=self.lock_ttl)
+
+
+class SharedLoader:
+    """Loader som deler nedlastede bars mellom replikaer via ``SharedCache``.
+
+    Ligger mellom ``StoreLoader`` og nettet: en bar-forespørsel som en annen
+    replika nettopp har gjort (samme ticker og vindu), hentes fra cachen i
+    stedet for fra Yahoo. Bare dagsbars deles; intradagsbars blir utdaterte
+    raskere enn ``ttl``. Feil caches ikke.
+    """
+
+    def __init__(self, loader, cache, ttl=BARS_TTL):
+        self.loader = loader
+        self.cache = cache
+        self.ttl = ttl
+
+    def load(self, tickers, period="1y", interval="1d", start=None):
+        # pandas først her: modulen importeres også av dashboardet, som ikke laster bars selv
+        import pandas as pd
+
+        from engine.prices import LoadResult
+
+        if interval != "1d":
+            return self.loader.load(tickers, period=period, interval=interval, start=start)
+        tickers = list(dict.fromkeys(tickers))
+        since = "" if start is None else pd.Timestamp(start).isoformat()
+        names = {t: f"bars:{period}:{since}:{t}" for t in tickers}
+        cached = self.cache.get_many(names.values())
+        result = LoadResult(frames={t: cached[names[t]] for t in tickers if cached[names[t]] is not None})
+        missing = [t for t in tickers if t not in result.frames]
+        METRICS.incr("cache_requests", len(result.frames), cache="shared_bars", result="hit")
+        METRICS.incr("cache_requests", len(missing), cache="shared_bars", result="miss")
+        if missing:
+            fetched = self.loader.load(missing, period=period, interval=interval, start=start)
+            self.cache.set_many({names[t]: df for t, df in fetched.frames.items()}, self.ttl)
+            result.merge(fetched)
+        return result
@@ -0,0 +1,115 @@
+"""Kursgraf for detaljvisningen: valgt periode, OHLC-nedsampling og overlegg.
+
+Lange perioder aggregeres til uke- eller månedsbars (første Open, høyeste
+High, laveste Low, siste Close, summert Volume), så grafen aldri har mer enn
+``MAX_POINTS`` candlesticks. Overleggene regnes med ``engine.indicators``
+(samme formler som screeneren) på en lengre historikk (``LOAD_PERIOD``) før
+perioden klippes, og samples ved slutten av hver vist bar.
+
+Figuren bygges én gang per (ticker, dataversjon, valg); se ``chart_figure`` i
+app.py. Plotly importeres først i ``build_figure``, så modulen kan brukes for
+konstantene og nedsamplingen uten grafstakken.
+"""
+import pandas as pd
+
+from engine.indicators import compute
+from engine.panel import PricePanel
+from engine.prices import PERIOD_OFFSETS
+from engine.signals import RULES
+
+# Visningsnavn -> yfinance-periode
+RANGES = {"3M": "3mo", "1Y": "1y", "5Y": "5y", "Maks": "max"}
+# Historikk som lastes per periode, så glidende snitt er på plass fra første viste bar
+LOAD_PERIOD = {"3mo": "1y", "1y": "2y"}
+OVERLAYS = ("SMA20/50", "EMA12/26", "ATR-bånd", "RSI")
+MAX_POINTS = 400
+RESOLUTIONS = (("W-FRI", "uke"), ("ME", "måned"))  # grovere og grovere
+
+_AGG = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+_LINES = {
+    "sma20": ("SMA20", "#f59e0b"), "sma50": ("SMA50", "#6366f1"),
+    "ema12": ("EMA12", "#14b8a6"), "ema26": ("EMA26", "#ec4899"),
+}
+
+
+def resample_ohlc(df, rule):
+    """OHLC-bars aggregert til ``rule`` (f.eks. ``W-FRI``), stemplet med siste handelsdag."""
+    out = df.groupby(pd.Grouper(freq=rule)).agg({c: _AGG[c] for c in df.columns if c in _AGG})
+    # Siste faktiske dato i hver periode, ikke periodeslutt (som kan ligge frem i tid)
+    last = pd.Series(df.index, index=df.index).groupby(pd.Grouper(freq=rule)).last()
+    out.index = pd.DatetimeIndex(last.reindex(out.index), name=df.index.name)
+    return out[out["Close"].notna()]
+
+
+def downsample(df, max_points=MAX_POINTS):
+    """(frame, oppløsning): dagsbars hvis de får plass, ellers uke- eller månedsbars."""
+    if len(df) <= max_points:
+        return df, None
+    if (df.index[1:] - df.index[:-1]).min() < pd.Timedelta(days=1):
+        return df.iloc[-max_points:], None  # intradag: de siste barene
+    for rule, label in RESOLUTIONS:
+        out = resample_ohlc(df, rule)
+        if len(out) <= max_points:
+            return out, label
+    return out, label
+
+
+def indicator_series(df):
+    """Indikatorserier (navn -> Series) for én ticker, på ``df`` sin datoakse."""
+    panel = PricePanel.from_frames({"_": df})
+    return {name: frame["_"] for name, frame in compute(panel).items()}
+
+
+def window(df, period):
+    """Barene i ``period`` regnet bakover fra siste bar."""
+    offset = PERIOD_OFFSETS.get(period)
+    if offset is None or df.empty:
+        return df
+    return df[df.index > df.index[-1] - offset]
+
+
+def build_figure(df, stop_loss, target, period="3mo", overlays=(), max_points=MAX_POINTS):
+    """Candlestick med stop/target-linjer og valgte overlegg, nedsamplet til ``max_points``."""
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    series = indicator_series(df) if overlays and len(df) else {}
+    shown, resolution = downsample(window(df, period), max_points)
+    # Indikatorverdien ved slutten av hver (aggregerte) bar
+    series = {name: s.reindex(shown.index) for name, s in series.items()}
+
+    rsi_row = "RSI" in overlays
+    fig = make_subplots(rows=2 if rsi_row else 1, cols=1, shared_xaxes=True, vertical_spacing=0.04,
+                        row_heights=[0.75, 0.25] if rsi_row else [1.0])
+    fig.add_trace(go.Candlestick(
+        x=shown.index, open=shown['Open'], high=shown['High'], low=shown['Low'], close=shown['Close'],
+        increasing_line_color='#22c55e', decreasing_line_color='#ef4444', name="Kurs"
+    ), row=1, col=1)
+    for group, names in (("SMA20/50", ("sma20", "sma50")), ("EMA12/26", ("ema12", "ema26"))):
+        if group in overlays:
+            for name in names:
+                label, color = _LINES[name]
+                fig.add_trace(go.Scatter(x=shown.index, y=series[name], name=label, mode="lines",
+                                         line=dict(width=1.4, color=color)), row=1, col=1)
+    if "ATR-bånd" in overlays:
+        # Samme avstand som stop loss i screeneren (RULES.stop_atr × ATR)
+        band = RULES.stop_atr * series["atr"]
+        for sign, label in ((1, "Close + ATR"), (-1, "Close − ATR")):
+            fig.add_trace(go.Scatter(x=shown.index, y=shown["Close"] + sign * band, name=label, mode="lines",
+                                     line=dict(width=1, dash="dot", color="#9ca3af")), row=1, col=1)
+    if rsi_row:
+        fig.add_trace(go.Scatter(x=shown.index, y=series["rsi"], name="RSI", mode="lines",
+                                 line=dict(width=1.4, color="#1a1a1a")), row=2, col=1)
+        for level in (30, 70):
+            fig.add_hline(y=level, line_dash="dot", line_color="#9ca3af", row=2, col=1)
+        fig.update_yaxes(range=[0, 100], row=2, col=1)
+
+    fig.add_hline(y=stop_loss, line_dash="dash", line_color="#ef4444", annotation_text=f"Stop: {stop_loss:.2f}",
+                  row=1, col=1)
+    fig.add_hline(y=target, line_dash="dash", line_color="#22c55e", annotation_text=f"Target: {target:.2f}",
+                  row=1, col=1)
+    fig.update_layout(height=450 + (150 if rsi_row else 0), xaxis_rangeslider_visible=False,
+                      template="plotly_white", margin=dict(l=0, r=0, t=20, b=0),
+                      showlegend=bool(set(overlays) - {"RSI"}), legend=dict(orientation="h", y=1.02),
+                      meta={"resolution": resolution})
+    return fig
@@ -0,0 +1,163 @@
+"""Asynkron prislasting: begrenset samtidighet, rate limiting, retry med backoff.
+
+``AsyncLoader`` har samme grensesnitt som ``BatchLoader`` (``load`` ->
+``LoadResult``), men sender kallene parallelt gjennom en semafor og en
+token bucket. Hvert kall har timeout og prøves på nytt med eksponentiell
+backoff og full jitter. Feiler en hel del, hentes tickerne i den enkeltvis,
+slik at én treg eller ugyldig ticker bare rammer seg selv.
+
+``download`` er en vanlig blokkerende funksjon (``yf.download`` eller
+``FakeSource.download``) og kjøres i en egen trådpool. Et kall som går ut
+på tid blir forlatt, ikke avbrutt, så tråden kan leve litt videre. Poolen
+har plass til ``concurrency`` aktive og like mange forlatte kall; blir det
+flere forlatte, byttes den ut (den gamle lukkes når kallene er ferdige),
+så hengende svar aldri blokkerer senere lastinger. ``close`` (eller
+``with``) lukker poolen.
+"""
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from engine.metrics import METRICS
+from engine.prices import LoadResult, _span, _yf_download, split_frame
+
+
+class TokenBucket:
+    """Snitt på ``rate`` kall per sekund, med opptil ``burst`` kall på rad."""
+
+    def __init__(self, rate, burst=None, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+        self._lock = threading.Lock()  # flere shards kan laste samtidig, hver i sin event-loop
+
+    async def acquire(self):
+        while True:
+            with self._lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            await asyncio.sleep(wait)
+
+
+def backoff(attempt, base=0.5, cap=10.0, rng=random):
+    """Ventetid før forsøk nr. ``attempt + 1`` (full jitter)."""
+    return rng.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def _reason(e, timeout):
+    if isinstance(e, asyncio.TimeoutError):
+        return f"timeout etter {timeout:g}s"
+    return f"{type(e).__name__}: {e}"
+
+
+class AsyncLoader:
+    def __init__(self, download=None, chunk_size=50, concurrency=4, rate=2.0, burst=5,
+                 timeout=30.0, retries=3, backoff_base=0.5, backoff_cap=10.0, seed=None, metrics=None):
+        self.download = download or _yf_download
+        self.metrics = metrics or METRICS
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(rate, burst)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_base, self.backoff_cap = backoff_base, backoff_cap
+        self.rng = random.Random(seed)
+        # Egen pool: asyncio.run venter på standardpoolen, også på forlatte kall
+        self._pool = self._new_pool()
+        self._abandoned = 0  # forlatte kall som kan holde en tråd i poolen
+        self._pool_lock = threading.Lock()
+
+    def _new_pool(self):
+        return ThreadPoolExecutor(self.concurrency * 2, thread_name_prefix="fetch")
+
+    def _executor(self):
+        with self._pool_lock:
+            return self._pool
+
+    def _abandon(self):
+        # Høyst ``concurrency`` aktive kall (semaforen); når de forlatte kan ta
+        # resten av trådene, får nye kall en ny pool
+        with self._pool_lock:
+            self._abandoned += 1
+            if self._abandoned >= self.concurrency:
+                self._pool.shutdown(wait=False)
+                self._pool = self._new_pool()
+                self._abandoned = 0
+                self.metrics.incr("fetch_pool_replaced")
+
+    def close(self):
+        """Lukker trådpoolen uten å vente på forlatte kall."""
+        with self._pool_lock:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def load(self, tickers, period="1y", interval="1d", start=None):
+        return asyncio.run(self.load_async(tickers, period, interval, start))
+
+    async def load_async(self, tickers, period="1y", interval="1d", start=None):
+        tickers = list(dict.fromkeys(tickers))
+        sem = asyncio.Semaphore(self.concurrency)
+        kwargs = dict(interval=interval, group_by="ticker", progress=False, threads=True, **_span(period, start))
+        chunks = [tickers[i:i + self.chunk_size] for i in range(0, len(tickers), self.chunk_size)]
+        result = LoadResult()
+        for part in await asyncio.gather(*(self._load_chunk(c, sem, kwargs) for c in chunks)):
+            result.merge(part)
+        return result
+
+    async def _request(self, names, sem, kwargs):
+        """Ett kall med timeout, retry og rate limiting; kaster siste feil."""
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.retries + 1):
+            await self.bucket.acquire()
+            async with sem:
+                t0 = time.perf_counter()
+                try:
+                    call = partial(self.download, names, **kwargs)
+                    raw = await asyncio.wait_for(loop.run_in_executor(self._executor(), call), self.timeout)
+                except Exception as e:
+                    error = e
+                    outcome = "timeout" if isinstance(e, asyncio.TimeoutError) else "feil"
+                    if outcome == "timeout":
+                        self._abandon()
+                else:
+                    outcome = "ok"
+                seconds = time.perf_counter() - t0
+                self.metrics.observe("fetch_request_seconds", seconds)
+                self.metrics.incr("fetch_requests", outcome=outcome)
+                if outcome == "ok":
+                    # Per ticker: tiden for kallet den var med i
+                    for t in names:
+                        self.metrics.set("fetch_seconds", seconds, ticker=t)
+                    return raw
+            if attempt < self.retries:
+                await asyncio.sleep(backoff(attempt, self.backoff_base, self.backoff_cap, self.rng))
+        raise error
+
+    async def _load_chunk(self, chunk, sem, kwargs):
+        try:
+            raw = await self._request(chunk, sem, kwargs)
+        except Exception as e:
+            if len(chunk) == 1:
+                return LoadResult(errors={chunk[0]: _reason(e, self.timeout)})
+            result = LoadResult()
+            parts = await asyncio.gather(*(self._load_chunk([t], sem, kwargs) for t in chunk))
+            for part in parts:
+                result.merge(part)
+            return result
+        # Tomme/manglende tickere er ikke forbigående feil og prøves ikke på nytt
+        return split_frame(raw, chunk)
@@ -0,0 +1,102 @@
+"""Innsidehandel, eiere og nyheter per ticker, hentet ved behov og cachet med TTL.
+
+Hver datatype har egen levetid. Samtidige forespørsler etter samme
+(ticker, type) deler ett kall, så en bakgrunns-prefetch og en visning av
+fanen aldri henter to ganger. Feil caches kort, slik at en treg eller
+utilgjengelig kilde ikke hamres ved hver rerun.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from engine.metrics import METRICS
+
+# Levetid i sekunder per datatype
+TTL = {
+    "insider": 6 * 3600,
+    "holders": 24 * 3600,
+    "news": 15 * 60,
+}
+ERROR_TTL = 60
+
+FETCHERS = {
+    "insider": lambda tk: tk.insider_transactions,
+    "holders": lambda tk: tk.major_holders,
+    "news": lambda tk: tk.news,
+}
+
+
+def _yf_ticker(symbol):
+    import yfinance as yf
+    return yf.Ticker(symbol)
+
+
+class FundamentalsService:
+    def __init__(self, ticker_factory=None, ttl=None, clock=time.monotonic, workers=4, metrics=None):
+        self.ticker_factory = ticker_factory or _yf_ticker
+        self.metrics = metrics or METRICS
+        self.ttl = {**TTL, **(ttl or {})}
+        self.clock = clock
+        self._cache = {}   # (ticker, kind) -> (utløper, verdi, feil)
+        self._locks = {}
+        self._guard = threading.Lock()
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="fundamentals")
+
+    def _lock(self, key):
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _fresh(self, key):
+        hit = self._cache.get(key)
+        if hit is not None and hit[0] > self.clock():
+            return hit
+        return None
+
+    def get(self, ticker, kind):
+        """Verdien for (ticker, kind); henter bare hvis cachen mangler eller er utløpt."""
+        key = (ticker, kind)
+        result = "hit"
+        hit = self._fresh(key)
+        if hit is None:
+            with self._lock(key):
+                hit = self._fresh(key)  # en annen tråd kan ha hentet mens vi ventet
+                if hit is None:
+                    result = "miss"
+                    t0 = time.perf_counter()
+                    try:
+                        value = FETCHERS[kind](self.ticker_factory(ticker))
+                        hit = (self.clock() + self.ttl[kind], value, None)
+                    except Exception as e:
+                        hit = (self.clock() + ERROR_TTL, None, e)
+                    self._cache[key] = hit
+                    self.metrics.observe("fundamentals_seconds", time.perf_counter() - t0, kind=kind)
+        self.metrics.incr("cache_requests", cache="fundamentals", kind=kind, result=result)
+        if hit[2] is not None:
+            raise hit[2]
+        return hit[1]
+
+    def insider(self, ticker):
+        return self.get(ticker, "insider")
+
+    def holders(self, ticker):
+        return self.get(ticker, "holders")
+
+    def news(self, ticker):
+        return self.get(ticker, "news")
+
+    def clear(self):
+        with self._guard:
+            self._cache.clear()
+
+    def prefetch(self, tickers, kinds=tuple(TTL)):
+        """Varmer opp cachen i bakgrunnen; returnerer med en gang."""
+        for t in tickers:
+            for kind in kinds:
+                if self._fresh((t, kind)) is None:
+                    self._pool.submit(self._quiet_get, t, kind)
+
+    def _quiet_get(self, ticker, kind):
+        try:
+            self.get(ticker, kind)
+        except Exception:
+            pass  # feilen ligger i cachen og vises når fanen åpnes
@@ -0,0 +1,165 @@
+"""Vektoriserte indikatorer over et bredt prispanel (dato × ticker).
+
+Alle indikatorene i fetch_and_analyze (RSI14, SMA20/50, ATR14, EMA12/26)
+beregnes for alle tickere i ett pass. Formlene følger pandas_ta (uten
+TA-Lib) operasjon for operasjon, slik at verdiene blir bit-identiske med
+per-ticker-kallene ``ta.rsi``/``ta.sma``/``ta.atr``/``ta.ema``.
+Se ``tests/test_indicator_parity.py``.
+
+Med Numba installert går rekursjonene (RSI, EMA, ATR) og SMA gjennom
+``engine.kernels``, med bit-identiske resultater.
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+from engine import kernels
+from engine.panel import compact, expand, layout
+
+# Indikatorene fetch_and_analyze bruker: navn -> (type, lengde)
+DEFAULT_SPEC = {
+    "rsi": ("rsi", 14),
+    "sma20": ("sma", 20),
+    "sma50": ("sma", 50),
+    "atr": ("atr", 14),
+    "ema12": ("ema", 12),
+    "ema26": ("ema", 26),
+}
+
+
+def _shift(a, n=1):
+    out = np.full(a.shape, np.nan)
+    out[n:] = a[:-n]
+    return out
+
+
+def _require(out, close, bars):
+    # pandas_ta returnerer None for serier kortere enn dette
+    return np.where((~np.isnan(close)).sum(axis=0) < bars, np.nan, out)
+
+
+def _presma(a, length):
+    """Setter første verdi til SMA av de ``length`` første barene (pandas_ta ``presma``)."""
+    valid = ~np.isnan(a)
+    first = np.argmax(valid, axis=0)
+    count = valid.sum(axis=0)
+    out = np.full(a.shape, np.nan)
+    cols = np.nonzero(count >= length)[0]
+    if len(cols):
+        rows = first[cols][:, None] + np.arange(length)
+        # Summeres langs en sammenhengende akse, som Series.mean() per ticker
+        seed = np.ascontiguousarray(a[rows, cols[:, None]]).sum(axis=1) / length
+        keep = np.arange(a.shape[0])[:, None] >= (first + length)
+        keep[:, count < length] = False
+        out[keep] = a[keep]
+        out[first[cols] + length - 1, cols] = seed
+    return out
+
+
+def sma(a, length):
+    # pandas_ta: convolve(ones(n) / n, x), summert eldste bar først
+    if kernels.enabled(a):
+        return kernels.sma(a, length).reshape(a.shape)
+    n = a.shape[0]
+    out = np.full(a.shape, np.nan)
+    if n < length:
+        return out
+    w = 1.0 / length
+    acc = np.zeros((n - length + 1,) + a.shape[1:])
+    for k in range(length):
+        acc += w * a[k:n - length + 1 + k]
+    out[length - 1:] = acc
+    return out
+
+
+def ema(a, length):
+    seeded = _presma(a, length)
+    if kernels.enabled(seeded):
+        return kernels.ewm(seeded, (length - 1) / 2.0)  # com som pandas regner fra span
+    return pd.DataFrame(seeded).ewm(span=length, adjust=False).mean().to_numpy()
+
+
+def rma(a, length):
+    if kernels.enabled(a):
+        return kernels.ewm(a, 1.0 / (1.0 / length) - 1.0)  # com som pandas regner fra alpha
+    return pd.DataFrame(a).ewm(alpha=1.0 / length, adjust=False).mean().to_numpy()
+
+
+def rsi(close, length=14):
+    if kernels.enabled(close) and close.ndim == 2:
+        return _require(kernels.rsi(close, 1.0 / (1.0 / length) - 1.0), close, length + 1)
+    diff = close - _shift(close)
+    positive = np.where(diff < 0, 0.0, diff)
+    negative = np.where(diff > 0, 0.0, diff)
+    positive_avg = rma(positive, length)
+    negative_avg = rma(negative, length)
+    out = 100 * positive_avg / (positive_avg + np.abs(negative_avg))
+    return _require(out, close, length + 1)
+
+
+def true_range(high, low, close):
+    if kernels.enabled(high, low, close) and close.ndim == 2:
+        return kernels.true_range(high, low, close, sys.float_info.epsilon)
+    hl = high - low
+    # pandas_ta non_zero_range: epsilon legges på hele serien hvis et spenn er 0
+    hl = np.where((hl == 0).any(axis=0), hl + sys.float_info.epsilon, hl)
+    pc = _shift(close)
+    return np.fmax(np.fmax(np.abs(hl), np.abs(high - pc)), np.abs(pc - low))
+
+
+def atr(high, low, close, length=14):
+    tr = true_range(high, low, close)
+    return _require(rma(_presma(tr, length), length), close, length + 1)
+
+
+def compute_arrays(o, spec=None):
+    """Indikatorer på kompakte OHLC-matriser (se ``compacted``)."""
+    out = {}
+    for name, (kind, length) in (spec or DEFAULT_SPEC).items():
+        if kind == "rsi":
+            out[name] = rsi(o["Close"], length)
+        elif kind == "sma":
+            out[name] = sma(o["Close"], length)
+        elif kind == "ema":
+            out[name] = ema(o["Close"], length)
+        elif kind == "atr":
+            out[name] = atr(o["High"], o["Low"], o["Close"], length)
+        else:
+            raise ValueError(f"Ukjent indikator: {kind}")
+    return out
+
+
+def compacted(panel):
+    """Kompakte OHLC-matriser (bars skjøvet mot siste rad) og layouten for ``expand``."""
+    where = layout(panel["Close"].notna().to_numpy())
+    return {f: compact(panel[f].to_numpy(), where) for f in ("Open", "High", "Low", "Close")}, where
+
+
+def compute(panel, spec=None):
+    """Fulle indikatorserier: navn -> DataFrame (dato × ticker)."""
+    o, where = compacted(panel)
+    values = compute_arrays(o, spec)
+    return {
+        name: pd.DataFrame(expand(v, where), index=panel.index, columns=panel.tickers)
+        for name, v in values.items()
+    }
+
+
+def latest(panel, spec=None):
+    """Siste verdier per ticker (ticker × kolonne), klar for signal-logikken.
+
+    I tillegg til indikatorene gis ``close``, ``prev_close`` og ``close_5``
+    (lukkekursen fem bars tilbake) og ``bars`` (antall bars).
+    """
+    o, _ = compacted(panel)
+    values = compute_arrays(o, spec)
+    close = o["Close"]
+    table = {
+        "bars": (~np.isnan(close)).sum(axis=0),
+        "close": close[-1],
+        "prev_close": close[-2] if len(close) > 1 else np.full(close.shape[1], np.nan),
+        "close_5": close[-5] if len(close) >= 5 else np.full(close.shape[1], np.nan),
+    }
+    table.update({name: v[-1] for name, v in values.items()})
+    return pd.DataFrame(table, index=pd.Index(panel.tickers, name="ticker"))
@@ -0,0 +1,196 @@
+"""Intradagsmodus (5m/15m/60m): ringbuffer per ticker i minnet, bare nye bars hentes.
+
+Første ``tick`` henter en kort historikk (``SEED_PERIOD``) og seeder en
+``IndicatorSet`` per ticker. Senere ticks ber bare om bars fra dagen til
+siste kjente bar; barene etter siste kjente tidspunkt legges på
+ringbufferen og indikatorene, og den siste kjente baren regnes om bare hvis
+den er revidert (OHLCV endret). Bare tickere som fikk nye eller endrede
+bars evalueres på nytt. Dagsmodus og prislageret berøres ikke.
+"""
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from engine.levels import nearest
+from engine.metrics import METRICS
+from engine.prices import OHLCV, LoadResult
+from engine.screen import screen_row
+from engine.streaming import IndicatorSet
+from engine.summary import SummaryTable
+
+# Historikk ved første henting; gir godt over 60 bars for hvert intervall
+SEED_PERIOD = {"5m": "5d", "15m": "5d", "60m": "1mo"}
+INTERVALS = tuple(SEED_PERIOD)
+
+
+class BarRing:
+    """De siste ``capacity`` barene (tid + OHLCV) i forhåndsallokerte arrays."""
+
+    __slots__ = ("times", "values", "start", "size", "tz")
+
+    def __init__(self, capacity):
+        self.times = np.zeros(capacity, dtype=np.int64)  # ns siden epoch (UTC)
+        self.values = np.full((capacity, len(OHLCV)), np.nan)
+        self.start = 0
+        self.size = 0
+        self.tz = None
+
+    @property
+    def capacity(self):
+        return len(self.times)
+
+    @property
+    def last(self):
+        if not self.size:
+            return None
+        ts = pd.Timestamp(self.times[(self.start + self.size - 1) % self.capacity], tz="UTC")
+        return ts.tz_convert(self.tz) if self.tz is not None else ts.tz_localize(None)
+
+    @property
+    def last_row(self):
+        """OHLCV for siste bar (en visning inn i bufferen)."""
+        return self.values[(self.start + self.size - 1) % self.capacity] if self.size else None
+
+    def append(self, ts, row):
+        """Legger til en bar; samme tidspunkt som siste bar overskriver den."""
+        ts = pd.Timestamp(ts)
+        self.tz = ts.tz
+        ns = ts.value
+        last = (self.start + self.size - 1) % self.capacity
+        if self.size and self.times[last] == ns:
+            i = last
+        elif self.size < self.capacity:
+            i = (self.start + self.size) % self.capacity
+            self.size += 1
+        else:
+            i = self.start
+            self.start = (self.start + 1) % self.capacity
+        self.times[i] = ns
+        self.values[i] = row
+
+    def extend(self, df):
+        df = df.reindex(columns=OHLCV)
+        for ts, row in zip(df.index[-self.capacity:], df.to_numpy(float)[-self.capacity:]):
+            self.append(ts, row)
+
+    def _order(self, n=None):
+        n = self.size if n is None else min(n, self.size)
+        return (self.start + np.arange(self.size - n, self.size)) % self.capacity
+
+    def column(self, name, n=None):
+        return self.values[self._order(n), OHLCV.index(name)]
+
+    def frame(self, n=None):
+        idx = self._order(n)
+        index = pd.DatetimeIndex(self.times[idx], tz="UTC", name="Datetime")
+        index = index.tz_convert(self.tz) if self.tz is not None else index.tz_localize(None)
+        return pd.DataFrame(self.values[idx], index=index, columns=OHLCV)
+
+
+class IntradayScreener:
+    """Screener på intradagsbars; ``tick`` gir samme (tabell, feilet, utdatert) som dagsmodus."""
+
+    def __init__(self, loader, interval="15m", capacity=500, lookback=60, width=1, poll=60, spec=None):
+        if interval not in SEED_PERIOD:
+            raise ValueError(f"Ukjent intervall: {interval} (gyldige: {', '.join(INTERVALS)})")
+        self.loader = loader
+        self.interval = interval
+        self.capacity = capacity
+        self.lookback, self.width = lookback, width
+        self.poll = poll  # minste antall sekunder mellom hentinger
+        self.spec = spec
+        self.rings, self.sets = {}, {}
+        self.rows = {}    # ticker -> (rad, grunn) fra siste evaluering
+        self.stale = {}
+        self.updated = None
+        self._polled = None
+        self._result = None
+        self._lock = threading.Lock()
+
+    def tick(self, tickers, force=False):
+        """Henter nye bars (høyst hvert ``poll`` sekund) og evaluerer endrede tickere på nytt."""
+        tickers = list(dict.fromkeys(tickers))
+        with self._lock:
+            fresh = self._polled is not None and time.monotonic() - self._polled < self.poll
+            if fresh and not force and self._result is not None and self._result[0] == tickers:
+                METRICS.incr("cache_requests", cache="intraday", result="hit")
+                return self._result[1]
+            METRICS.incr("cache_requests", cache="intraday", result="miss")
+
+            with METRICS.span("last", mode="intradag"):
+                loaded = self._fetch(tickers)
+            self._polled = time.monotonic()
+            with METRICS.span("evaluering", mode="intradag"):
+                for t, df in loaded.frames.items():
+                    if self._apply(t, df):
+                        self.rows[t] = self._evaluate(t)
+            for t, reason in loaded.errors.items():
+                if t in self.sets:
+                    self.stale[t] = reason  # eldre bars i bufferen brukes videre
+                else:
+                    self.rows[t] = (None, reason)
+            for t in loaded.frames:
+                self.stale.pop(t, None)
+            self.updated = datetime.now(timezone.utc)
+
+            results = [self.rows[t][0] for t in tickers if t in self.rows and self.rows[t][0] is not None]
+            failed = {t: self.rows[t][1] for t in tickers if t in self.rows and self.rows[t][1]}
+            stale = {t: r for t, r in self.stale.items() if t in tickers and t not in failed}
+            result = (SummaryTable.from_rows(results), failed, stale)
+            self._result = (tickers, result)
+            return result
+
+    def history(self, ticker, bars=90):
+        """De siste barene fra bufferen (til grafen)."""
+        ring = self.rings.get(ticker)
+        return ring.frame(bars) if ring is not None else pd.DataFrame(columns=OHLCV)
+
+    def _fetch(self, tickers):
+        result = LoadResult()
+        new = [t for t in tickers if t not in self.sets]
+        if new:
+            result.merge(self.loader.load(new, period=SEED_PERIOD[self.interval], interval=self.interval))
+        # Kjente tickere: bare fra dagen til siste bar, gruppert så hver dag blir ett kall
+        by_day = {}
+        for t in tickers:
+            if t in self.sets:
+                by_day.setdefault(self.rings[t].last.normalize(), []).append(t)
+        for day, group in by_day.items():
+            result.merge(self.loader.load(group, period=SEED_PERIOD[self.interval],
+                                          interval=self.interval, start=day))
+        return result
+
+    def _apply(self, t, df):
+        """Legger nye bars på buffer og indikatorer; True hvis noe endret seg."""
+        s = self.sets.get(t)
+        if s is None:
+            self.sets[t] = IndicatorSet.seeded(df, self.spec)
+            self.rings[t] = ring = BarRing(self.capacity)
+            ring.extend(df)
+            return True
+        new = df[df.index >= s.last_date]
+        if len(new) and new.index[0] == s.last_date:
+            # Siste kjente bar hentes alltid på nytt; den teller bare hvis den er revidert
+            row = new.iloc[:1].reindex(columns=OHLCV).to_numpy(float)[0]
+            if np.array_equal(row, self.rings[t].last_row, equal_nan=True):
+                new = new.iloc[1:]
+        if new.empty:
+            return False
+        s.extend(new)
+        self.rings[t].extend(new)
+        if not s.exact:
+            # Første bar med null spenn: ATR må regnes om, fra det bufferen har
+            self.sets[t] = IndicatorSet.seeded(self.rings[t].frame(), self.spec)
+        return True
+
+    def _evaluate(self, t):
+        ring, values = self.rings[t], self.sets[t].values()
+        high, low = ring.column("High", self.lookback), ring.column("Low", self.lookback)
+        resistance, support = nearest(high[:, None], low[:, None], [values["close"]], self.width)
+        try:
+            return screen_row(t, values, values["bars"], resistance[0], support[0])
+        except Exception as e:
+            return None, f"{type(e).__name__}: {e}"
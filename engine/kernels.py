@@ -0,0 +1,234 @@
+"""Valgfrie Numba-kjerner for rekursjonene (RSI/EMA/ATR), SMA og signalreglene.
+
+Referansen er NumPy/pandas-koden i ``engine.indicators`` og
+``engine.signals``. Kjernene her gjør det samme i ett pass over
+sammenhengende float64-matriser (bars × ticker), rad for rad med tilstand
+per ticker, uten mellomresultater. Operasjonene er de samme og i samme
+rekkefølge som i referansen (``ewm`` følger pandas' ``ewm(adjust=False)``
+linje for linje), så resultatene er bit-identiske. Se
+``scripts/bench_kernels.py``, som også sjekker dette.
+
+Numba er valgfritt: uten det (eller med ``KMAN_KERNELS=off``) brukes
+referansen. Kompilert kode caches på disk (``cache=True``), så bare første
+kjøring på en maskin venter på kompileringen.
+"""
+import os
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+AVAILABLE = njit is not None
+# Kan slås av i prosessen, f.eks. for å sammenligne med referansen
+ACCELERATED = AVAILABLE and os.environ.get("KMAN_KERNELS", "").lower() != "off"
+
+
+def enabled(*arrays):
+    """True når kjernene er på og alle ``arrays`` er float64-matriser med samme form."""
+    if not ACCELERATED:
+        return False
+    shape = np.shape(arrays[0])
+    return all(isinstance(a, np.ndarray) and a.dtype == np.float64 and a.ndim >= 1 and a.shape == shape
+               for a in arrays)
+
+
+def _matrix(a):
+    a = np.ascontiguousarray(a, dtype=np.float64)
+    return a.reshape(a.shape[0], -1)
+
+
+def _jit(fn):
+    return njit(cache=True, nogil=True)(fn) if AVAILABLE else fn
+
+
+@_jit
+def _ewm_step(weighted, old_wt, cur, alpha, com):
+    # pandas _libs/window/aggregations.pyx: ewm(), adjust=False, ignore_na=False, normalize=True
+    if weighted == weighted:
+        old_wt *= 1.0 - alpha
+        if cur == cur:
+            if weighted != cur:
+                new_wt = alpha
+                if com == 1:
+                    new_wt = 1.0 - old_wt
+                weighted = old_wt * weighted + new_wt * cur
+                weighted /= (old_wt + new_wt)
+            old_wt = 1.0
+    elif cur == cur:
+        weighted = cur
+    return weighted, old_wt
+
+
+@_jit
+def _ewm(a, com, out):
+    n, m = a.shape
+    alpha = 1.0 / (1.0 + com)
+    weighted = np.empty(m)
+    old_wt = np.ones(m)
+    for j in range(m):
+        weighted[j] = a[0, j]
+        out[0, j] = a[0, j]
+    for i in range(1, n):
+        for j in range(m):
+            weighted[j], old_wt[j] = _ewm_step(weighted[j], old_wt[j], a[i, j], alpha, com)
+            out[i, j] = weighted[j]
+
+
+@_jit
+def _rsi(close, com, out):
+    n, m = close.shape
+    alpha = 1.0 / (1.0 + com)
+    pos, neg = np.empty(m), np.empty(m)
+    pos_wt, neg_wt = np.ones(m), np.ones(m)
+    for j in range(m):
+        pos[j] = neg[j] = out[0, j] = np.nan  # første differanse mangler
+    for i in range(1, n):
+        for j in range(m):
+            diff = close[i, j] - close[i - 1, j]
+            up = 0.0 if diff < 0 else diff
+            down = 0.0 if diff > 0 else diff
+            pos[j], pos_wt[j] = _ewm_step(pos[j], pos_wt[j], up, alpha, com)
+            neg[j], neg_wt[j] = _ewm_step(neg[j], neg_wt[j], down, alpha, com)
+            out[i, j] = 100 * pos[j] / (pos[j] + abs(neg[j]))
+
+
+@_jit
+def _sma(a, length, out):
+    n, m = a.shape
+    w = 1.0 / length
+    for i in range(n):
+        for j in range(m):
+            out[i, j] = np.nan
+    acc = np.empty(m)
+    for i in range(length - 1, n):
+        base = i - length + 1
+        # Summert eldste bar først, rad for rad (sammenhengende i minnet)
+        acc[:] = 0.0
+        for k in range(length):
+            for j in range(m):
+                acc[j] += w * a[base + k, j]
+        out[i] = acc
+
+
+@_jit
+def _fmax(a, b):
+    # np.fmax: NaN bare når begge er NaN
+    if a != a:
+        return b
+    if b != b:
+        return a
+    return a if a >= b else b
+
+
+@_jit
+def _true_range(high, low, close, eps, out):
+    n, m = close.shape
+    flat = np.zeros(m, dtype=np.bool_)
+    for i in range(n):
+        for j in range(m):
+            if high[i, j] - low[i, j] == 0:
+                flat[j] = True
+    for i in range(n):
+        for j in range(m):
+            hl = high[i, j] - low[i, j]
+            if flat[j]:
+                hl = hl + eps
+            pc = close[i - 1, j] if i > 0 else np.nan
+            out[i, j] = _fmax(_fmax(abs(hl), abs(high[i, j] - pc)), abs(pc - low[i, j]))
+
+
+@_jit
+def _evaluate(close, rsi, sma20, sma50, ema12, ema26, five_day, pot_pct, p, code, prob):
+    (rsi_buy, rsi_low, rsi_sell, strong_momentum, good_upside,
+     w_rsi_buy, w_rsi_low, w_sma20, w_sma50, w_ema, w_momentum, w_strong_momentum, w_upside,
+     buy_bonus, buy_cap, sell_penalty, sell_floor, hold_penalty, hold_floor) = p
+    for i in range(close.shape[0]):
+        c, r = close[i], rsi[i]
+        above20, above50, rising = c > sma20[i], c > sma50[i], ema12[i] > ema26[i]
+        if r < rsi_buy and above20 and above50 and rising and five_day[i] > 0:
+            code[i] = 0
+        elif r > rsi_sell or (c < sma20[i] and c < sma50[i]):
+            code[i] = 2
+        else:
+            code[i] = 1
+        score = 0
+        if r < rsi_buy:
+            score += w_rsi_buy
+        if r < rsi_low:
+            score += w_rsi_low
+        if above20:
+            score += w_sma20
+        if above50:
+            score += w_sma50
+        if rising:
+            score += w_ema
+        if five_day[i] > 0:
+            score += w_momentum
+        if five_day[i] > strong_momentum:
+            score += w_strong_momentum
+        if pot_pct[i] > good_upside:
+            score += w_upside
+        if code[i] == 0:
+            prob[i] = min(score + buy_bonus, buy_cap)
+        elif code[i] == 2:
+            prob[i] = max(score - sell_penalty, sell_floor)
+        else:
+            prob[i] = max(score - hold_penalty, hold_floor)
+
+
+def ewm(a, com):
+    """``DataFrame(a).ewm(com=com, adjust=False).mean()`` per kolonne."""
+    a = _matrix(a)
+    out = np.empty(a.shape)
+    if len(a):
+        _ewm(a, float(com), out)
+    return out
+
+
+def rsi(close, com):
+    """RSI uten historikkravet (``indicators.rsi`` legger det på)."""
+    close = _matrix(close)
+    out = np.empty(close.shape)
+    if len(close):
+        _rsi(close, float(com), out)
+    return out
+
+
+def sma(a, length):
+    a = _matrix(a)
+    out = np.empty(a.shape)
+    _sma(a, length, out)
+    return out
+
+
+def true_range(high, low, close, eps):
+    close = _matrix(close)
+    out = np.empty(close.shape)
+    if len(close):
+        _true_range(_matrix(high), _matrix(low), close, float(eps), out)
+    return out
+
+
+_THRESHOLDS = ("rsi_buy", "rsi_low", "rsi_sell", "strong_momentum", "good_upside")
+_WEIGHTS = ("w_rsi_buy", "w_rsi_low", "w_sma20", "w_sma50", "w_ema", "w_momentum", "w_strong_momentum",
+            "w_upside", "buy_bonus", "buy_cap", "sell_penalty", "sell_floor", "hold_penalty", "hold_floor")
+
+
+def integer_weights(rules):
+    """Kjernen regner scoren i heltall; med andre vekter (f.eks. float) brukes referansen."""
+    return all(isinstance(getattr(rules, w), (int, np.integer)) for w in _WEIGHTS)
+
+
+def evaluate(close, rsi, sma20, sma50, ema12, ema26, five_day, pot_pct, rules):
+    """Signalkode og prob som ``signals.evaluate`` uten høyere tidsrammer (int64, samme form)."""
+    shape = np.shape(close)
+    arrays = [np.ascontiguousarray(x, dtype=np.float64).ravel()
+              for x in (close, rsi, sma20, sma50, ema12, ema26, five_day, pot_pct)]
+    p = tuple(float(getattr(rules, t)) for t in _THRESHOLDS) + tuple(int(getattr(rules, w)) for w in _WEIGHTS)
+    code = np.empty(arrays[0].shape, dtype=np.int64)
+    prob = np.empty(arrays[0].shape, dtype=np.int64)
+    _evaluate(*arrays, p, code, prob)
+    return code.reshape(shape), prob.reshape(shape)
@@ -0,0 +1,76 @@
+"""Pivot-baserte motstands- og støttenivåer for alle tickere samtidig.
+
+En pivot-topp er en bar der High er strengt høyere enn de ``width`` barene
+på hver side; en pivot-bunn tilsvarende for Low. Med ``lookback=60`` og
+``width=1`` er dette nøyaktig target-søket fetch_and_analyze gjorde med
+listeforståelse over ``df['High'].tail(60)``.
+"""
+import numpy as np
+import pandas as pd
+
+from engine.panel import tail
+
+
+def pivots(values, width=1, kind="high"):
+    """Boolsk maske (bars × ticker) for pivot-topper (``high``) eller -bunner (``low``)."""
+    values = np.asarray(values, dtype=float)
+    n = values.shape[0]
+    mask = np.zeros(values.shape, dtype=bool)
+    if n < 2 * width + 1:
+        return mask
+    centre = values[width:n - width]
+    inner = np.ones(centre.shape, dtype=bool)
+    for k in range(1, width + 1):
+        before = values[width - k:n - width - k]
+        after = values[width + k:n - width + k]
+        if kind == "high":
+            inner &= (centre > before) & (centre > after)
+        else:
+            inner &= (centre < before) & (centre < after)
+    mask[width:n - width] = inner
+    return mask
+
+
+def nearest(high, low, close, width=1):
+    """Nærmeste pivot-topp over og pivot-bunn under ``close`` per kolonne (NaN om ingen)."""
+    close = np.asarray(close, dtype=float)
+    tops = np.where(pivots(high, width, "high") & (high > close), high, np.inf).min(axis=0)
+    bottoms = np.where(pivots(low, width, "low") & (low < close), low, -np.inf).max(axis=0)
+    return np.where(np.isinf(tops), np.nan, tops), np.where(np.isinf(bottoms), np.nan, bottoms)
+
+
+def rolling_resistance(high, close, lookback=60, width=1):
+    """Nærmeste pivot-topp over ``close`` innenfor de siste ``lookback`` barene, for hver bar.
+
+    Samme regel som ``nearest`` anvendt på ``high[t - lookback + 1 : t + 1]``
+    for hver rad ``t``, men uten å bygge vinduene: én vektorisert sammenligning
+    per forskyvning. Matrisene må være kompakte (se ``engine.panel.layout``).
+    """
+    high = np.asarray(high, dtype=float)
+    piv = pivots(high, width, "high")
+    best = np.full(high.shape, np.inf)
+    # En pivot d bars tilbake har begge naboene innenfor vinduet
+    for d in range(width, lookback - width):
+        h = np.full(high.shape, np.nan)
+        h[d:] = high[:-d] if d else high
+        p = np.zeros(high.shape, dtype=bool)
+        p[d:] = piv[:-d] if d else piv
+        np.minimum(best, np.where(p & (h > close), h, np.inf), out=best)
+    return np.where(np.isinf(best), np.nan, best)
+
+
+def levels(panel, lookback=60, width=1, close=None):
+    """Motstand og støtte per ticker innenfor de siste ``lookback`` barene.
+
+    Returnerer DataFrame (ticker × ``resistance``/``support``). ``close``
+    er som standard siste lukkekurs per ticker.
+    """
+    high = tail(panel, "High", lookback)
+    low = tail(panel, "Low", lookback)
+    if close is None:
+        close = tail(panel, "Close", 1)[0]
+    resistance, support = nearest(high, low, close, width)
+    return pd.DataFrame(
+        {"resistance": resistance, "support": support},
+        index=pd.Index(panel.tickers, name="ticker"),
+    )
@@ -0,0 +1,153 @@
+"""Enkel instrumentering: tidsspenn, tellere og målinger i en felles registry.
+
+``METRICS.span("last")`` tar tiden for et stadium; ``incr`` teller f.eks.
+cache-treff og -bom, og ``set`` holder siste verdi (f.eks. hentetid per
+ticker). Alt er trådsikkert, siden analysen kjører i bakgrunnstråder.
+
+Innholdet kan leses som tabeller (``snapshot``, til diagnosepanelet) eller
+som Prometheus-tekstformat (``prometheus``/``write``), som kan skrapes
+lokalt med node_exporters textfile-collector. Hvert avsluttet spenn logges
+også som en JSON-linje på DEBUG-nivå.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+PREFIX = "kman_"
+
+log = logging.getLogger(__name__)
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _labels(items, **extra):
+    items = [*items, *extra.items()]
+    if not items:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+
+class Metrics:
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._timings = {}   # (navn, labels) -> [antall, sum, maks, siste]
+        self._counters = {}  # (navn, labels) -> verdi
+        self._gauges = {}    # (navn, labels) -> siste verdi
+        self._written = None  # clock() ved siste write_every
+
+    @contextmanager
+    def span(self, stage, **labels):
+        """Tar tiden for et stadium som ``stage_seconds{stage=...}``."""
+        t0 = self.clock()
+        try:
+            yield
+        finally:
+            seconds = self.clock() - t0
+            self.observe("stage_seconds", seconds, stage=stage, **labels)
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug(json.dumps({"stage": stage, "seconds": round(seconds, 6), **labels}))
+
+    def observe(self, name, seconds, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            t = self._timings.get(key)
+            if t is None:
+                self._timings[key] = [1, seconds, seconds, seconds]
+            else:
+                t[0] += 1
+                t[1] += seconds
+                t[2] = max(t[2], seconds)
+                t[3] = seconds
+
+    def incr(self, name, n=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + n
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def reset(self):
+        with self._lock:
+            self._timings.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+    def snapshot(self):
+        """Kopi av alle verdier som lister av dicts (én per serie)."""
+        with self._lock:
+            timings = [{"name": n, **dict(lb), "count": c, "sum": s, "max": m, "last": last}
+                       for (n, lb), (c, s, m, last) in self._timings.items()]
+            counters = [{"name": n, **dict(lb), "value": v} for (n, lb), v in self._counters.items()]
+            gauges = [{"name": n, **dict(lb), "value": v} for (n, lb), v in self._gauges.items()]
+        return {"timings": timings, "counters": counters, "gauges": gauges}
+
+    def prometheus(self):
+        """Alle serier i Prometheus' tekstformat."""
+        with self._lock:
+            timings = sorted(self._timings.items())
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+        lines = []
+        typed = set()
+
+        def header(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, lb), (count, total, _, _) in timings:
+            name = PREFIX + name
+            header(name, "summary")
+            lines.append(f"{name}_count{_labels(lb)} {count}")
+            lines.append(f"{name}_sum{_labels(lb)} {total:.6f}")
+        # Linjene i en familie må stå samlet, derfor én runde per gauge
+        for suffix, i in (("_max", 2), ("_last", 3)):
+            for (name, lb), values in timings:
+                name = PREFIX + name + suffix
+                header(name, "gauge")
+                lines.append(f"{name}{_labels(lb)} {values[i]:.6f}")
+        for (name, lb), value in counters:
+            name = f"{PREFIX}{name}_total"
+            header(name, "counter")
+            lines.append(f"{name}{_labels(lb)} {value}")
+        for (name, lb), value in gauges:
+            name = PREFIX + name
+            header(name, "gauge")
+            lines.append(f"{name}{_labels(lb)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Skriver ``prometheus()`` atomisk til ``path`` (textfile-collector)."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(self.prometheus())
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def write_every(self, path, seconds):
+        """Som ``write``, men høyst hvert ``seconds`` sekund (f.eks. fra hver rerun); True hvis skrevet."""
+        now = self.clock()
+        with self._lock:
+            if self._written is not None and now - self._written < seconds:
+                return False
+            self._written = now
+        self.write(path)
+        return True
+
+
+# Felles for hele prosessen; analysen i bakgrunnstråden og sidene skriver hit
+METRICS = Metrics()
@@ -0,0 +1,78 @@
+"""Bredt prispanel (dato × ticker) bygget fra frames per ticker."""
+import numpy as np
+import pandas as pd
+
+from engine.prices import OHLCV
+
+
+class PricePanel:
+    """Ett DataFrame (dato × ticker) per OHLCV-felt, på felles datoakse."""
+
+    def __init__(self, fields):
+        self.fields = fields
+        close = fields["Close"]
+        self.index = close.index
+        self.tickers = list(close.columns)
+
+    @classmethod
+    def from_frames(cls, frames, tickers=None):
+        tickers = [t for t in (tickers or frames) if t in frames]
+        if not tickers:
+            return cls({f: pd.DataFrame(dtype=float) for f in OHLCV})
+        # Én concat for alle tickere; kolonner (ticker, felt)
+        wide = pd.concat({t: frames[t].reindex(columns=OHLCV) for t in tickers}, axis=1).sort_index()
+        fields = {
+            f: wide.xs(f, axis=1, level=1).reindex(columns=tickers).astype(float)
+            for f in OHLCV
+        }
+        return cls(fields)
+
+    def __getitem__(self, field):
+        return self.fields[field]
+
+    def __len__(self):
+        return len(self.index)
+
+    def frame(self, ticker):
+        """OHLCV for én ticker, uten datoer tickeren ikke handlet."""
+        df = pd.DataFrame({f: self.fields[f][ticker] for f in OHLCV})
+        return df[df["Close"].notna()]
+
+    def bars(self):
+        """Antall bars per ticker."""
+        return self.fields["Close"].notna().sum()
+
+
+def layout(mask):
+    """Radplassering for ``compact``/``expand`` ut fra hvilke celler som har data.
+
+    Indikatorene beregnes på en kompakt matrise der hver kolonnes gyldige
+    bars er skjøvet ned mot siste rad. Da ser hver ticker nøyaktig sin egen
+    bar-sekvens (som ved beregning per ticker), selv om panelet har hull der
+    tickere ikke handlet.
+    """
+    valid = np.asarray(mask, dtype=bool)
+    rows = np.cumsum(valid, axis=0) - 1 + (valid.shape[0] - valid.sum(axis=0))
+    r, c = np.nonzero(valid)
+    return r, c, rows[r, c], valid.shape
+
+
+def compact(values, where):
+    r, c, dst, shape = where
+    out = np.full(shape, np.nan)
+    out[dst, c] = np.asarray(values, dtype=float)[r, c]
+    return out
+
+
+def expand(values, where):
+    """Motsatt av ``compact``: legger verdier tilbake på datoaksen."""
+    r, c, dst, shape = where
+    out = np.full(shape, np.nan)
+    out[r, c] = values[dst, c]
+    return out
+
+
+def tail(panel, field, n):
+    """Siste ``n`` bars per ticker som matrise (n × ticker), NaN der historikken er kortere."""
+    where = layout(panel["Close"].notna().to_numpy())
+    return compact(panel[field].to_numpy(), where)[-n:]
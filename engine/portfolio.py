@@ -0,0 +1,245 @@
+"""Risiko på porteføljenivå: korrelasjon, posisjonsstørrelser og BUY-klynger.
+
+Kovarians- og korrelasjonsmatrisen regnes for hele listen samtidig fra
+log-avkastningen i prispanelet (siste ``WINDOW`` dager), parvis over dagene
+begge tickerne har kurs, som ``DataFrame.corr``. Matrisene holdes som
+løpende summer (antall, summer, kvadratsummer og kryssprodukter, fire
+matriseprodukter), så når nye bars kommer legges bare de nye dagene til og
+de som faller ut av vinduet trekkes fra. En revidert siste bar (dagen er
+ikke ferdig) er én dag ut og én inn.
+
+Posisjonsstørrelsen er antall aksjer der tapet ned til stop (``stop_atr`` ×
+ATR under kurs, se ``risk_kr``) er ``risk_pct`` av kapitalen, begrenset til
+``MAX_WEIGHT`` av kapitalen per posisjon og til kapitalen som er igjen.
+BUY-kandidater med korrelasjon over ``CLUSTER_CORR`` (direkte eller via
+hverandre) er én klynge: de svinger sammen, så risikoen i klyngen er
+summen av posisjonene.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from engine.metrics import METRICS
+from engine.sectors import sector_name
+from engine.signals import SIGNALS
+
+WINDOW = 250        # dager med avkastning (ca. ett år)
+MIN_OBS = 60        # felles dager før et par får korrelasjon
+TRADING_DAYS = 252  # annualisering av volatilitet
+CLUSTER_CORR = 0.7
+RISK_PCT = 1.0      # prosent av kapitalen som tapes hvis stop treffes
+MAX_WEIGHT = 0.2    # største posisjon som andel av kapitalen
+
+
+def log_returns(close):
+    """Daglig log-avkastning (dager - 1 × ticker); NaN der en av dagene mangler kurs."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.diff(np.log(close), axis=0)
+
+
+class Comoments:
+    """Løpende summer for parvis kovarians over et sett med dager."""
+
+    def __init__(self, n):
+        self.count = np.zeros((n, n))  # felles dager per par
+        self.sums = np.zeros((n, n))   # [i, j]: sum av avkastningen til i over dagene felles med j
+        self.squares = np.zeros((n, n))
+        self.products = np.zeros((n, n))
+
+    def update(self, added, removed=None):
+        """Legger til dagene i ``added`` og trekker fra dagene i ``removed``."""
+        if removed is not None and len(removed):
+            returns = np.vstack([added, removed])
+            sign = np.repeat([1.0, -1.0], [len(added), len(removed)])[:, None]
+        else:
+            returns, sign = added, 1.0
+        if not len(returns):
+            return
+        valid = ~np.isnan(returns)
+        mask = valid.astype(float)
+        x = np.where(valid, returns, 0.0)
+        signed = sign * mask
+        # Ett matriseprodukt per sum, lagt til på plass (matrisene er n × n)
+        self.count += signed.T @ mask
+        self.sums += (sign * x).T @ mask
+        self.squares += (sign * x * x).T @ mask
+        self.products += (sign * x).T @ x
+
+    def matrices(self, min_obs=MIN_OBS):
+        """(kovarians, korrelasjon); NaN for par med færre enn ``min_obs`` felles dager."""
+        n, s = self.count, self.sums
+        with np.errstate(divide="ignore", invalid="ignore"):
+            centered = s * s.T
+            centered /= n
+            np.subtract(self.products, centered, out=centered)
+            # [i, j]: variasjonen til i over dagene felles med j
+            spread = s * s
+            spread /= n
+            np.subtract(self.squares, spread, out=spread)
+            np.maximum(spread, 0.0, out=spread)
+            cov = centered / (n - 1)
+            spread *= spread.T
+            np.sqrt(spread, out=spread)
+            corr = np.divide(centered, spread, out=centered)
+            np.clip(corr, -1.0, 1.0, out=corr)
+        short = n < max(min_obs, 2)
+        cov[short] = np.nan
+        corr[short] = np.nan
+        return cov, corr
+
+
+class Risk:
+    """Kovarians og korrelasjon for ``tickers`` per ``asof`` (siste dag i vinduet)."""
+
+    def __init__(self, tickers, asof, covariance, correlation):
+        self.tickers = list(tickers)
+        self.asof = asof
+        self.covariance = covariance    # daglig, log-avkastning
+        self.correlation = correlation
+        self._pos = {t: i for i, t in enumerate(self.tickers)}
+
+    def volatility(self):
+        """Annualisert volatilitet per ticker."""
+        return pd.Series(np.sqrt(np.diag(self.covariance) * TRADING_DAYS), index=self.tickers)
+
+    def frame(self, tickers=None):
+        """Korrelasjonsmatrisen som DataFrame, eventuelt for et utvalg tickere."""
+        tickers = self.tickers if tickers is None else [t for t in tickers if t in self._pos]
+        idx = [self._pos[t] for t in tickers]
+        return pd.DataFrame(self.correlation[np.ix_(idx, idx)], index=tickers, columns=tickers)
+
+    def clusters(self, tickers, threshold=CLUSTER_CORR):
+        """Grupper av ``tickers`` som henger sammen med korrelasjon ≥ ``threshold``, største først."""
+        tickers = [t for t in tickers if t in self._pos]
+        idx = [self._pos[t] for t in tickers]
+        linked = self.correlation[np.ix_(idx, idx)] >= threshold  # NaN gir False
+        reach = linked | np.eye(len(idx), dtype=bool)
+        # Transitiv tillukning ved kvadrering: log2(k) matriseprodukter
+        while True:
+            wider = (reach.astype(np.int32) @ reach.astype(np.int32)) > 0
+            if np.array_equal(wider, reach):
+                break
+            reach = wider
+        groups = {tuple(np.flatnonzero(row)) for row in reach}
+        out = [[tickers[i] for i in g] for g in groups if len(g) > 1]
+        return sorted(out, key=lambda g: (-len(g), g))
+
+    def portfolio_volatility(self, values):
+        """Annualisert volatilitet i kroner for posisjoner ``{ticker: verdi}``."""
+        idx = [self._pos[t] for t in values if t in self._pos]
+        v = np.array([values[t] for t in values if t in self._pos], dtype=float)
+        cov = np.nan_to_num(self.covariance[np.ix_(idx, idx)])
+        return float(np.sqrt(max(v @ cov @ v, 0.0) * TRADING_DAYS))
+
+
+class RiskModel:
+    """Korrelasjon/kovarians for et prispanel, oppdatert inkrementelt mellom kall."""
+
+    def __init__(self, window=WINDOW, min_obs=MIN_OBS, metrics=None):
+        self.window, self.min_obs = window, min_obs
+        self.metrics = metrics or METRICS
+        self._tickers = None
+        self._dates = None
+        self._returns = None
+        self._moments = None
+        self._drift = 0  # dager lagt til/trukket fra siden siste fulle beregning
+        self._lock = threading.Lock()
+
+    def update(self, panel):
+        """``Risk`` for panelets tickere over de siste ``window`` dagene."""
+        returns = log_returns(panel["Close"].to_numpy(float))[-self.window:]
+        dates = panel.index[1:][-self.window:]
+        with self._lock, self.metrics.span("risiko"):
+            changed = self._changed(panel.tickers, dates, returns)
+            if changed is None:
+                self._moments = Comoments(len(panel.tickers))
+                self._moments.update(returns)
+                self._drift = 0
+                mode = "full"
+            else:
+                removed, added = changed
+                self._moments.update(added, removed)
+                self._drift += len(added) + len(removed)
+                mode = "inkrementell"
+            self.metrics.incr("risk_updates", mode=mode)
+            self._tickers, self._dates, self._returns = list(panel.tickers), dates, returns
+            cov, corr = self._moments.matrices(self.min_obs)
+        return Risk(panel.tickers, dates[-1] if len(dates) else None, cov, corr)
+
+    def _changed(self, tickers, dates, returns):
+        """(dager ut, dager inn) siden forrige kall, eller None når alt må regnes på nytt."""
+        if self._moments is None or tickers != self._tickers or self._drift >= self.window:
+            return None
+        pos = self._dates.get_indexer(dates)  # -1 for nye dager
+        kept = pos >= 0
+        # Dager som finnes fra før, men med endrede kurser (revidert siste bar), byttes ut
+        kept[kept] = np.all((self._returns[pos[kept]] == returns[kept])
+                            | (np.isnan(self._returns[pos[kept]]) & np.isnan(returns[kept])), axis=1)
+        old = np.ones(len(self._returns), dtype=bool)
+        old[pos[kept]] = False
+        removed, added = self._returns[old], returns[~kept]
+        if len(removed) + len(added) >= len(returns):
+            return None  # like dyrt å regne alt
+        return removed, added
+
+
+def position_sizes(table, capital, risk_pct=RISK_PCT, max_weight=MAX_WEIGHT, signals=("BUY",)):
+    """Foreslåtte posisjoner for radene med ``signals``, i rangert rekkefølge.
+
+    Kolonner: ticker, sektor, pris, aksjer, verdi, vekt (andel av kapitalen)
+    og risiko (kroner tapt hvis stop treffes).
+    """
+    codes = [SIGNALS.index(s) for s in signals]
+    order = table.order()
+    idx = order[np.isin(table.code[order], codes)]
+    price, risk = table.column("pris")[idx], table.column("risk_kr")[idx]
+    budget = capital * risk_pct / 100
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shares = np.minimum(np.floor(budget / risk), np.floor(capital * max_weight / price))
+    shares = np.where(np.isfinite(shares) & (shares > 0), shares, 0).astype(np.int64)
+    # Kapitalen fordeles i rangert rekkefølge; når den er brukt opp blir resten mindre eller 0
+    left = capital
+    for k in np.flatnonzero(shares):
+        shares[k] = min(shares[k], left // price[k])
+        left -= shares[k] * price[k]
+    value = shares * price
+    tickers = table.ticker[idx]
+    return pd.DataFrame({
+        "ticker": tickers,
+        "sektor": [sector_name(t) for t in tickers],
+        "pris": price,
+        "aksjer": shares,
+        "verdi": value,
+        "vekt": value / capital if capital else np.zeros(len(idx)),
+        "risiko": shares * risk,
+    })
+
+
+def sector_exposure(sizes):
+    """Verdi og andel per sektor for posisjonene fra ``position_sizes``, størst først."""
+    by_sector = sizes[sizes["aksjer"] > 0].groupby("sektor")[["verdi", "risiko"]].sum()
+    total = by_sector["verdi"].sum()
+    by_sector["andel"] = by_sector["verdi"] / total if total else 0.0
+    return by_sector.sort_values("verdi", ascending=False)
+
+
+def cluster_report(risk, sizes, capital, threshold=CLUSTER_CORR):
+    """Konsentrerte klynger: tickere, laveste korrelasjon i klyngen og samlet risiko.
+
+    Samlet risiko er summen av risikoen per posisjon (i kroner og i prosent
+    av kapitalen): korrelerte posisjoner treffer stop omtrent samtidig.
+    """
+    held = sizes[sizes["aksjer"] > 0]
+    risk_by = dict(zip(held["ticker"], held["risiko"]))
+    out = []
+    for group in risk.clusters(list(held["ticker"]), threshold):
+        corr = risk.frame(group).to_numpy()
+        total = float(sum(risk_by[t] for t in group))
+        out.append({
+            "tickere": group,
+            "min_korrelasjon": float(np.nanmin(corr[~np.eye(len(group), dtype=bool)])),
+            "risiko": total,
+            "risiko_pct": total / capital * 100 if capital else 0.0,
+        })
+    return out
@@ -0,0 +1,270 @@
+"""Prislasting: batch-nedlasting av daglig OHLCV med isolerte feil per ticker.
+
+En loader har metoden ``load(tickers, period, interval) -> LoadResult``.
+``BatchLoader`` henter hele watchlisten i ett (eller noen få) multi-ticker-kall
+til ``yf.download`` og splitter MultiIndex-svaret i én frame per ticker;
+``engine.fetch.AsyncLoader`` gjør det samme parallelt, med retry og rate limiting.
+``FakeSource`` er en lokal, deterministisk erstatning for ``yf.download`` slik
+at lasterne kan kjøres og benchmarkes uten nett.
+"""
+import os
+import random
+import time
+import zlib
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+OHLCV = ["Open", "High", "Low", "Close", "Volume"]
+
+# Kalendervindu per yfinance-periode (None = all historikk)
+PERIOD_OFFSETS = {
+    "1d": pd.DateOffset(days=1), "5d": pd.DateOffset(days=5),
+    "1mo": pd.DateOffset(months=1), "3mo": pd.DateOffset(months=3),
+    "6mo": pd.DateOffset(months=6), "1y": pd.DateOffset(years=1),
+    "2y": pd.DateOffset(years=2), "5y": pd.DateOffset(years=5),
+    "10y": pd.DateOffset(years=10), "max": None,
+}
+
+
+def period_start(period, today=None):
+    offset = PERIOD_OFFSETS.get(period)
+    if offset is None:
+        return None
+    return pd.Timestamp(today or pd.Timestamp.today()).normalize() - offset
+
+
+@dataclass(repr=False)
+class LoadResult:
+    frames: dict = field(default_factory=dict)  # ticker -> DataFrame (OHLCV)
+    errors: dict = field(default_factory=dict)  # ticker -> feilmelding
+    stale: dict = field(default_factory=dict)   # ticker -> feilmelding (eldre data brukt)
+
+    def __repr__(self):
+        # Kort: asyncio.run (3.11) kan repr-e resultatet, og repr av alle frames koster sekunder
+        return f"LoadResult(frames={len(self.frames)}, errors={len(self.errors)}, stale={len(self.stale)})"
+
+    def merge(self, other):
+        self.frames.update(other.frames)
+        self.errors.update(other.errors)
+        self.stale.update(other.stale)
+        return self
+
+
+def _yf_download(*args, **kwargs):
+    import yfinance as yf
+    return yf.download(*args, **kwargs)
+
+
+def _span(period, start):
+    # yfinance tar enten en periode eller en startdato
+    if start is None:
+        return {"period": period}
+    return {"start": pd.Timestamp(start).strftime("%Y-%m-%d")}
+
+
+def _clean(df):
+    df = df[[c for c in OHLCV if c in df.columns]].dropna(how="all")
+    if "Close" in df.columns:
+        df = df[df["Close"].notna()]
+    return df
+
+
+def split_frame(raw, tickers):
+    """Splitter svaret fra ``yf.download`` i én OHLCV-frame per ticker."""
+    result = LoadResult()
+    if raw is None or raw.empty:
+        for t in tickers:
+            result.errors[t] = "ingen data"
+        return result
+
+    if not isinstance(raw.columns, pd.MultiIndex):
+        # Eldre yfinance / én ticker uten MultiIndex
+        if len(tickers) != 1:
+            raise ValueError("Forventet MultiIndex-kolonner for flere tickere")
+        parts = {tickers[0]: raw}
+    else:
+        # group_by="ticker" gir tickere på nivå 0, standard ("column") på nivå 1
+        level = 0 if set(tickers) & set(raw.columns.get_level_values(0)) else 1
+        present = set(raw.columns.get_level_values(level))
+        parts = {t: raw.xs(t, axis=1, level=level) for t in tickers if t in present}
+
+    for t in tickers:
+        if t not in parts:
+            result.errors[t] = "mangler i svaret"
+            continue
+        df = _clean(parts[t])
+        if df.empty:
+            result.errors[t] = "ingen data"
+            continue
+        df.columns.name = None
+        result.frames[t] = df
+    return result
+
+
+class SequentialLoader:
+    """Ett ``yf.download``-kall per ticker (slik app.py gjorde tidligere)."""
+
+    def __init__(self, download=None):
+        self.download = download or _yf_download
+
+    def load(self, tickers, period="1y", interval="1d", start=None):
+        result = LoadResult()
+        for t in tickers:
+            try:
+                raw = self.download(t, interval=interval, progress=False, **_span(period, start))
+                result.merge(split_frame(raw, [t]))
+            except Exception as e:
+                result.errors[t] = f"{type(e).__name__}: {e}"
+        return result
+
+
+class BatchLoader:
+    """Henter tickere i multi-ticker-kall på opptil ``chunk_size`` symboler.
+
+    Feiler et helt kall, prøves tickerne i den delen én og én, slik at ett
+    ugyldig symbol ikke tar med seg resten.
+    """
+
+    def __init__(self, download=None, chunk_size=100):
+        self.download = download or _yf_download
+        self.chunk_size = chunk_size
+
+    def load(self, tickers, period="1y", interval="1d", start=None):
+        tickers = list(dict.fromkeys(tickers))
+        result = LoadResult()
+        for i in range(0, len(tickers), self.chunk_size):
+            chunk = tickers[i:i + self.chunk_size]
+            try:
+                raw = self.download(chunk, interval=interval, group_by="ticker",
+                                    progress=False, threads=True, **_span(period, start))
+                result.merge(split_frame(raw, chunk))
+            except Exception as e:
+                if len(chunk) == 1:
+                    result.errors[chunk[0]] = f"{type(e).__name__}: {e}"
+                    continue
+                result.merge(SequentialLoader(self.download).load(chunk, period, interval, start))
+        return result
+
+
+# yfinance-intervall -> pandas-frekvens for syntetiske intradagsbars
+INTRADAY_FREQ = {"1m": "1min", "5m": "5min", "15m": "15min", "30m": "30min", "60m": "60min", "1h": "60min"}
+
+
+def synthetic_ohlcv(ticker, bars=252, seed=0, end=None, freq=None):
+    """Deterministisk tilfeldig-vandring-OHLCV for en ticker (dagsbars, eller ``freq``)."""
+    rng = np.random.default_rng([seed, zlib.crc32(ticker.encode())])
+    if freq is None:
+        end = pd.Timestamp(end or pd.Timestamp.today()).normalize()
+        index = pd.bdate_range(end=end, periods=bars, name="Date")
+    else:
+        end = pd.Timestamp(end or pd.Timestamp.now()).floor(freq)
+        index = pd.date_range(end=end, periods=bars, freq=freq, name="Datetime")
+
+    start = rng.uniform(10, 400)
+    returns = rng.normal(0.0004, 0.02, bars)
+    close = start * np.exp(np.cumsum(returns))
+    open_ = np.r_[start, close[:-1]] * (1 + rng.normal(0, 0.004, bars))
+    spread = np.abs(rng.normal(0, 0.012, (2, bars)))
+    high = np.maximum(open_, close) * (1 + spread[0])
+    low = np.minimum(open_, close) * (1 - spread[1])
+    volume = rng.integers(50_000, 5_000_000, bars).astype(float)
+    return pd.DataFrame(
+        {"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume},
+        index=index,
+    )
+
+
+class FakeSource:
+    """Lokal stand-in for ``yf.download`` med simulert forsinkelse og feil.
+
+    ``latency`` er kostnaden per kall (rundtur), ``per_ticker`` kostnaden per
+    symbol i kallet. Tickere i ``failing`` returneres som tomme kolonner,
+    akkurat som yfinance gjør for ukjente symboler. ``error_rate`` er andelen
+    kall som feiler forbigående (som HTTP 429), og et kall som inneholder en
+    ticker i ``slow`` tar ``slow_latency`` sekunder ekstra.
+
+    Intradagsintervaller gir bars døgnet rundt frem til ``now`` (standard:
+    klokka), fra en fast serie per ticker; nye bars dukker altså opp etter
+    hvert som tiden går, og tidligere bars endres ikke.
+    """
+
+    def __init__(self, bars=252, latency=0.0, per_ticker=0.0, failing=(), seed=0, end=None,
+                 error_rate=0.0, slow=(), slow_latency=0.0):
+        self.bars = bars
+        self.latency = latency
+        self.per_ticker = per_ticker
+        self.failing = set(failing)
+        self.seed = seed
+        self.end = end
+        self.error_rate = error_rate
+        self.slow = set(slow)
+        self.slow_latency = slow_latency
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._cache = {}
+        self.now = None
+        self._anchor = pd.Timestamp.now().floor("D")
+
+    def frame(self, ticker, interval="1d"):
+        key = (ticker, interval)
+        if key not in self._cache:
+            if interval == "1d":
+                self._cache[key] = synthetic_ohlcv(ticker, self.bars, self.seed, self.end)
+            else:
+                # Like mange bars før og etter ankeret, så serien rekker et døgn eller mer frem
+                freq = INTRADAY_FREQ[interval]
+                end = self._anchor + self.bars * pd.Timedelta(freq)
+                self._cache[key] = synthetic_ohlcv(ticker, 2 * self.bars, self.seed, end, freq)
+        if interval == "1d":
+            return self._cache[key]
+        df = self._cache[key]
+        return df[df.index <= (self.now or pd.Timestamp.now())]
+
+    def download(self, tickers, period=None, interval="1d", group_by="column",
+                 start=None, progress=False, threads=True, **kwargs):
+        names = [tickers] if isinstance(tickers, str) else list(tickers)
+        self.calls += 1
+        delay = self.latency + self.per_ticker * len(names)
+        if self.slow.intersection(names):
+            delay += self.slow_latency
+        time.sleep(delay)
+        if self.error_rate and self._rng.random() < self.error_rate:
+            raise ConnectionError("429 Too Many Requests (simulert)")
+
+        start = start or period_start(period or "1y")
+        parts = {}
+        for t in names:
+            if t in self.failing:
+                continue
+            df = self.frame(t, interval)
+            parts[t] = df if start is None else df[df.index >= pd.Timestamp(start)]
+        if not parts:
+            return pd.DataFrame()
+
+        raw = pd.concat(parts, axis=1, names=["Ticker", "Price"])
+        for t in names:
+            if t in self.failing:
+                for c in OHLCV:
+                    raw[(t, c)] = np.nan
+        if group_by != "ticker":
+            raw = raw.swaplevel(axis=1).sort_index(axis=1)
+        return raw
+
+
+def default_loader():
+    """Loader valgt via ``KMAN_PRICE_SOURCE`` ("yahoo" eller "fake"), med lokalt lager foran.
+
+    Mellom lageret og nettet deles nedlastede dagsbars med andre prosesser
+    og replikaer (``engine.cache``, navnerommet ``bars``).
+    """
+    from engine.cache import SharedCache, SharedLoader, default_backend
+    from engine.fetch import AsyncLoader
+    from engine.store import StoreLoader
+
+    if os.environ.get("KMAN_PRICE_SOURCE", "yahoo") == "fake":
+        network = AsyncLoader(download=FakeSource().download)
+    else:
+        network = AsyncLoader()
+    return StoreLoader(SharedLoader(network, SharedCache(default_backend(), "bars")))
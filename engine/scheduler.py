@@ -0,0 +1,163 @@
+"""Bakgrunnsoppdatering av screeneren, styrt etter åpningstidene på Oslo Børs.
+
+En ``Refresher``-tråd kjører analysen utenfor sideforespørslene og
+publiserer resultatet som et øyeblikksbilde. Siden leser alltid siste
+bilde direkte og viser hvor gammelt det er; ingen bruker venter på
+nedlasting etter at cachen har gått ut.
+
+Bildet publiseres i en delt store (``engine.cache.SharedSnapshotStore``),
+så flere prosesser og replikaer ser samme snapshot. Helligdager er ikke med
+i kalenderen; da blir det bare noen unødvendige oppdateringer.
+"""
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+OSLO = ZoneInfo("Europe/Oslo")
+OPEN, CLOSE = time(9, 0), time(16, 30)
+INTERVAL = timedelta(minutes=15)  # mens børsen er åpen
+SETTLE = timedelta(minutes=20)    # siste kjøring etter stengning, når sluttkursen er på plass
+RETRY = timedelta(minutes=1)      # etter en feilet kjøring
+POLL = 300                        # sekunder; ser etter bilder fra andre prosesser
+
+log = logging.getLogger(__name__)
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def is_open(now=None):
+    t = (now or _now()).astimezone(OSLO)
+    return t.weekday() < 5 and OPEN <= t.time() < CLOSE
+
+
+def daily_version(created):
+    """Nøkkel for dagsbarene bak et snapshot tatt ``created``: endres én gang per
+    handelsdag, og igjen når dagens sluttkurser er på plass (``SETTLE`` etter stengning)."""
+    t = created.astimezone(OSLO)
+    final = datetime.combine(t.date(), CLOSE, OSLO) + SETTLE
+    return f"{t:%Y-%m-%d}:{'slutt' if t >= final else 'dag'}"
+
+
+def next_refresh(last, interval=INTERVAL, settle=SETTLE):
+    """Når neste oppdatering skal kjøres, gitt forrige kjøring.
+
+    Hvert ``interval`` i åpningstiden, én gang ``settle`` etter stengning,
+    og ellers ved neste åpning (hverdager).
+    """
+    t = last.astimezone(OSLO)
+    day = t.date()
+    while True:
+        if day.weekday() < 5:
+            open_ = datetime.combine(day, OPEN, OSLO)
+            final = datetime.combine(day, CLOSE, OSLO) + settle
+            if t < open_:
+                return open_
+            if t < final:
+                return min(t + interval, final)
+        day += timedelta(days=1)
+        t = datetime.combine(day, time(0), OSLO)
+
+
+@dataclass
+class Snapshot:
+    created: datetime
+    result: object
+    version: int = 0
+
+    def age(self, now=None):
+        return (now or _now()) - self.created
+
+
+class Refresher:
+    """Tråd som kjører ``compute`` etter timeplanen og publiserer resultatet.
+
+    ``on_publish(forrige, nytt)`` kalles etter hver publisering (f.eks.
+    ``AlertEngine.on_publish``); feil der logges og stopper ikke oppdateringen.
+
+    ``store`` har ``publish``/``latest``/``lock`` (``SharedSnapshotStore``):
+    bare én replika kjører analysen om gangen; de andre venter på låsen og
+    bruker bildet den publiserer.
+    """
+
+    def __init__(self, compute, store, interval=INTERVAL, settle=SETTLE, clock=_now, on_publish=None):
+        self.compute = compute
+        self.store = store
+        self.on_publish = on_publish
+        self.interval, self.settle = interval, settle
+        self.clock = clock
+        self.error = None
+        self._run_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._ready = threading.Event()  # satt etter første forsøk (eller ved lagret snapshot)
+        self._retry_at = None
+        self._thread = None
+        if store.latest() is not None:
+            self._ready.set()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="screener-refresh", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def refresh(self):
+        """Kjører analysen nå (blokkerende) og publiserer et nytt snapshot."""
+        with self._run_lock:
+            previous = self.store.latest()
+            try:
+                with self.store.lock():
+                    latest = self.store.latest()
+                    if latest is not None and (previous is None or latest.created > previous.created):
+                        # En annen replika publiserte mens vi ventet på låsen (eller rett før)
+                        self.error, self._retry_at = None, None
+                        return latest
+                    snap = self.store.publish(self.compute(), self.clock())
+            except Exception as e:
+                self.error = e
+                self._retry_at = self.clock() + RETRY
+                log.exception("Oppdatering av screeneren feilet")
+                raise
+            finally:
+                self._ready.set()
+            self.error, self._retry_at = None, None
+            if self.on_publish is not None:
+                try:
+                    self.on_publish(previous, snap)
+                except Exception:
+                    log.exception("on_publish feilet")
+            return snap
+
+    def due(self):
+        snap = self.store.latest()
+        if snap is None:
+            return self._retry_at or self.clock()
+        due = next_refresh(snap.created, self.interval, self.settle)
+        return max(due, self._retry_at) if self._retry_at else due
+
+    def latest(self, timeout=None):
+        """Siste snapshot; venter bare til første kjøring er ferdig hvis ingenting
+        er publisert ennå. None betyr at den kjøringen feilet (se ``error``)."""
+        self._ready.wait(timeout)
+        return self.store.latest()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            wait = (self.due() - self.clock()).total_seconds()
+            if wait > 0 and not self._wake.wait(min(wait, POLL)):
+                continue
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.refresh()
+            except Exception:
+                pass  # logget i refresh; nytt forsøk etter RETRY
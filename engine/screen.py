@@ -0,0 +1,69 @@
+"""Én resultatrad i screeneren fra siste indikatorverdier og nivåer.
+
+Delt av dagsmodus (fetch_and_analyze) og intradagsmodus (``engine.intraday``),
+så begge gir nøyaktig samme felt, avrunding og regler.
+"""
+import math
+
+from engine.signals import RULES, SIGNALS, evaluate
+
+MIN_BARS = 60
+
+
+def _isnan(x):
+    return x is None or (isinstance(x, float) and math.isnan(x))
+
+
+def screen_row(ticker, values, bars, resistance, support, rules=RULES, trend=None, strength=None):
+    """``(rad, None)`` for en ticker som kan vises, ellers ``(None, grunn)``.
+
+    ``values`` er en rad fra ``indicators.latest``/``IndicatorSet.values``,
+    ``bars`` antall bars i vinduet det er regnet på, ``trend`` eventuelle
+    flagg fra høyere tidsrammer (``trend_uke``/``trend_mnd``, se
+    ``engine.timeframes``) og ``strength`` relativ styrke mot OSEBX
+    (``rs_1m``/``rs_3m``/``rs_6m``, se ``engine.strength``).
+    """
+    if bars < MIN_BARS:
+        return None, "for lite historikk"
+
+    close = float(values['close'])
+    prev_close = float(values['prev_close'])
+    change_pct = ((close - prev_close) / prev_close) * 100
+
+    rsi, sma20, sma50 = values['rsi'], values['sma20'], values['sma50']
+    atr, ema12, ema26 = values['atr'], values['ema12'], values['ema26']
+
+    if _isnan(rsi) or _isnan(sma20) or _isnan(atr):
+        return None, "mangler indikatorer"
+
+    # Finn target: nærmeste pivot-topp over pris
+    target = resistance if not _isnan(resistance) else close * rules.fallback_target
+
+    stop_loss = close - (rules.stop_atr * atr)
+    pot_kr = target - close
+    pot_pct = (pot_kr / close) * 100
+    risk_kr = close - stop_loss
+    risk_pct = (risk_kr / close) * 100
+
+    five_day = (close / float(values['close_5'])) - 1 if bars >= 5 else 0
+
+    weekly, monthly = (trend.get("trend_uke"), trend.get("trend_mnd")) if trend is not None else (None, None)
+    rs = {c: None if strength is None else strength.get(c) for c in ("rs_1m", "rs_3m", "rs_6m")}
+
+    # Signal-logikk og sannsynlighet (samme regler som backtesten, pluss uke/måned og relativ styrke)
+    code, prob = evaluate(close, rsi, sma20, sma50, ema12, ema26, five_day, pot_pct, rules,
+                          weekly=weekly, monthly=monthly, strength=rs["rs_3m"])
+    signal, prob = SIGNALS[int(code)], int(prob)
+
+    return {
+        "ticker": ticker, "ticker_short": ticker.replace('.OL', ''),
+        "pris": round(close, 2), "endring": round(change_pct, 2), "rsi": round(rsi, 1),
+        "signal": signal, "target": round(target, 2), "stop_loss": round(stop_loss, 2),
+        "pot_kr": round(pot_kr, 2), "pot_pct": round(pot_pct, 1),
+        "risk_kr": round(risk_kr, 2), "risk_pct": round(risk_pct, 1),
+        "support": None if _isnan(support) else round(support, 2),
+        "trend_uke": None if _isnan(weekly) else float(weekly),
+        "trend_mnd": None if _isnan(monthly) else float(monthly),
+        **{c: None if _isnan(v) else round(float(v), 1) for c, v in rs.items()},
+        "prob": prob
+    }, None
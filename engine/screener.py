@@ -0,0 +1,168 @@
+"""Dagsscreeneren uten Streamlit: last, filtrer, indikatorer, nivåer og rader.
+
+``Screener.run(navn)`` gir det samme ``(SummaryTable, feilet, utdatert)``
+som dashboardet viser (med relativ styrke mot OSEBX rangert over hele listen), og kan importeres fra cron, skript og andre systemer
+uten at noe av UI-et kjøres. Som kommandolinje skriver den resultatet for en
+hel liste som CSV, JSON eller Parquet.
+
+Kjør: python -m engine.screener [--universe watchlist] [--out resultat.csv|.json|.parquet]
+"""
+import argparse
+import os
+import sys
+import time
+from dataclasses import replace
+
+from engine.levels import levels
+from engine.metrics import METRICS
+from engine.panel import PricePanel
+from engine.screen import screen_row
+from engine.signals import RULES
+from engine.strength import INDEX, rank, relative_strength
+from engine.timeframes import Timeframes
+from engine.universe import DEFAULT, SHARD_SIZE, WATCHLIST, UniverseStore, prefilter, screen_sharded
+
+FORMATS = ("csv", "json", "parquet")
+
+
+class Screener:
+    def __init__(self, loader=None, indicators=None, universes=None, period="1y",
+                 lookback=60, width=1, shard_size=SHARD_SIZE, workers=4, timeframes=None,
+                 strength=True, rules=RULES):
+        from engine.prices import default_loader
+        from engine.streaming import IncrementalIndicators
+
+        self.loader = loader or default_loader()
+        self.indicators = indicators or IncrementalIndicators()
+        self.universes = universes or UniverseStore().ensure(DEFAULT, WATCHLIST)
+        self.period = period
+        self.lookback, self.width = lookback, width
+        self.shard_size, self.workers = shard_size, workers
+        # Uke-/månedsbekreftelse fra de samme dagsbarene; False = bare dagsbars
+        self.timeframes = Timeframes() if timeframes is None else timeframes
+        # Relativ styrke mot INDEX: én ekstra nedlasting per kjøring; False = uten
+        self.strength = strength
+        self.rules = rules
+
+    def run(self, name=DEFAULT):
+        """Hele listen ``name``, delt i shards som lastes og analyseres parallelt."""
+        return self.run_tickers(self.universes.get(name))
+
+    def run_tickers(self, tickers):
+        with METRICS.span("analyse", mode="dag"):
+            index = self.index_close()
+            table, failed, stale = screen_sharded(tickers, lambda shard: self.analyze(shard, index),
+                                                  self.shard_size, self.workers)
+            if index is not None:
+                with METRICS.span("rangering", mode="dag"):
+                    rank(table)
+            return table, failed, stale
+
+    def index_close(self):
+        """Sluttkursene til ``INDEX``, eller None (slått av, eller nedlastingen feilet)."""
+        if not self.strength:
+            return None
+        with METRICS.span("last", mode="indeks"):
+            loaded = self.loader.load([INDEX], period=self.period, interval="1d")
+        frame = loaded.frames.get(INDEX)
+        return None if frame is None or frame.empty else frame["Close"]
+
+    def analyze(self, tickers, index=None):
+        """Ett shard: (rader, feilet, utdatert); ``index`` er sluttkursene til ``INDEX``."""
+        results = []
+        # Én batch-nedlasting for hele shardet; feil rapporteres per ticker
+        with METRICS.span("last", mode="dag"):
+            loaded = self.loader.load(tickers, period=self.period, interval="1d")
+        failed = dict(loaded.errors)
+        # Billig forhåndsfilter (historikk, kurs, omsetning) før indikatorene regnes
+        with METRICS.span("filter", mode="dag"):
+            tickers, rejected = prefilter(loaded.frames, tickers)
+        failed.update(rejected)
+        # Indikatorene oppdateres inkrementelt med bare de nye barene siden sist
+        with METRICS.span("indikatorer", mode="dag"):
+            ind = self.indicators.latest(loaded.frames, tickers)
+        # Motstand/støtte fra pivot-nivåer, for alle tickere samtidig
+        with METRICS.span("nivåer", mode="dag"):
+            panel = PricePanel.from_frames(loaded.frames, tickers)
+            lv = levels(panel, lookback=self.lookback, width=self.width)
+        # Trend på uke og måned, aggregert fra det samme panelet
+        with METRICS.span("tidsrammer", mode="dag"):
+            trend = self.timeframes.confirm(panel) if self.timeframes else None
+        # Meravkastning mot indeksen over 1, 3 og 6 måneder (rangeres når alle shards er ferdige)
+        with METRICS.span("relativ_styrke", mode="dag"):
+            strength = relative_strength(panel, index) if index is not None else None
+        with METRICS.span("rader", mode="dag"):
+            for t in ind.index:
+                try:
+                    row, reason = screen_row(t, ind.loc[t], len(loaded.frames[t]),
+                                             lv.loc[t, 'resistance'], lv.loc[t, 'support'], self.rules,
+                                             trend=None if trend is None else trend.loc[t],
+                                             strength=None if strength is None else strength.loc[t])
+                except Exception as e:
+                    row, reason = None, f"{type(e).__name__}: {e}"
+                if reason:
+                    failed[t] = reason
+                else:
+                    results.append(row)
+
+        # Utdaterte tickere (siste henting feilet, lagrede bars brukt) som likevel ble analysert
+        stale = {t: reason for t, reason in loaded.stale.items() if t not in failed}
+        return results, failed, stale
+
+
+def write(frame, path, fmt):
+    """Skriver resultatet til ``path`` (``-`` = stdout; Parquet krever pyarrow eller fastparquet)."""
+    if fmt == "parquet":
+        if path == "-":
+            raise SystemExit("Parquet kan ikke skrives til stdout; bruk --out fil.parquet")
+        try:
+            frame.to_parquet(path, index=False)
+        except ImportError as e:
+            raise SystemExit(f"Parquet krever pyarrow eller fastparquet: {e}")
+        return
+    out = sys.stdout if path == "-" else open(path, "w", encoding="utf-8", newline="")
+    try:
+        if fmt == "json":
+            frame.to_json(out, orient="records", force_ascii=False, indent=1)
+            out.write("\n")
+        else:
+            frame.to_csv(out, index=False)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kjør screeneren uten dashboard og skriv resultatet")
+    parser.add_argument("--universe", default=DEFAULT, help="navngitt liste (se python -m engine.universe list)")
+    parser.add_argument("--tickers", nargs="*", help="i stedet for en liste")
+    parser.add_argument("--out", default="-", help="fil (.csv/.json/.parquet) eller - for stdout")
+    parser.add_argument("--format", choices=FORMATS, help="standard: fra filendelsen, ellers csv")
+    parser.add_argument("--source", choices=("yahoo", "fake"), help="overstyrer KMAN_PRICE_SOURCE")
+    parser.add_argument("--rs-weight", type=int, default=RULES.w_strength,
+                        help="poeng i scoren for å ha slått OSEBX siste 3 måneder (0 = av)")
+    args = parser.parse_args()
+
+    if args.source:
+        os.environ["KMAN_PRICE_SOURCE"] = args.source
+    fmt = args.format or next((f for f in FORMATS if args.out.lower().endswith("." + f)), "csv")
+
+    t0 = time.perf_counter()
+    screener = Screener(rules=replace(RULES, w_strength=args.rs_weight))
+    if args.tickers:
+        table, failed, stale = screener.run_tickers(args.tickers)
+    else:
+        if args.universe not in screener.universes.names():
+            parser.error(f"ukjent liste: {args.universe}")
+        table, failed, stale = screener.run(args.universe)
+    write(table.to_frame(), args.out, fmt)
+
+    print(f"{len(table)} ok · {len(stale)} utdatert · {len(failed)} feilet · "
+          f"{time.perf_counter() - t0:.1f}s", file=sys.stderr)
+    for t, reason in failed.items():
+        print(f"  {t}: {reason}", file=sys.stderr)
+    sys.exit(0 if len(table) else 1)
+
+
+if __name__ == "__main__":
+    main()
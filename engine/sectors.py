@@ -0,0 +1,51 @@
+"""Sektor per ticker (GICS-basert), samme inndeling som ``src/lib/data/sectors.ts``.
+
+Tickere som ikke står i listen havner i ``UKJENT``.
+"""
+# Sektor-id -> visningsnavn
+SECTORS = {
+    "energy": "Energi",
+    "materials": "Materialer",
+    "industrials": "Industri",
+    "consumer_discretionary": "Forbrukervarer",
+    "consumer_staples": "Dagligvarer",
+    "healthcare": "Helse",
+    "financials": "Finans",
+    "technology": "Teknologi",
+    "telecom": "Telekom",
+    "utilities": "Forsyning",
+    "real_estate": "Eiendom",
+    "shipping": "Shipping",
+    "seafood": "Sjømat",
+}
+UKJENT = "Ukjent"
+
+_BY_SECTOR = {
+    "energy": [
+        "EQNR", "AKRBP", "VAR", "OKEA", "TGS", "PGS", "AFK", "BWO", "FLNG", "DOF", "AKSO",
+        "SUBC", "SOFF", "AKER", "BORR", "SDRL", "ARCHER", "SHLF", "HAUTO", "HAVI",
+        "NEL", "SCATC", "REC", "RECSI",
+    ],
+    "materials": ["NHY", "YAR", "BRG", "NSKOG", "ELKEM"],
+    "industrials": ["KOG", "TOM", "MULTI", "AUTO", "WAWI", "WSTEP", "HPUR"],
+    "consumer_staples": ["ORK"],
+    "consumer_discretionary": ["NAS", "KAHOT", "XXL", "KID", "SATS"],
+    "healthcare": ["PHO", "MEDI"],
+    "financials": ["DNB", "STB", "GJF", "PARB", "SRBNK", "MING", "NONG", "SBANK", "AEGA", "PROT"],
+    "technology": ["NOD", "SCHA", "CRAYN", "LINK", "VOLUE", "OTEC", "ADE", "IDEX"],
+    "telecom": ["TEL"],
+    "shipping": ["MPCC", "GOGL", "HAFNI", "FRO", "STRO", "BWLPG", "CLCO", "BELCO", "2020", "ODFB"],
+    "seafood": ["MOWI", "SALM", "LSG", "BAKKA", "BAKK", "NRS", "AUSS", "GSF"],
+    "real_estate": ["ENTRA", "OBOS", "SBO", "OSLN"],
+}
+STOCK_SECTORS = {f"{t}.OL": sector for sector, tickers in _BY_SECTOR.items() for t in tickers}
+
+
+def sector(ticker):
+    """Sektor-id for ``ticker``, eller None."""
+    return STOCK_SECTORS.get(ticker.upper())
+
+
+def sector_name(ticker):
+    """Visningsnavnet til sektoren (``UKJENT`` når tickeren ikke er klassifisert)."""
+    return SECTORS.get(sector(ticker), UKJENT)
@@ -0,0 +1,113 @@
+"""Signal-logikken (BUY/HOLD/SELL) og sannsynlighetsscoren, vektorisert.
+
+Reglene er de samme som fetch_and_analyze alltid har brukt; her tar de
+NumPy-arrays (eller skalarer), slik at de kan kjøres på siste bar i
+dashboardet og på hver eneste historiske bar i backtesten.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+SIGNALS = ("BUY", "HOLD", "SELL")  # indeks = sorteringsrekkefølge
+BUY, HOLD, SELL = 0, 1, 2
+
+
+@dataclass(frozen=True)
+class Rules:
+    """Terskler og vekter for signal og score (standard = dagens verdier)."""
+
+    rsi_buy: float = 55        # RSI under dette: kjøpssone
+    rsi_low: float = 45        # ekstra bonus for lav RSI
+    rsi_sell: float = 75       # RSI over dette: overkjøpt
+    stop_atr: float = 2.0      # stop = pris - stop_atr × ATR
+    strong_momentum: float = 0.02
+    good_upside: float = 5     # pot_pct over dette gir bonus
+    fallback_target: float = 1.10  # target når ingen motstand over pris
+
+    w_rsi_buy: int = 20
+    w_rsi_low: int = 10
+    w_sma20: int = 15
+    w_sma50: int = 15
+    w_ema: int = 15
+    w_momentum: int = 10
+    w_strong_momentum: int = 5
+    w_upside: int = 10
+    w_weekly: int = 10         # uke-close over uke-SMA20 (engine.timeframes)
+    w_monthly: int = 10        # måneds-close over måneds-SMA10
+    w_strength: int = 0        # slått OSEBX siste 3 måneder (engine.strength); 0 = av
+    score_cap: int = 100       # dagskriteriene alene gir maks 100
+
+    buy_bonus: int = 15
+    buy_cap: int = 95
+    sell_penalty: int = 30
+    sell_floor: int = 10
+    hold_penalty: int = 10
+    hold_floor: int = 20
+
+
+RULES = Rules()
+
+
+def classify(close, rsi, sma20, sma50, ema12, ema26, five_day, rules=RULES):
+    """Signalkode per element: BUY (0), HOLD (1) eller SELL (2)."""
+    close, rsi = np.asarray(close), np.asarray(rsi)
+    is_buy = (rsi < rules.rsi_buy) & (close > sma20) & (close > sma50) & (ema12 > ema26) & (five_day > 0)
+    is_sell = (rsi > rules.rsi_sell) | ((close < sma20) & (close < sma50))
+    return np.where(is_buy, BUY, np.where(is_sell, SELL, HOLD))
+
+
+def bullish_score(close, rsi, sma20, sma50, ema12, ema26, five_day, pot_pct, rules=RULES,
+                  weekly=None, monthly=None, strength=None):
+    """Teller hvor mange bullish-kriterier som er oppfylt, vektet.
+
+    ``weekly``/``monthly`` er trendflagg fra høyere tidsrammer (1 = bekreftet,
+    0 eller NaN = ikke) og ``strength`` meravkastningen mot OSEBX i prosent
+    (``rs_3m``); None betyr bare dagsbars, som i backtesten.
+    """
+    close, rsi = np.asarray(close), np.asarray(rsi)
+    score = (
+        rules.w_rsi_buy * (rsi < rules.rsi_buy)
+        + rules.w_rsi_low * (rsi < rules.rsi_low)
+        + rules.w_sma20 * (close > sma20)
+        + rules.w_sma50 * (close > sma50)
+        + rules.w_ema * (ema12 > ema26)
+        + rules.w_momentum * (np.asarray(five_day) > 0)
+        + rules.w_strong_momentum * (np.asarray(five_day) > rules.strong_momentum)
+        + rules.w_upside * (np.asarray(pot_pct) > rules.good_upside)
+    )
+    if weekly is None and monthly is None and strength is None:
+        return score
+    if weekly is not None:
+        score = score + rules.w_weekly * (np.asarray(weekly, dtype=float) > 0)
+    if monthly is not None:
+        score = score + rules.w_monthly * (np.asarray(monthly, dtype=float) > 0)
+    if strength is not None:
+        score = score + rules.w_strength * (np.asarray(strength, dtype=float) > 0)
+    return np.minimum(score, rules.score_cap)
+
+
+def probability(code, score, rules=RULES):
+    # BUY-signal gir bonus, SELL gir straff, HOLD litt lavere
+    return np.where(
+        code == BUY, np.minimum(score + rules.buy_bonus, rules.buy_cap),
+        np.where(code == SELL, np.maximum(score - rules.sell_penalty, rules.sell_floor),
+                 np.maximum(score - rules.hold_penalty, rules.hold_floor)),
+    )
+
+
+def evaluate(close, rsi, sma20, sma50, ema12, ema26, five_day, pot_pct, rules=RULES,
+             weekly=None, monthly=None, strength=None):
+    """Signalkode og sannsynlighet (prob) i ett kall.
+
+    Hele matriser uten høyere tidsrammer (backtest, sweep) går gjennom
+    ``engine.kernels`` når Numba er installert.
+    """
+    if weekly is None and monthly is None and strength is None:
+        from engine import kernels
+
+        if kernels.enabled(close, rsi, sma20, sma50, ema12, ema26, five_day, pot_pct) and kernels.integer_weights(rules):
+            return kernels.evaluate(close, rsi, sma20, sma50, ema12, ema26, five_day, pot_pct, rules)
+    code = classify(close, rsi, sma20, sma50, ema12, ema26, five_day, rules)
+    score = bullish_score(close, rsi, sma20, sma50, ema12, ema26, five_day, pot_pct, rules,
+                          weekly, monthly, strength)
+    return code, probability(code, score, rules)
@@ -0,0 +1,229 @@
+"""Lokal OHLCV-lagring i SQLite, nøklet på (ticker, dato).
+
+``StoreLoader`` legger seg rundt en vanlig loader: den ber bare om bars fra
+nest siste lagrede dato og fremover, skriver dem inn og leser deretter
+ønsket vindu fra disk. Uten nett serveres det som ligger lagret.
+
+Den overlappende baren (nest siste; den siste kan være uferdig) sammenlignes
+med den lagrede. Yahoo justerer hele historikken bakover ved splitt og
+utbytte, så avviker den mer enn ``ADJUST_TOL``, lastes tickeren ned på nytt
+i sin helhet i stedet for å blande justerte og ujusterte kurser. Etter en
+full nedlasting lagres også første dato kilden har (``listings``), slik at
+en ticker som er notert etter starten av vinduet ikke lastes ned på nytt
+hver gang.
+"""
+import os
+import sqlite3
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+from engine import DATA_DIR
+from engine.metrics import METRICS
+from engine.prices import OHLCV, LoadResult, period_start
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bars (
+    ticker TEXT NOT NULL,
+    date   TEXT NOT NULL,
+    open REAL, high REAL, low REAL, close REAL, volume REAL,
+    PRIMARY KEY (ticker, date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS listings (
+    ticker TEXT PRIMARY KEY,
+    first  TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+_COLUMNS = ["date", "open", "high", "low", "close", "volume"]
+_CHUNK = 500  # holder oss godt under SQLites grense for parametere
+_GAP = pd.Timedelta(days=7)  # helligdager/ferie i starten av vinduet
+_PRICES = ["Open", "High", "Low", "Close"]
+ADJUST_TOL = 1e-4  # relativt avvik i en overlappende bar som regnes som ny justering
+
+
+class PriceStore:
+    def __init__(self, path=None):
+        self.path = path or os.path.join(DATA_DIR, "prices.sqlite")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with closing(self._connect()) as con, con:
+            con.executescript(_SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def spans(self, tickers=None):
+        """Første og siste lagrede dato per ticker."""
+        with closing(self._connect()) as con:
+            rows = con.execute("SELECT ticker, MIN(date), MAX(date) FROM bars GROUP BY ticker").fetchall()
+        wanted = None if tickers is None else set(tickers)
+        return {t: (pd.Timestamp(a), pd.Timestamp(b)) for t, a, b in rows if wanted is None or t in wanted}
+
+    def listings(self, tickers=None):
+        """Første dato kilden har for tickere der det er kjent (fra en full nedlasting)."""
+        with closing(self._connect()) as con:
+            rows = con.execute("SELECT ticker, first FROM listings").fetchall()
+        wanted = None if tickers is None else set(tickers)
+        return {t: pd.Timestamp(d) for t, d in rows if wanted is None or t in wanted}
+
+    def set_listing(self, ticker, first):
+        with closing(self._connect()) as con, con:
+            con.execute("INSERT OR REPLACE INTO listings VALUES (?, ?)",
+                        (ticker, pd.Timestamp(first).strftime("%Y-%m-%d")))
+
+    def delete(self, ticker):
+        """Sletter alle lagrede bars for en ticker (noteringsdatoen beholdes)."""
+        with closing(self._connect()) as con, con:
+            return con.execute("DELETE FROM bars WHERE ticker = ?", (ticker,)).rowcount
+
+    def upsert(self, ticker, df):
+        """Skriver bars for en ticker; eksisterende datoer overskrives (f.eks. dagens uferdige bar)."""
+        if df is None or df.empty:
+            return 0
+        df = df.reindex(columns=OHLCV)
+        rows = [
+            (ticker, ts.strftime("%Y-%m-%d"), *(None if pd.isna(v) else float(v) for v in vals))
+            for ts, vals in zip(df.index, df.itertuples(index=False, name=None))
+        ]
+        with closing(self._connect()) as con, con:
+            con.executemany("INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def read(self, ticker, start=None):
+        return self.read_many([ticker], start).get(ticker, pd.DataFrame(columns=OHLCV))
+
+    def tail(self, ticker, n):
+        """De siste ``n`` lagrede bars for en ticker (f.eks. til grafen)."""
+        return self.tails([ticker], n).get(ticker, pd.DataFrame(columns=OHLCV))
+
+    def tails(self, tickers, n):
+        """De siste ``n`` lagrede bars per ticker, i få spørringer."""
+        return self._query(
+            tickers,
+            f"SELECT ticker, {', '.join(_COLUMNS)} FROM ("
+            f"SELECT *, ROW_NUMBER() OVER (PARTITION BY ticker ORDER BY date DESC) AS k FROM bars "
+            "WHERE ticker IN ({marks})) WHERE k <= ? ORDER BY ticker, date",
+            [int(n)],
+        )
+
+    def read_many(self, tickers, start=None):
+        """Leser lagrede bars fra ``start`` for flere tickere i få spørringer."""
+        start = "" if start is None else pd.Timestamp(start).strftime("%Y-%m-%d")
+        return self._query(
+            tickers,
+            f"SELECT ticker, {', '.join(_COLUMNS)} FROM bars "
+            "WHERE ticker IN ({marks}) AND date >= ? ORDER BY ticker, date",
+            [start],
+        )
+
+    def _query(self, tickers, sql, params):
+        # ``sql`` kjøres per del av tickerne, med ``{marks}`` for plassholderne
+        tickers = list(tickers)
+        frames = {}
+        with closing(self._connect()) as con:
+            for i in range(0, len(tickers), _CHUNK):
+                chunk = tickers[i:i + _CHUNK]
+                raw = pd.read_sql_query(sql.format(marks=",".join("?" * len(chunk))), con,
+                                        params=[*chunk, *params])
+                for t, g in raw.groupby("ticker", sort=False):
+                    df = g.drop(columns="ticker").set_index("date")
+                    df.index = pd.to_datetime(df.index).rename("Date")
+                    df.columns = OHLCV
+                    frames[t] = df
+        return frames
+
+
+class StoreLoader:
+    """Inkrementell loader: henter bare nye bars og leser vinduet fra disk."""
+
+    def __init__(self, loader, store=None):
+        self.loader = loader
+        self.store = store or PriceStore()
+
+    def history(self, ticker, period="1y"):
+        """Dagsbars for én ticker i ``period`` (f.eks. til grafen), hentet inn ved behov.
+
+        ``max`` lastes ned i sin helhet til lageret vet at den eldste lagrede
+        baren er den første som finnes (se ``listings``).
+        """
+        self.load([ticker], period=period)
+        return self.store.read(ticker, period_start(period))
+
+    def load(self, tickers, period="1y", interval="1d", start=None):
+        tickers = list(dict.fromkeys(tickers))
+        if interval != "1d":
+            # Lageret holder kun dagsbars
+            return self.loader.load(tickers, period=period, interval=interval, start=start)
+
+        spans = self.store.spans(tickers)
+        listings = self.store.listings(tickers)
+        start = period_start(period) if start is None else pd.Timestamp(start)
+        # Full nedlasting for tickere uten lagret historikk, eller med kortere
+        # historikk enn kilden har for perioden det spørres om
+        missing = [t for t in tickers if t not in spans or _short(spans[t][0], start, listings.get(t))]
+        # Treff: lagret historikk, bare nye bars hentes. Bom: full nedlasting.
+        METRICS.incr("cache_requests", len(tickers) - len(missing), cache="prices", result="hit")
+        METRICS.incr("cache_requests", len(missing), cache="prices", result="miss")
+        fetched = LoadResult()
+        if missing:
+            fetched.merge(self._download(missing, period))
+
+        # Grupper på startdato slik at hver gruppe blir ett batch-kall. De to
+        # siste lagrede barene hentes på nytt: den siste i tilfelle den var
+        # uferdig, den nest siste for å oppdage ny justering.
+        stored = [t for t in tickers if t in spans and t not in missing]
+        tails = self.store.tails(stored, 2)
+        by_start = {}
+        for t in stored:
+            by_start.setdefault(tails[t].index[0], []).append(t)
+        recent = LoadResult()
+        for since, group in by_start.items():
+            recent.merge(self.loader.load(group, period=period, interval=interval, start=since))
+
+        readjusted = [t for t, df in recent.frames.items() if not _consistent(tails[t], df)]
+        if readjusted:
+            METRICS.incr("store_readjusted", len(readjusted))
+            full = self._download(readjusted, period)
+            for t in readjusted:
+                # Feiler nedlastingen, beholdes den gamle historikken (uten de nye barene)
+                del recent.frames[t]
+                if t in full.frames:
+                    self.store.delete(t)
+            recent.merge(full)
+        fetched.merge(recent)
+
+        for t, df in fetched.frames.items():
+            self.store.upsert(t, df)
+
+        result = LoadResult(frames=self.store.read_many(tickers, start))
+        for t, reason in fetched.errors.items():
+            if t in result.frames:
+                result.stale[t] = reason
+            else:
+                result.errors[t] = reason
+        return result
+
+    def _download(self, tickers, period):
+        """Full nedlasting av ``period``; noteringsdatoen lagres når kilden starter senere."""
+        fetched = self.loader.load(tickers, period=period)
+        asked = period_start(period)
+        for t, df in fetched.frames.items():
+            if asked is None or df.index[0] > asked + _GAP:
+                self.store.set_listing(t, df.index[0])
+        return fetched
+
+
+def _short(first, start, listed):
+    """True når den lagrede historikken starter senere enn kilden kan gi fra ``start``."""
+    if listed is not None:
+        start = listed if start is None else max(start, listed)
+    return start is None or first > start + _GAP
+
+
+def _consistent(stored, fetched):
+    """False når den overlappende, ferdige baren er justert på nytt hos kilden."""
+    if len(stored) < 2 or stored.index[0] not in fetched.index:
+        return True  # bare én lagret bar (kan være uferdig), eller ingenting å sammenligne med
+    old = stored[_PRICES].iloc[0].to_numpy(float)
+    new = fetched.reindex(columns=_PRICES).loc[stored.index[0]].to_numpy(float)
+    return bool(np.allclose(old, new, rtol=ADJUST_TOL, atol=0, equal_nan=True))
@@ -0,0 +1,381 @@
+"""Inkrementelle indikatorer: seedes én gang fra historikk, oppdateres bar for bar.
+
+Hver oppdatering koster O(1) (SMA: O(vindu)) uansett hvor lang historikken
+er. Verdiene er identiske med ``engine.indicators`` kjørt over de samme
+barene (historikken det ble seedet fra pluss alle oppdateringer); mot et
+glidende 1-års vindu skiller EMA/RSI/ATR seg bare i startbetingelsen, som
+dempes bort eksponentielt.
+
+Tilstanden serialiseres som JSON og lagres i prislageret (tabellen
+``indicator_state``), slik at den overlever omstart. Er historikken justert
+på nytt hos kilden (splitt/utbytte, se ``engine.store``), stemmer ikke de
+lagrede sluttkursene med barene lenger, og tilstanden seedes på nytt.
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+from collections import deque
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+from engine import DATA_DIR
+from engine.indicators import DEFAULT_SPEC
+
+NAN = float("nan")
+REBUILD_TOL = 1e-9  # relativt avvik i en tidligere sluttkurs som betyr ny justering
+
+
+def _isnan(x):
+    return x != x
+
+
+class SMA:
+    kind = "sma"
+
+    def __init__(self, length):
+        self.length = length
+        self.window = deque(maxlen=length)
+
+    def update(self, x):
+        self.window.append(x)
+        return self.value
+
+    @property
+    def value(self):
+        if len(self.window) < self.length:
+            return NAN
+        # Samme summeringsrekkefølge som indicators.sma (eldste bar først)
+        w = 1.0 / self.length
+        acc = 0.0
+        for v in self.window:
+            acc += w * v
+        return acc
+
+    def state(self):
+        return {"window": list(self.window)}
+
+    def restore(self, s):
+        self.window = deque(s["window"], maxlen=self.length)
+
+
+class EWM:
+    """``Series.ewm(..., adjust=False).mean()`` ett steg av gangen."""
+
+    kind = "ewm"
+
+    def __init__(self, span=None, alpha=None):
+        # Samme vei via center of mass som pandas, så alpha blir bit-lik
+        com = (span - 1) / 2 if span is not None else (1 - alpha) / alpha
+        self.alpha = 1.0 / (1.0 + com)
+        self.old_wt = 1.0 - self.alpha
+        self.value = NAN
+
+    def update(self, x):
+        if _isnan(x):
+            return self.value
+        if _isnan(self.value):
+            self.value = x
+        elif self.value != x:
+            self.value = (self.old_wt * self.value + self.alpha * x) / (self.old_wt + self.alpha)
+        return self.value
+
+    def state(self):
+        return {"value": self.value}
+
+    def restore(self, s):
+        self.value = s["value"]
+
+
+class EMA:
+    """pandas_ta ``ema``: første verdi er SMA av de ``length`` første barene."""
+
+    kind = "ema"
+
+    def __init__(self, length, span=None, alpha=None):
+        self.length = length
+        self.ewm = EWM(span=span, alpha=alpha) if (span or alpha) else EWM(span=length)
+        self.head = []
+
+    def update(self, x):
+        if len(self.head) < self.length:
+            self.head.append(x)
+            if len(self.head) == self.length:
+                self.ewm.update(float(np.array(self.head).sum() / self.length))
+            return self.value
+        return self.ewm.update(x)
+
+    @property
+    def value(self):
+        return self.ewm.value
+
+    def state(self):
+        return {"head": self.head, "value": self.ewm.value}
+
+    def restore(self, s):
+        self.head = list(s["head"])
+        self.ewm.value = s["value"]
+
+
+class RSI:
+    kind = "rsi"
+
+    def __init__(self, length):
+        self.length = length
+        self.prev = NAN
+        self.bars = 0
+        self.positive = EWM(alpha=1.0 / length)
+        self.negative = EWM(alpha=1.0 / length)
+
+    def update(self, close):
+        diff = close - self.prev
+        self.prev = close
+        self.bars += 1
+        self.positive.update(0.0 if diff < 0 else diff)
+        self.negative.update(0.0 if diff > 0 else diff)
+        return self.value
+
+    @property
+    def value(self):
+        if self.bars < self.length + 1:
+            return NAN
+        pa, na = self.positive.value, self.negative.value
+        return 100 * pa / (pa + abs(na))
+
+    def state(self):
+        return {"prev": self.prev, "bars": self.bars,
+                "positive": self.positive.value, "negative": self.negative.value}
+
+    def restore(self, s):
+        self.prev, self.bars = s["prev"], s["bars"]
+        self.positive.value, self.negative.value = s["positive"], s["negative"]
+
+
+class ATR:
+    """ATR med pandas_ta sin ``non_zero_range``-regel.
+
+    pandas_ta legger epsilon på *hele* høy-lav-serien så snart én bar har
+    null spenn. Kommer første slike bar etter seeding, endres i prinsippet
+    historikken bakover; da settes ``exact = False`` og eieren bør seede på nytt.
+    """
+
+    kind = "atr"
+
+    def __init__(self, length):
+        self.length = length
+        self.prev = NAN
+        self.bars = 0
+        self.zero_range = False
+        self.exact = True
+        self.rma = EMA(length, alpha=1.0 / length)
+
+    def update(self, high, low, close):
+        hl = high - low
+        if hl == 0 and not self.zero_range:
+            self.zero_range = True
+            self.exact = self.bars == 0
+        if self.zero_range:
+            hl += sys.float_info.epsilon
+        pc = self.prev
+        tr = abs(hl)
+        if not _isnan(pc):
+            tr = max(tr, abs(high - pc), abs(pc - low))
+        self.prev = close
+        self.bars += 1
+        self.rma.update(tr)
+        return self.value
+
+    @property
+    def value(self):
+        return self.rma.value if self.bars >= self.length + 1 else NAN
+
+    def state(self):
+        return {"prev": self.prev, "bars": self.bars, "zero_range": self.zero_range,
+                "exact": self.exact, "rma": self.rma.state()}
+
+    def restore(self, s):
+        self.prev, self.bars = s["prev"], s["bars"]
+        self.zero_range, self.exact = s["zero_range"], s["exact"]
+        self.rma.restore(s["rma"])
+
+
+_KINDS = {"sma": SMA, "ema": EMA, "rsi": RSI, "atr": ATR}
+
+
+class IndicatorSet:
+    """Alle indikatorene fetch_and_analyze trenger for én ticker.
+
+    ``update`` tar én bar; kommer samme dato igjen (dagens bar var uferdig),
+    rulles siste oppdatering tilbake og baren regnes på nytt.
+    """
+
+    def __init__(self, spec=None):
+        self.spec = dict(spec or DEFAULT_SPEC)
+        self.ind = {name: _KINDS[kind](length) for name, (kind, length) in self.spec.items()}
+        self.closes = deque(maxlen=5)
+        self.bars = 0
+        self.last_date = None
+        self._undo = None
+
+    @classmethod
+    def seeded(cls, df, spec=None):
+        s = cls(spec)
+        zero_range = bool((df["High"] - df["Low"] == 0).any())
+        for i in s.ind.values():
+            if i.kind == "atr":
+                i.zero_range = zero_range
+        s.extend(df)
+        return s
+
+    @property
+    def exact(self):
+        return all(getattr(i, "exact", True) for i in self.ind.values())
+
+    def update(self, date, high, low, close, undo=True):
+        date = pd.Timestamp(date)
+        if self.last_date is not None and date <= self.last_date:
+            if date < self.last_date or self._undo is None:
+                raise ValueError(f"Bar {date:%Y-%m-%d} er eldre enn tilstanden ({self.last_date:%Y-%m-%d})")
+            self.restore(self._undo)
+        self._undo = self.state(undo=False) if undo else None
+        for i in self.ind.values():
+            if i.kind == "atr":
+                i.update(high, low, close)
+            else:
+                i.update(close)
+        self.closes.append(close)
+        self.bars += 1
+        self.last_date = date
+
+    def extend(self, df):
+        # Angre-punkt trengs bare for siste bar
+        last = len(df) - 1
+        for n, (date, h, l, c) in enumerate(zip(df.index, df["High"].to_numpy(float),
+                                                df["Low"].to_numpy(float), df["Close"].to_numpy(float))):
+            self.update(date, h, l, c, undo=n == last)
+
+    def values(self):
+        closes = list(self.closes)
+        row = {
+            "bars": self.bars,
+            "close": closes[-1] if closes else NAN,
+            "prev_close": closes[-2] if len(closes) > 1 else NAN,
+            "close_5": closes[-5] if len(closes) >= 5 else NAN,
+        }
+        row.update({name: i.value for name, i in self.ind.items()})
+        return row
+
+    def state(self, undo=True):
+        s = {
+            "spec": {k: list(v) for k, v in self.spec.items()},
+            "bars": self.bars,
+            "closes": list(self.closes),
+            "last_date": None if self.last_date is None else self.last_date.isoformat(),
+            "ind": {name: i.state() for name, i in self.ind.items()},
+        }
+        if undo:
+            s["undo"] = self._undo
+        return s
+
+    def restore(self, s):
+        self.bars = s["bars"]
+        self.closes = deque(s["closes"], maxlen=5)
+        self.last_date = None if s["last_date"] is None else pd.Timestamp(s["last_date"])
+        for name, i in self.ind.items():
+            i.restore(s["ind"][name])
+        self._undo = s.get("undo")
+
+    def to_json(self):
+        # NaN er gyldig i Pythons json (allow_nan), og overlever rundturen
+        return json.dumps(self.state())
+
+    @classmethod
+    def from_json(cls, text):
+        s = json.loads(text)
+        obj = cls({k: tuple(v) for k, v in s["spec"].items()})
+        obj.restore(s)
+        return obj
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS indicator_state (
+    ticker TEXT PRIMARY KEY,
+    state  TEXT NOT NULL
+)
+"""
+
+
+class IncrementalIndicators:
+    """Holder en ``IndicatorSet`` per ticker og lagrer dem ved siden av prisene.
+
+    Trådsikker: shards og flere listers oppdateringer kan dele en instans,
+    og hver tickers tilstand oppdateres under sin egen lås.
+    """
+
+    def __init__(self, path=None, spec=None):
+        self.path = path or os.path.join(DATA_DIR, "prices.sqlite")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.spec = dict(spec or DEFAULT_SPEC)
+        self.sets = {}
+        self._locks = {}
+        self._guard = threading.Lock()
+        with closing(sqlite3.connect(self.path, timeout=30)) as con, con:
+            con.execute(_SCHEMA)
+
+    def _lock(self, ticker):
+        with self._guard:
+            return self._locks.setdefault(ticker, threading.Lock())
+
+    def _load(self, tickers):
+        wanted = [t for t in tickers if t not in self.sets]
+        if not wanted:
+            return
+        with closing(sqlite3.connect(self.path, timeout=30)) as con:
+            marks = ",".join("?" * len(wanted))
+            rows = con.execute(
+                f"SELECT ticker, state FROM indicator_state WHERE ticker IN ({marks})", wanted
+            ).fetchall()
+        for t, text in rows:
+            s = IndicatorSet.from_json(text)
+            if s.spec == self.spec:
+                self.sets.setdefault(t, s)  # en annen tråd kan ha kommet lenger
+
+    def _save(self, rows):
+        if rows:
+            with closing(sqlite3.connect(self.path, timeout=30)) as con, con:
+                con.executemany("INSERT OR REPLACE INTO indicator_state VALUES (?, ?)", rows)
+
+    def _advance(self, t, df):
+        s = self.sets.get(t)
+        if s is not None and s.last_date is not None and s.last_date in df.index and _matches(s, df):
+            # Bare barene fra og med siste kjente dato (den kan ha blitt revidert)
+            s.extend(df[df.index >= s.last_date])
+            if s.exact:
+                return
+        self.sets[t] = IndicatorSet.seeded(df, self.spec)
+
+    def latest(self, frames, tickers=None):
+        """Samme tabell som ``indicators.latest``, oppdatert inkrementelt."""
+        tickers = [t for t in (tickers or frames) if t in frames]
+        self._load(tickers)
+        rows, states = {}, []
+        for t in tickers:
+            with self._lock(t):
+                self._advance(t, frames[t])
+                rows[t] = self.sets[t].values()
+                states.append((t, self.sets[t].to_json()))
+        self._save(states)
+        return pd.DataFrame.from_dict(rows, orient="index").rename_axis("ticker")
+
+
+def _matches(s, df):
+    """True når sluttkursene før ``s.last_date`` i tilstanden er de samme som i ``df``."""
+    before = list(s.closes)[:-1]  # siste bar kan være revidert, og regnes uansett om
+    close = df["Close"].to_numpy(float)[:df.index.get_loc(s.last_date)]
+    n = min(len(before), len(close))
+    if not n:
+        return True
+    return bool(np.allclose(before[-n:], close[-n:], rtol=REBUILD_TOL, atol=0, equal_nan=True))
@@ -0,0 +1,67 @@
+"""Relativ styrke mot Oslo Børs (OSEBX) og mot sektoren.
+
+For hver horisont i ``HORIZONS`` (1, 3 og 6 måneder med handelsdager) er
+``rs_*`` hvor mye tickeren har gjort det bedre enn indeksen over de samme
+dagene, i prosent: ``(1 + avkastning) / (1 + indeksens avkastning) - 1``.
+Alt regnes i ett vektorisert pass over prispanelet; indeksen lastes ned én
+gang per kjøring (``INDEX``), uansett hvor stort universet er.
+
+Når hele listen er analysert rangeres den (``rank``):
+
+  rs_rank    persentil (0–100, 100 = sterkest) av snittet av horisontene
+  rs_sektor  samme persentil blant tickerne i samme sektor (``engine.sectors``)
+
+``rs_3m`` over 0 kan også telle i sannsynlighetsscoren (``Rules.w_strength``,
+av som standard).
+"""
+import numpy as np
+import pandas as pd
+
+from engine.panel import compact, layout
+from engine.sectors import sector
+from engine.summary import FLOAT_FIELDS
+
+INDEX = "OSEBX.OL"
+# Resultatkolonne -> antall handelsdager
+HORIZONS = {"rs_1m": 21, "rs_3m": 63, "rs_6m": 126}
+COLUMNS = tuple(HORIZONS)
+RANK_COLUMNS = ("rs_rank", "rs_sektor")
+MIN_PEERS = 3  # tickere i sektoren før sektorrangen regnes
+
+
+def relative_strength(panel, index_close):
+    """``rs_*`` per ticker (rader) mot ``index_close`` (Series med datoer); NaN ved for kort historikk."""
+    close = panel["Close"].to_numpy(float)
+    if not panel.tickers:
+        return pd.DataFrame(columns=list(COLUMNS), dtype=float)
+    valid = ~np.isnan(close)
+    # Indeksen på panelets datoer (siste kjente verdi der børsen og tickeren ikke har samme dager)
+    index = index_close.reindex(index_close.index.union(panel.index)).ffill().reindex(panel.index)
+    bench = np.where(valid, index.to_numpy(float)[:, None], np.nan)
+    # Kompakt: hver tickers bars skjøvet ned mot siste rad, indeksen på de samme dagene
+    where = layout(valid)
+    c, b = compact(close, where), compact(bench, where)
+    out = {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for column, n in HORIZONS.items():
+            if n >= len(c):
+                out[column] = np.full(len(panel.tickers), np.nan)
+                continue
+            out[column] = ((c[-1] / c[-1 - n]) / (b[-1] / b[-1 - n]) - 1) * 100
+    return pd.DataFrame(out, index=panel.tickers)
+
+
+def rank(table):
+    """Fyller ``rs_rank`` og ``rs_sektor`` i ``table`` (``SummaryTable``) for hele listen."""
+    if not len(table):
+        return table
+    rs = pd.DataFrame({c: table.column(c) for c in COLUMNS})
+    # Snittet av log-forholdene, så 1, 3 og 6 måneder teller likt (kort historikk: de som finnes)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        composite = np.log1p(rs / 100).mean(axis=1)
+    sectors = pd.Series([sector(t) for t in table.ticker])
+    table.values[:, FLOAT_FIELDS.index("rs_rank")] = (composite.rank(pct=True) * 100).round(1).to_numpy()
+    peers = composite.groupby(sectors).transform("count")
+    by_sector = (composite.groupby(sectors).rank(pct=True) * 100).round(1)
+    table.values[:, FLOAT_FIELDS.index("rs_sektor")] = by_sector.where(peers >= MIN_PEERS).to_numpy()
+    return table
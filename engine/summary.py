@@ -0,0 +1,158 @@
+"""Kompakt skjermresultat: én NumPy-array per felt i stedet for en liste med dicts.
+
+Tabellen er det snapshotet som pickles inn i den delte cachen ved hver
+publisering og ut igjen i hver replika (``engine.cache.SharedSnapshotStore``,
+holdt i ``st.cache_resource``), så den holdes fri for DataFrames og
+Python-objekter per rad. Prishistorikk til
+grafen hentes separat fra prislageret (``PriceStore.tail``).
+
+Radene lagres i innlest rekkefølge. Antall per signal regnes ved bygging,
+``top(k)`` velger de k beste uten å sortere resten, og full rangering
+(``order``) regnes først når noen ber om den. ``query`` filtrerer og
+sorterer på kolonnene og gjør bare den synlige siden om til dicts.
+"""
+import numpy as np
+
+from engine.signals import SIGNALS
+
+FLOAT_FIELDS = ("pris", "endring", "rsi", "target", "stop_loss", "pot_kr", "pot_pct",
+                "risk_kr", "risk_pct", "support", "trend_uke", "trend_mnd",
+                "rs_1m", "rs_3m", "rs_6m", "rs_rank", "rs_sektor")
+# None i radene når de mangler
+OPTIONAL_FIELDS = ("support", "trend_uke", "trend_mnd", "rs_1m", "rs_3m", "rs_6m", "rs_rank", "rs_sektor")
+
+
+class SummaryTable:
+    """Resultattabell; indeksering gir rader som dicts i rangert rekkefølge, slik dashboardet forventer."""
+
+    __slots__ = ("ticker", "code", "prob", "values", "signal_counts", "_order")
+
+    def __init__(self, ticker, code, prob, values):
+        self.ticker = ticker   # (n,) str
+        self.code = code       # (n,) int8, indeks i SIGNALS
+        self.prob = prob       # (n,) int16
+        self.values = values   # (n, len(FLOAT_FIELDS)) float64, NaN = mangler
+        self.signal_counts = np.bincount(code, minlength=len(SIGNALS))
+        self._order = None
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Bygger tabellen fra rader (dicts), uten å sortere."""
+        n = len(rows)
+        ticker = np.array([r["ticker"] for r in rows], dtype=str) if n else np.empty(0, dtype=str)
+        code = np.array([SIGNALS.index(r["signal"]) for r in rows], dtype=np.int8)
+        prob = np.array([r["prob"] for r in rows], dtype=np.int16)
+        # Felt som regnes for hele tabellen (rs_rank, rs_sektor) mangler i radene
+        values = np.array([[np.nan if r.get(f) is None else r[f] for f in FLOAT_FIELDS] for r in rows],
+                          dtype=np.float64).reshape(n, len(FLOAT_FIELDS))
+        return cls(ticker, code, prob, values)
+
+    def _rank_key(self):
+        # Signal først (BUY = 0), så høyest prob: ett heltall. Likhet avgjøres av pot_pct.
+        return self.code.astype(np.int32) * 1000 - self.prob, -self.column("pot_pct")
+
+    def order(self):
+        """Radindekser i rangert rekkefølge: BUY først, så prob, så pot_pct (begge høyest først)."""
+        if self._order is None:
+            primary, secondary = self._rank_key()
+            # lexsort er stabil og tar siste nøkkel først
+            self._order = np.lexsort((secondary, primary))
+        return self._order
+
+    def top_index(self, k):
+        """Indeksene til de ``k`` beste radene, i samme rekkefølge som ``order()[:k]``."""
+        n = len(self)
+        if self._order is not None or k >= n:
+            return self.order()[:k]
+        if k <= 0:
+            return np.empty(0, dtype=np.intp)
+        primary, secondary = self._rank_key()
+        # Alle rader med primærnøkkel til og med den k-te beste er kandidater (likheter inkludert);
+        # bare de sorteres, og stabil lexsort på stigende indekser gir samme rekkefølge som full sort
+        cut = np.partition(primary, k - 1)[k - 1]
+        candidates = np.flatnonzero(primary <= cut)
+        ranked = candidates[np.lexsort((secondary[candidates], primary[candidates]))]
+        return ranked[:k]
+
+    def top(self, k):
+        """De ``k`` beste radene som dicts."""
+        return [self.row(i) for i in self.top_index(k)]
+
+    def column(self, name):
+        if name == "ticker":
+            return self.ticker
+        if name == "prob":
+            return self.prob
+        if name == "signal":
+            return self.code
+        return self.values[:, FLOAT_FIELDS.index(name)]
+
+    def query(self, signals=None, search="", sort=None, descending=True, page=0, size=25):
+        """Én side av filtrert og sortert resultat: (rader, antall treff).
+
+        ``sort=None`` gir rangeringen; ellers sorteres det på kolonnen, med
+        rangeringen som rekkefølge ved likhet. Manglende verdier havner sist.
+        """
+        idx = self.order()
+        if signals is not None:
+            codes = [SIGNALS.index(s) for s in signals]
+            idx = idx[np.isin(self.code[idx], codes)]
+        if search:
+            hit = np.char.find(np.char.upper(self.ticker[idx]), search.strip().upper()) >= 0
+            idx = idx[hit]
+        if sort is not None:
+            key = self.column(sort)[idx]
+            if key.dtype.kind in "US":
+                pos = np.argsort(key, kind="stable")
+                idx = idx[pos[::-1] if descending else pos]
+            else:
+                key = key.astype(np.float64)
+                key = np.where(np.isnan(key), np.inf, -key if descending else key)
+                idx = idx[np.argsort(key, kind="stable")]
+        start = max(page, 0) * size
+        return [self.row(i) for i in idx[start:start + size]], len(idx)
+
+    def __len__(self):
+        return len(self.ticker)
+
+    def __getitem__(self, i):
+        order = self.order()
+        if isinstance(i, slice):
+            return [self.row(j) for j in order[i]]
+        return self.row(order[i])
+
+    def __iter__(self):
+        return (self.row(i) for i in self.order())
+
+    def row(self, i):
+        """Rad nummer ``i`` i lagret (ikke rangert) rekkefølge."""
+        t = str(self.ticker[i])
+        r = {"ticker": t, "ticker_short": t.replace(".OL", ""), "signal": SIGNALS[self.code[i]]}
+        for f, v in zip(FLOAT_FIELDS, self.values[i].tolist()):
+            r[f] = v
+        for f in OPTIONAL_FIELDS:
+            if r[f] != r[f]:
+                r[f] = None
+        r["prob"] = int(self.prob[i])
+        return r
+
+    def find(self, ticker):
+        """Raden for ``ticker``, eller None."""
+        hit = np.flatnonzero(self.ticker == ticker)
+        return self.row(hit[0]) if len(hit) else None
+
+    def to_frame(self):
+        """Hele tabellen i rangert rekkefølge som DataFrame (til eksport)."""
+        import pandas as pd
+
+        order = self.order()
+        frame = pd.DataFrame({"ticker": self.ticker[order],
+                              "signal": np.asarray(SIGNALS, dtype=object)[self.code[order]],
+                              "prob": self.prob[order].astype(int)})
+        for k, f in enumerate(FLOAT_FIELDS):
+            frame[f] = self.values[order, k]
+        return frame
+
+    def counts(self):
+        """Antall per signal, som {"BUY": n, ...} (regnet da tabellen ble bygget)."""
+        return dict(zip(SIGNALS, self.signal_counts.tolist()))
@@ -0,0 +1,206 @@
+"""Grid-/random-søk over signalterskler og score-vekter, parallelt på alle kjerner.
+
+Det som ikke avhenger av parametrene (indikatorer, motstand, momentum)
+regnes én gang i hovedprosessen og legges i delt minne
+(``multiprocessing.shared_memory``). Arbeiderne kobler seg på de samme
+bufferne i stedet for å få panelet kopiert inn. Simuleringen av stop/target
+caches per (stop_atr, fallback_target) i hver arbeider, og oppgavene
+sorteres slik at like stop-parametre havner i samme arbeider.
+
+Kjør: python -m engine.sweep --grid rsi_buy=50,55,60 stop_atr=1.5,2,2.5 [--random 500]
+"""
+import argparse
+import itertools
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import fields, replace
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from engine.backtest import PROB_BINS, apply_rules, features, simulate, trend_features
+from engine.signals import BUY, RULES, Rules
+
+_OHLC = ("Open", "High", "Low", "Close")
+_FEATURES = ("rsi", "sma20", "sma50", "atr", "ema12", "ema26", "five_day", "resistance", "eligible",
+             "trend_uke", "trend_mnd")
+
+
+class SharedArrays:
+    """Navngitte NumPy-arrays i delt minne; ``spec`` sendes til arbeiderne."""
+
+    def __init__(self, arrays):
+        self._blocks = []
+        self.spec = {}
+        for name, a in arrays.items():
+            a = np.ascontiguousarray(a)
+            shm = shared_memory.SharedMemory(create=True, size=max(a.nbytes, 1))
+            np.ndarray(a.shape, a.dtype, buffer=shm.buf)[...] = a
+            self._blocks.append(shm)
+            self.spec[name] = (shm.name, a.shape, a.dtype.str)
+
+    def close(self):
+        for shm in self._blocks:
+            shm.close()
+            shm.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def attach(spec):
+    """Kobler til arrays i delt minne (uten kopi). Blokkene returneres også,
+    og må holdes i live så lenge arrayene brukes."""
+    blocks, arrays = [], {}
+    for name, (shm_name, shape, dtype) in spec.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        blocks.append(shm)
+        arrays[name] = np.ndarray(shape, np.dtype(dtype), buffer=shm.buf)
+    return arrays, blocks
+
+
+# Tilstand i hver arbeiderprosess
+_worker = {}
+
+
+def _init_worker(spec, horizon):
+    arrays, blocks = attach(spec)
+    _worker.update(arrays=arrays, blocks=blocks, horizon=horizon, sims={})
+
+
+def score(o, f, rules, horizon=30, sims=None):
+    """Nøkkeltall for én parameterkombinasjon (BUY-handler + kalibrering av prob)."""
+    hist = apply_rules(o, f, rules)
+    key = (rules.stop_atr, rules.fallback_target)
+    if sims is not None and key in sims:
+        outcome, exit_px = sims[key]
+    else:
+        outcome, exit_px, _ = simulate(o, hist["stop"], hist["target"], horizon)
+        if sims is not None:
+            sims.clear()  # én stop-kombinasjon om gangen holder minnet nede
+            sims[key] = (outcome, exit_px)
+
+    close = o["Close"]
+    done = hist["eligible"] & ~np.isnan(outcome)
+    buy = done & (hist["code"] == BUY)
+    r = (exit_px[buy] - close[buy]) / (close[buy] - hist["stop"][buy])
+    ret = (exit_px[buy] - close[buy]) / close[buy] * 100
+
+    # Kalibrering: vektet avvik mellom prob og faktisk treffrate per bøtte
+    prob, hit = hist["prob"][done], outcome[done] == 1
+    bucket = np.digitize(prob, PROB_BINS[1:-1])
+    counts = np.bincount(bucket, minlength=len(PROB_BINS) - 1)
+    with np.errstate(invalid="ignore"):
+        mean_prob = np.bincount(bucket, prob, len(PROB_BINS) - 1) / counts
+        hit_rate = np.bincount(bucket, hit, len(PROB_BINS) - 1) / counts * 100
+    calib = float(np.nansum(np.abs(mean_prob - hit_rate) * counts) / max(counts.sum(), 1))
+
+    n = int(buy.sum())
+    return {
+        "handler": n,
+        "treffrate": float((outcome[buy] == 1).mean() * 100) if n else np.nan,
+        "snitt_pct": float(ret.mean()) if n else np.nan,
+        "forventning_r": float(r.mean()) if n else np.nan,
+        "kalibreringsavvik": calib,
+    }
+
+
+def _run_one(params):
+    a = _worker["arrays"]
+    o = {k: a[k] for k in _OHLC}
+    f = {k: a[k] for k in _FEATURES if k in a}
+    return score(o, f, replace(RULES, **params), _worker["horizon"], _worker["sims"])
+
+
+def combinations(grid, samples=None, seed=0):
+    """Alle kombinasjoner i ``grid`` (navn -> verdier), eller ``samples`` tilfeldige."""
+    names = list(grid)
+    total = int(np.prod([len(grid[n]) for n in names])) if names else 1
+    if samples is None or samples >= total:
+        combos = itertools.product(*(grid[n] for n in names))
+    else:
+        rng = random.Random(seed)
+        picks = rng.sample(range(total), samples)
+        sizes = [len(grid[n]) for n in names]
+        combos = []
+        for p in picks:
+            idx = []
+            for size in reversed(sizes):
+                p, i = divmod(p, size)
+                idx.append(i)
+            combos.append(tuple(grid[n][i] for n, i in zip(names, reversed(idx))))
+    params = [dict(zip(names, c)) for c in combos]
+    # Samle like stop-parametre slik at simuleringen gjenbrukes i arbeideren
+    return sorted(params, key=lambda p: (p.get("stop_atr", RULES.stop_atr),
+                                         p.get("fallback_target", RULES.fallback_target)))
+
+
+def sweep(o, params, horizon=30, lookback=60, width=1, workers=None, min_trades=30, trend=None):
+    """Evaluerer alle parameterkombinasjoner; returnerer rangert tabell.
+
+    ``trend`` er uke-/månedsflaggene fra ``backtest.trend_features``.
+    """
+    f = features(o, lookback, width, trend)
+    arrays = {**{k: o[k] for k in _OHLC}, **{k: f[k] for k in _FEATURES if k in f}}
+    workers = workers or os.cpu_count() or 1
+    chunk = max(1, len(params) // (workers * 8))
+    with SharedArrays(arrays) as shared, ProcessPoolExecutor(
+        workers, initializer=_init_worker, initargs=(shared.spec, horizon)
+    ) as pool:
+        rows = list(pool.map(_run_one, params, chunksize=chunk))
+
+    table = pd.concat([pd.DataFrame(params), pd.DataFrame(rows)], axis=1)
+    table = table[table["handler"] >= min_trades]
+    return table.sort_values(["forventning_r", "treffrate"], ascending=False, ignore_index=True)
+
+
+def _parse_grid(items):
+    valid = {f.name: f.type for f in fields(Rules)}
+    grid = {}
+    for item in items:
+        name, _, values = item.partition("=")
+        if name not in valid:
+            raise SystemExit(f"Ukjent parameter: {name} (gyldige: {', '.join(valid)})")
+        cast = int if valid[name] in (int, "int") else float
+        grid[name] = [cast(v) for v in values.split(",")]
+    return grid
+
+
+def main():
+    from engine.backtest import history_frames
+    from engine.indicators import compacted
+    from engine.panel import PricePanel
+
+    parser = argparse.ArgumentParser(description="Parametersøk over signalreglene")
+    parser.add_argument("--grid", nargs="+", required=True, help="navn=v1,v2,... (felter i engine.signals.Rules)")
+    parser.add_argument("--random", type=int, help="antall tilfeldige kombinasjoner i stedet for hele gridet")
+    parser.add_argument("--period", default="5y")
+    parser.add_argument("--horizon", type=int, default=30)
+    parser.add_argument("--tickers", nargs="*")
+    parser.add_argument("--fake", type=int, default=0, help="bruk N syntetiske tickere")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--min-trades", type=int, default=30)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--out", help="skriv hele tabellen til CSV")
+    args = parser.parse_args()
+
+    params = combinations(_parse_grid(args.grid), args.random)
+    panel = PricePanel.from_frames(history_frames(args.period, args.tickers, args.fake))
+    o, where = compacted(panel)
+    table = sweep(o, params, args.horizon, workers=args.workers, min_trades=args.min_trades,
+                  trend=trend_features(panel, where))
+    if args.out:
+        table.to_csv(args.out, index=False)
+    with pd.option_context("display.width", 160, "display.max_columns", 30):
+        print(f"{len(params)} kombinasjoner, {len(table)} med minst {args.min_trades} handler\n")
+        print(table.head(args.top))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Høyere tidsrammer (uke og måned) fra dagsbarene som allerede er lastet.
+
+Dagspanelet aggregeres til uke- og månedsbars med ett vektorisert pass per
+felt over hele panelet (første Open, høyeste High, laveste Low, siste Close,
+summert Volume, som grafens ``resample_ohlc``), så ingenting lastes ned på
+nytt. Inneværende uke og måned teller med slik de står nå.
+
+Trendbekreftelsen er close over SMA på tidsrammen: SMA20 på uke og SMA10 på
+måned (ett års dagsbars gir bare 12–13 månedsbars). Flaggene går inn i
+``bullish_score`` og vises som kolonnene ``trend_uke`` og ``trend_mnd``
+(1 = bekreftet, 0 = ikke, tom = for kort historikk). ``trend_history`` gir
+de samme flaggene slik de sto på hver historiske dagsbar, til backtesten.
+
+De aggregerte panelene caches per panel (tickere, datoakse og siste
+kurser), så en ny kjøring på uendrede data ikke aggregerer på nytt.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from engine.indicators import sma
+from engine.metrics import METRICS
+from engine.panel import PricePanel, compact, layout
+from engine.prices import OHLCV
+
+# Navn -> (pandas-frekvens, SMA-lengde, resultatkolonne)
+TIMEFRAMES = {
+    "uke": ("W-FRI", 20, "trend_uke"),
+    "mnd": ("ME", 10, "trend_mnd"),
+}
+COLUMNS = tuple(column for _, _, column in TIMEFRAMES.values())
+
+_AGG = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+
+
+def resample_panel(panel, rule):
+    """``panel`` aggregert til ``rule``, ett groupby per felt for alle tickere."""
+    grouper = pd.Grouper(freq=rule)
+    fields = {f: panel[f].groupby(grouper).agg(_AGG[f]) for f in OHLCV}
+    # sum gir 0 for perioder uten bars; de skal være tomme som de andre feltene
+    fields["Volume"] = fields["Volume"].where(fields["Close"].notna())
+    return PricePanel(fields)
+
+
+def trend(panel, length):
+    """1.0 der siste close er over SMA``length``, 0.0 der den ikke er, NaN ved for kort historikk."""
+    close = panel["Close"].to_numpy(float)
+    where = layout(~np.isnan(close))
+    # Kompakt: hver tickers bars skjøvet ned mot siste rad, så siste rad er siste bar
+    compacted = compact(close, where)
+    last, avg = compacted[-1], sma(compacted, length)[-1]
+    return pd.Series(np.where(np.isnan(avg), np.nan, (last > avg).astype(float)),
+                     index=panel.tickers)
+
+
+def trend_history(panel, resampled, length):
+    """Flagget fra ``trend`` slik det sto ved hver dagsbar (dato × ticker), uten å se fremover.
+
+    Perioden baren ligger i teller med baren som close (som inneværende uke
+    i dashboardet), og SMA-en tar med de ``length - 1`` siste fullførte
+    periodene før den. ``resampled`` er ``panel`` aggregert til tidsrammen.
+    """
+    close = panel["Close"].to_numpy(float)
+    periods = resampled["Close"].to_numpy(float)
+    valid = ~np.isnan(periods)
+    # Hver tickers perioder med kurs først i kolonnen, summert: sum av de k første = sums[k]
+    order = np.argsort(~valid, axis=0, kind="stable")
+    first = np.nan_to_num(np.take_along_axis(periods, order, axis=0))
+    sums = np.vstack([np.zeros((1, periods.shape[1])), np.cumsum(first, axis=0)])
+    before = np.vstack([np.zeros((1, periods.shape[1]), dtype=np.int64), np.cumsum(valid, axis=0)])
+    # Antall fullførte perioder med kurs før perioden hver dag hører til
+    k = before[resampled.index.searchsorted(panel.index)]
+    n, cols = length - 1, np.arange(close.shape[1])
+    with np.errstate(invalid="ignore"):
+        prior = np.where(k >= n, sums[k, cols] - sums[np.maximum(k - n, 0), cols], np.nan)
+        avg = (prior + close) / length
+        return np.where(np.isnan(avg), np.nan, (close > avg).astype(float))
+
+
+class Timeframes:
+    """Aggregerte uke-/månedspaneler og trendflagg, cachet per dagspanel."""
+
+    def __init__(self, timeframes=None, max_entries=16, metrics=None):
+        self.timeframes = timeframes or TIMEFRAMES
+        self.max_entries = max_entries
+        self.metrics = metrics or METRICS
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, panel):
+        close = panel["Close"]
+        return (tuple(panel.tickers), panel.index[0], panel.index[-1], len(panel),
+                close.iloc[-1].to_numpy(float).tobytes())
+
+    def resampled(self, panel):
+        """{navn: PricePanel} for hver tidsramme."""
+        key = self._key(panel)
+        with self._lock:
+            out = self._cache.get(key)
+            if out is not None:
+                self._cache.move_to_end(key)
+        self.metrics.incr("cache_requests", cache="timeframes", result="miss" if out is None else "hit")
+        if out is None:
+            out = {name: resample_panel(panel, rule) for name, (rule, _, _) in self.timeframes.items()}
+            with self._lock:
+                self._cache[key] = out
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        return out
+
+    def confirm(self, panel):
+        """Trendflagg per ticker (rader) og tidsramme (kolonnene i ``COLUMNS``)."""
+        if not panel.tickers:
+            return pd.DataFrame(columns=[c for _, _, c in self.timeframes.values()], dtype=float)
+        resampled = self.resampled(panel)
+        return pd.DataFrame({column: trend(resampled[name], length)
+                             for name, (_, length, column) in self.timeframes.items()})
+
+    def history(self, panel):
+        """Trendflagg per dagsbar (dato × ticker) for hver tidsramme, til backtesten."""
+        if not panel.tickers:
+            return {c: np.empty((len(panel), 0)) for _, _, c in self.timeframes.values()}
+        resampled = self.resampled(panel)
+        return {column: trend_history(panel, resampled[name], length)
+                for name, (_, length, column) in self.timeframes.items()}
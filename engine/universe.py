@@ -0,0 +1,198 @@
+"""Universet: navngitte tickerlister, billig forhåndsfiltrering og sharding.
+
+Listene lagres i SQLite ved siden av prisene og kan importeres fra filer:
+tekst (én ticker per linje, ``#`` for kommentarer) eller CSV med kolonnen
+``symbol``/``ticker`` (f.eks. eksport av ``universe``-tabellen i Supabase;
+rader med ``is_active`` usann hoppes over).
+
+``prefilter`` sorterer bort tickere med for kort historikk, for lav kurs
+eller for lav omsetning før indikatorene regnes, og ``screen_sharded``
+deler et stort univers i shards som analyseres i en trådpool.
+
+Kjør: python -m engine.universe import oslo oslo.csv | list | show oslo | delete oslo
+"""
+import argparse
+import csv
+import os
+import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+import numpy as np
+
+from engine import DATA_DIR
+from engine.screen import MIN_BARS
+from engine.summary import SummaryTable
+
+DEFAULT = "watchlist"
+WATCHLIST = [
+    "NOD.OL", "SATS.OL", "KID.OL", "VAR.OL", "PROT.OL", "AKSO.OL", "NEL.OL",
+    "FRO.OL", "GOGL.OL", "NAS.OL", "DNB.OL", "EQNR.OL", "YAR.OL", "NHY.OL",
+    "MOWI.OL", "SUBC.OL", "TGS.OL", "AKRBP.OL", "ADE.OL", "IDEX.OL", "AUTO.OL",
+    "LSG.OL", "SALM.OL", "BAKK.OL", "TOM.OL", "KOG.OL", "BORR.OL", "OKEA.OL"
+]
+
+# Forhåndsfilter: kurs i NOK og median dagsomsetning (kurs × volum) siste LIQUIDITY_BARS
+MIN_PRICE = 1.0
+MIN_TURNOVER = 500_000
+LIQUIDITY_BARS = 20
+SHARD_SIZE = 100
+
+_NAME = re.compile(r"^[\w-]+$")
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS universe (
+    name     TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    ticker   TEXT NOT NULL,
+    PRIMARY KEY (name, ticker)
+) WITHOUT ROWID
+"""
+_FALSE = {"0", "false", "f", "no", "nei"}
+
+
+def read_symbols(path):
+    """Tickere fra en tekst- eller CSV-fil, i filens rekkefølge og uten duplikater."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        text = f.read()
+    if path.lower().endswith(".csv"):
+        rows = list(csv.DictReader(text.splitlines()))
+        if not rows:
+            return []
+        fields = {k.strip().lower(): k for k in rows[0]}
+        column = fields.get("symbol") or fields.get("ticker") or next(iter(rows[0]))
+        active = fields.get("is_active")
+        symbols = [r[column] for r in rows
+                   if active is None or str(r[active]).strip().lower() not in _FALSE]
+    else:
+        symbols = [line.split("#", 1)[0] for line in text.splitlines()]
+    return list(dict.fromkeys(s.strip().upper() for s in symbols if s and s.strip()))
+
+
+class UniverseStore:
+    """Navngitte tickerlister i SQLite (samme fil som prislageret)."""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(DATA_DIR, "prices.sqlite")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with closing(self._connect()) as con, con:
+            con.execute(_SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def names(self):
+        with closing(self._connect()) as con:
+            return [n for (n,) in con.execute("SELECT DISTINCT name FROM universe ORDER BY name")]
+
+    def get(self, name):
+        with closing(self._connect()) as con:
+            rows = con.execute("SELECT ticker FROM universe WHERE name = ? ORDER BY position", (name,))
+            return [t for (t,) in rows]
+
+    def save(self, name, tickers):
+        """Erstatter listen ``name``; returnerer antall tickere."""
+        if not _NAME.match(name):
+            raise ValueError(f"Ugyldig navn på liste: {name!r} (bokstaver, tall, _ og -)")
+        tickers = list(dict.fromkeys(tickers))
+        with closing(self._connect()) as con, con:
+            con.execute("DELETE FROM universe WHERE name = ?", (name,))
+            con.executemany("INSERT INTO universe VALUES (?, ?, ?)",
+                            [(name, i, t) for i, t in enumerate(tickers)])
+        return len(tickers)
+
+    def delete(self, name):
+        with closing(self._connect()) as con, con:
+            con.execute("DELETE FROM universe WHERE name = ?", (name,))
+
+    def import_file(self, name, path):
+        return self.save(name, read_symbols(path))
+
+    def ensure(self, name, tickers):
+        """Oppretter listen hvis den ikke finnes (f.eks. standard-watchlisten)."""
+        if not self.get(name):
+            self.save(name, tickers)
+        return self
+
+
+def prefilter(frames, tickers=None, min_bars=MIN_BARS, min_price=MIN_PRICE,
+              min_turnover=MIN_TURNOVER, window=LIQUIDITY_BARS):
+    """Deler tickere i (beholdt, {ticker: grunn}) uten å regne indikatorer.
+
+    Historikkravet er det samme som i ``screen_row``, så en ticker som slipper
+    gjennom her blir ikke avvist for lite historikk senere.
+    """
+    kept, rejected = [], {}
+    for t in (tickers or frames):
+        df = frames.get(t)
+        if df is None:
+            continue
+        if len(df) < min_bars:
+            rejected[t] = "for lite historikk"
+            continue
+        close = df["Close"].to_numpy(float)
+        if close[-1] < min_price:
+            rejected[t] = f"kurs under {min_price:g}"
+            continue
+        turnover = np.nanmedian(close[-window:] * df["Volume"].to_numpy(float)[-window:])
+        if not turnover >= min_turnover:
+            rejected[t] = f"omsetning under {min_turnover:,.0f}".replace(",", " ")
+            continue
+        kept.append(t)
+    return kept, rejected
+
+
+def shards(tickers, size=SHARD_SIZE):
+    return [tickers[i:i + size] for i in range(0, len(tickers), size)]
+
+
+def screen_sharded(tickers, analyze, size=SHARD_SIZE, workers=4):
+    """Kjører ``analyze(shard) -> (rader, feilet, utdatert)`` per shard i en trådpool.
+
+    Radene slås sammen i shard-rekkefølge, så resultatet er det samme som
+    én analyse av hele listen.
+    """
+    parts = shards(list(dict.fromkeys(tickers)), size)
+    if len(parts) <= 1:
+        results = [analyze(p) for p in parts]
+    else:
+        with ThreadPoolExecutor(min(workers, len(parts)), thread_name_prefix="shard") as pool:
+            results = list(pool.map(analyze, parts))
+    rows, failed, stale = [], {}, {}
+    for r, f, s in results:
+        rows.extend(r)
+        failed.update(f)
+        stale.update(s)
+    return SummaryTable.from_rows(rows), failed, stale
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Navngitte tickerlister")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="les en liste fra fil (txt eller csv)")
+    imp.add_argument("name")
+    imp.add_argument("path")
+    sub.add_parser("list", help="vis alle lister")
+    show = sub.add_parser("show", help="vis tickerne i en liste")
+    show.add_argument("name")
+    delete = sub.add_parser("delete", help="slett en liste")
+    delete.add_argument("name")
+    args = parser.parse_args()
+
+    store = UniverseStore().ensure(DEFAULT, WATCHLIST)
+    if args.command == "import":
+        try:
+            print(f"{args.name}: {store.import_file(args.name, args.path)} tickere")
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+    elif args.command == "list":
+        for name in store.names():
+            print(f"{name:<20} {len(store.get(name)):>6}")
+    elif args.command == "show":
+        print("\n".join(store.get(args.name)))
+    else:
+        store.delete(args.name)
+
+
+if __name__ == "__main__":
+    main()
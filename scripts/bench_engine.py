@@ -0,0 +1,212 @@
+"""Benchmark av datamotoren, stadium for stadium, på syntetiske kurser (offline).
+
+For hver størrelse (tickere × år med dagsbars) tas tiden for:
+
+  last          nedlasting og splitting (AsyncLoader mot FakeSource)
+  panel         frames -> PricePanel
+  indikatorer   RSI/SMA/EMA/ATR for alle bars (vektorisert)
+  strøm         inkrementell oppdatering med én ny bar per ticker
+  motstand      pivot-motstand/-støtte siste 60 bars
+  tidsrammer    uke-/månedsbars og trendflagg fra dagspanelet (uten cache)
+  risiko        korrelasjon/kovarians for hele panelet (full beregning)
+  risiko_ny_dag det samme inkrementelt, med én ny dag
+  rel_styrke    meravkastning mot indeksen over 1/3/6 måneder
+  mål_stopp     target og stop for alle tickere
+  scoring       signal og prob (vektorisert)
+  rader         resultatrad per ticker (screen_row, som fetch_and_analyze)
+  sortering     SummaryTable.from_rows og topp 6 (det dashboardet viser)
+  cache         pickle inn og ut av resultatet (det st.cache_data gjør)
+
+``yf.download`` byttes ut med ``FakeSource.download``, så ingenting går på
+nett. Hvert stadium kjøres ``--repeat`` ganger og beste tid brukes.
+
+Regresjonssjekk: lagre en baseline på main-grenen og sammenlign mot den;
+skriptet avslutter med kode 1 hvis et stadium er mer enn ``--threshold``
+tregere. Baselinen er maskinavhengig, så i CI
+(``.github/workflows/bench.yml``) måles base-grenen og PR-en på samme runner.
+
+  python scripts/bench_engine.py --save bench.json
+  python scripts/bench_engine.py --compare bench.json --threshold 0.25
+
+Med flere filer til ``--compare`` (og ``--results``, lagrede kjøringer i
+stedet for en ny) brukes minste tid per stadium, så kjøringer som veksles
+mellom base og PR jevner ut støy på maskinen.
+
+Standard er en rask matrise; ``--tickers 28 200 2000 --years 1 5 20`` gir hele.
+"""
+import argparse
+import json
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import engine.prices as prices  # noqa: E402
+from engine.fetch import AsyncLoader  # noqa: E402
+from engine.indicators import compacted, compute_arrays, latest  # noqa: E402
+from engine.levels import levels  # noqa: E402
+from engine.panel import PricePanel  # noqa: E402
+from engine.portfolio import RiskModel  # noqa: E402
+from engine.screen import screen_row  # noqa: E402
+from engine.signals import RULES, evaluate  # noqa: E402
+from engine.strength import INDEX, relative_strength  # noqa: E402
+from engine.streaming import IncrementalIndicators  # noqa: E402
+from engine.summary import SummaryTable  # noqa: E402
+from engine.timeframes import Timeframes  # noqa: E402
+
+BARS_PER_YEAR = 252
+STREAM_BARS = 300  # historikk strøm-tilstanden seedes fra (påvirker ikke oppdateringen)
+
+
+def best(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t0)
+    return min(times), out
+
+
+def run_case(n_tickers, years, repeat):
+    source = prices.FakeSource(bars=years * BARS_PER_YEAR)
+    prices._yf_download = source.download  # ingen nett, uansett hva som kalles
+    tickers = [f"T{i:04d}.OL" for i in range(n_tickers)]
+    period = f"{years}y" if f"{years}y" in prices.PERIOD_OFFSETS else "max"
+    stages = {}
+
+    loader = AsyncLoader(source.download, chunk_size=100, rate=1e6, burst=1e6)
+    for t in tickers:
+        source.frame(t)  # generering av syntetiske data er ikke en del av målingen
+    stages["last"], loaded = best(lambda: loader.load(tickers, period=period), repeat)
+    loader.close()
+    frames = loaded.frames
+
+    stages["panel"], panel = best(lambda: PricePanel.from_frames(frames, tickers), repeat)
+    o, _ = compacted(panel)
+    stages["indikatorer"], _ = best(lambda: compute_arrays(o), repeat)
+    ind = latest(panel)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        state = IncrementalIndicators(os.path.join(tmp, "state.sqlite"))
+        state.latest({t: df.iloc[-STREAM_BARS:-1] for t, df in frames.items()}, tickers)
+        snapshot = {t: s.state() for t, s in state.sets.items()}
+        recent = {t: df.iloc[-STREAM_BARS:] for t, df in frames.items()}
+
+        def stream():
+            for t, s in state.sets.items():
+                s.restore(snapshot[t])
+            return state.latest(recent, tickers)
+
+        stages["strøm"], _ = best(stream, repeat)
+
+    stages["motstand"], lv = best(lambda: levels(panel, lookback=60, width=1), repeat)
+    stages["tidsrammer"], _ = best(lambda: Timeframes().confirm(panel), repeat)
+    stages["risiko"], _ = best(lambda: RiskModel().update(panel), repeat)
+    earlier = PricePanel({f: panel[f].iloc[:-1] for f in panel.fields})
+
+    def risk_step():
+        model = RiskModel()
+        model.update(earlier)
+        t0 = time.perf_counter()
+        model.update(panel)
+        return time.perf_counter() - t0
+
+    stages["risiko_ny_dag"] = min(risk_step() for _ in range(repeat))
+    index = source.frame(INDEX)["Close"]
+    stages["rel_styrke"], _ = best(lambda: relative_strength(panel, index), repeat)
+
+    close, atr = ind["close"].to_numpy(), ind["atr"].to_numpy()
+    resistance = lv["resistance"].to_numpy()
+
+    def target_stop():
+        target = np.where(np.isnan(resistance), close * RULES.fallback_target, resistance)
+        return target, close - RULES.stop_atr * atr
+
+    stages["mål_stopp"], (target, _) = best(target_stop, repeat)
+    pot_pct = (target - close) / close * 100
+    five_day = close / ind["close_5"].to_numpy() - 1
+    stages["scoring"], _ = best(lambda: evaluate(close, ind["rsi"].to_numpy(), ind["sma20"].to_numpy(),
+                                                 ind["sma50"].to_numpy(), ind["ema12"].to_numpy(),
+                                                 ind["ema26"].to_numpy(), five_day, pot_pct), repeat)
+
+    def rows():
+        out = []
+        for t, values in zip(ind.index, ind.to_dict("records")):
+            row, _ = screen_row(t, values, len(frames[t]), lv.at[t, "resistance"], lv.at[t, "support"])
+            if row:
+                out.append(row)
+        return out
+
+    stages["rader"], result_rows = best(rows, repeat)
+    def ranked():
+        table = SummaryTable.from_rows(result_rows)
+        table.top(6)
+        return table
+
+    stages["sortering"], table = best(ranked, repeat)
+    stages["cache"], _ = best(lambda: pickle.loads(pickle.dumps((table, {}, {}), pickle.HIGHEST_PROTOCOL)),
+                              repeat)
+    return stages
+
+
+def compare(results, baseline, threshold, min_time):
+    regressions = []
+    for case, stages in results.items():
+        for stage, t in stages.items():
+            ref = baseline.get(case, {}).get(stage)
+            if ref is None or max(t, ref) < min_time:
+                continue
+            if t > ref * (1 + threshold):
+                regressions.append(f"{case} {stage}: {ref * 1000:.2f} -> {t * 1000:.2f} ms (+{(t / ref - 1) * 100:.0f}%)")
+    return regressions
+
+
+def fastest(paths):
+    """Minste tid per (størrelse, stadium) over lagrede resultater."""
+    out = {}
+    for path in paths:
+        with open(path) as f:
+            for case, stages in json.load(f).items():
+                best_case = out.setdefault(case, {})
+                for stage, t in stages.items():
+                    best_case[stage] = min(t, best_case.get(stage, t))
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark av datamotoren per stadium")
+    parser.add_argument("--tickers", type=int, nargs="+", default=[28, 200, 2000])
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 5])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", help="skriv resultatene som JSON (baseline)")
+    parser.add_argument("--compare", nargs="+", help="baseline(r) å sammenligne mot")
+    parser.add_argument("--results", nargs="+", help="bruk lagrede resultater i stedet for å kjøre")
+    parser.add_argument("--threshold", type=float, default=0.25, help="tillatt forverring (0.25 = 25 %%)")
+    parser.add_argument("--min-time", type=float, default=0.002,
+                        help="ignorer stadier under dette (sekunder) i begge kjøringer")
+    args = parser.parse_args()
+
+    results = fastest(args.results) if args.results else {}
+    for n in [] if args.results else args.tickers:
+        for years in args.years:
+            case = f"{n}x{years}y"
+            results[case] = stages = run_case(n, years, args.repeat)
+            print(f"{case:>10}  " + "  ".join(f"{k}={v * 1000:.1f}ms" for k, v in stages.items()), flush=True)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        regressions = compare(results, fastest(args.compare), args.threshold, args.min_time)
+        for r in regressions:
+            print("REGRESJON:", r)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
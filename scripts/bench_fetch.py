@@ -0,0 +1,78 @@
+"""Sjekk og benchmark av AsyncLoader mot FakeSource med forsinkelse og feil (offline).
+
+Scenarier: rent, forbigående feil (simulert 429) og én ticker som henger.
+Skriver status per scenario (ok/feilet, tid, antall kall) og avslutter med
+kode 1 hvis AsyncLoader mister tickere den burde fått, eller ikke holder
+timeouten.
+
+Kjør: python scripts/bench_fetch.py [--tickers 28] [--latency 0.25]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from engine.fetch import AsyncLoader  # noqa: E402
+from engine.prices import BatchLoader, FakeSource  # noqa: E402
+
+
+def run(name, loader, source, tickers):
+    source.calls = 0
+    t0 = time.perf_counter()
+    result = loader.load(tickers)
+    elapsed = time.perf_counter() - t0
+    print(f"  {name:<8} {elapsed:7.2f}s  kall={source.calls:<4} ok={len(result.frames):<5} feilet={len(result.errors)}")
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=28)
+    parser.add_argument("--latency", type=float, default=0.25, help="sekunder per kall")
+    parser.add_argument("--chunk", type=int, default=10)
+    args = parser.parse_args()
+
+    tickers = [f"T{i:04d}.OL" for i in range(args.tickers)]
+    invalid, hanging = tickers[0], tickers[1]
+    expected = set(tickers) - {invalid}
+    timeout = 1.0
+    problems = []
+
+    scenarios = {
+        "rent": dict(),
+        "429 30%": dict(error_rate=0.3),
+        "henger": dict(slow=[hanging], slow_latency=3.0),
+    }
+    for scenario, faults in scenarios.items():
+        print(f"{scenario}:")
+        source = FakeSource(latency=args.latency, failing=[invalid], seed=1, **faults)
+        run("batch", BatchLoader(source.download, chunk_size=args.chunk), source, tickers)
+        loader = AsyncLoader(source.download, chunk_size=args.chunk, concurrency=4, rate=20, burst=10,
+                             timeout=timeout, retries=3, backoff_base=0.05, seed=1)
+        result, elapsed = run("async", loader, source, tickers)
+        loader.close()
+
+        want = expected - ({hanging} if "slow" in faults else set())
+        if set(result.frames) != want:
+            problems.append(f"{scenario}: mangler {sorted(want - set(result.frames))}")
+        if invalid not in result.errors:
+            problems.append(f"{scenario}: {invalid} ikke rapportert som feilet")
+        if "slow" in faults and not result.errors.get(hanging, "").startswith("timeout"):
+            problems.append(f"{scenario}: {hanging} ikke rapportert som timeout")
+        for t, frame in result.frames.items():
+            if not frame.equals(source.frame(t).loc[frame.index]):
+                problems.append(f"{scenario}: ulike bars for {t}")
+                break
+        # Tre forsøk med backoff for delen og for tickeren alene, pluss litt slakk
+        if elapsed > 2 * (loader.retries + 1) * timeout + 5:
+            problems.append(f"{scenario}: brukte {elapsed:.1f}s")
+
+    for p in problems:
+        print("FEIL:", p)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Numba-kjernene mot referansen: tid og bit-for-bit-likhet (offline).
+
+Syntetiske dagsbars for ``--tickers`` tickere over ``--years`` år (standard
+1000 × 10), der en del tickere starter senere, mangler enkelte bars eller
+har flate bars (ATR), så hull og spesialtilfeller også testes. For hvert
+stadium kjøres referansen (``engine.kernels.ACCELERATED = False``) og kjernene, og
+resultatene må være identiske bit for bit (samme NaN-er, og -0.0 ≠ 0.0).
+
+  rsi / ema12 / ema26 / atr / sma20 / sma50   enkeltindikatorene
+  indikatorer   alle (``compute_arrays``)
+  scoring       signal og prob for hver bar (``signals.evaluate``)
+  backtest      indikatorer, motstand og regler for hver bar (``signal_history``)
+
+Kompileringen (første kall, eller lasting fra disk-cachen) måles for seg.
+Avslutter med kode 1 ved avvik.
+
+  python scripts/bench_kernels.py [--tickers 1000] [--years 10] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from engine import indicators, kernels  # noqa: E402
+from engine.backtest import signal_history  # noqa: E402
+from engine.indicators import compacted, compute_arrays  # noqa: E402
+from engine.panel import PricePanel  # noqa: E402
+from engine.prices import FakeSource  # noqa: E402
+from engine.signals import evaluate  # noqa: E402
+
+BARS_PER_YEAR = 252
+
+
+def frames_for(n, bars):
+    source = FakeSource(bars=bars)
+    rng = np.random.default_rng(3)
+    frames = {}
+    for i in range(n):
+        t = f"T{i:04d}.OL"
+        df = source.frame(t)
+        if i % 5 == 0:
+            df = df.iloc[int(rng.integers(1, bars - 100)):]  # nyere notering
+        if i % 7 == 0:
+            df = df.drop(df.index[rng.choice(len(df) - 1, 5, replace=False)])  # manglende bars
+        if i % 11 == 0:
+            df = df.copy()
+            for field in ("Open", "High", "Low"):
+                df.iloc[-30:-25, df.columns.get_loc(field)] = df["Close"].iloc[-30:-25]  # flate bars
+        frames[t] = df
+    return frames
+
+
+def identical(a, b):
+    """Samme form, samme NaN-er og ellers samme bits."""
+    a, b = np.asarray(a), np.asarray(b)
+    if a.shape != b.shape or a.dtype != b.dtype:
+        return False
+    if a.dtype.kind != "f":
+        return np.array_equal(a, b)
+    nan = np.isnan(a)
+    return np.array_equal(nan, np.isnan(b)) and np.array_equal(a[~nan].view(np.uint64), b[~nan].view(np.uint64))
+
+
+def same(a, b):
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(same(a[k], b[k]) for k in a)
+    if isinstance(a, tuple):
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    return identical(a, b)
+
+
+def best(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t0)
+    return min(times), out
+
+
+def run(fn, accelerated, repeat):
+    kernels.ACCELERATED = accelerated
+    try:
+        return best(fn, repeat)
+    finally:
+        kernels.ACCELERATED = kernels.AVAILABLE
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Numba-kjernene mot referansen")
+    parser.add_argument("--tickers", type=int, default=1000)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    panel = PricePanel.from_frames(frames_for(args.tickers, args.years * BARS_PER_YEAR))
+    o, _ = compacted(panel)
+    close, high, low = o["Close"], o["High"], o["Low"]
+    print(f"{args.tickers} tickere × {len(panel)} bars ({time.perf_counter() - t0:.1f}s å bygge)")
+
+    if kernels.AVAILABLE:
+        t0 = time.perf_counter()
+        for fn in (lambda: indicators.rsi(close[:60]), lambda: indicators.ema(close[:60], 12),
+                   lambda: indicators.sma(close[:60], 20), lambda: compute_arrays({k: v[:60] for k, v in o.items()})):
+            run(fn, True, 1)
+        print(f"kompilering     {(time.perf_counter() - t0) * 1000:8.1f} ms  (første kall; disk-cache etterpå)")
+    else:
+        print("Numba er ikke installert: bare referansen måles (pip install numba)")
+
+    f = compute_arrays(o)
+    five_day = close / np.vstack([np.full((4, close.shape[1]), np.nan), close[:-4]]) - 1
+    pot_pct = np.where(np.isnan(close), np.nan, 5 + 10 * np.sin(np.arange(close.size)).reshape(close.shape))
+    stages = {
+        "rsi": lambda: indicators.rsi(close, 14),
+        "ema12": lambda: indicators.ema(close, 12),
+        "ema26": lambda: indicators.ema(close, 26),
+        "atr": lambda: indicators.atr(high, low, close, 14),
+        "sma20": lambda: indicators.sma(close, 20),
+        "sma50": lambda: indicators.sma(close, 50),
+        "indikatorer": lambda: compute_arrays(o),
+        "scoring": lambda: evaluate(close, f["rsi"], f["sma20"], f["sma50"], f["ema12"], f["ema26"],
+                                    five_day, pot_pct),
+        "backtest": lambda: signal_history(o),
+    }
+
+    failed = []
+    print(f"{'':14} {'referanse':>10} {'numba':>10} {'faktor':>8}  likhet")
+    for name, fn in stages.items():
+        ref_time, ref = run(fn, False, args.repeat)
+        if not kernels.AVAILABLE:
+            print(f"{name:14} {ref_time * 1000:8.1f}ms")
+            continue
+        fast_time, fast = run(fn, True, args.repeat)
+        ok = same(ref, fast)
+        if not ok:
+            failed.append(name)
+        print(f"{name:14} {ref_time * 1000:8.1f}ms {fast_time * 1000:8.1f}ms {ref_time / fast_time:7.1f}x  "
+              f"{'bit-identisk' if ok else 'AVVIK'}")
+
+    for name in failed:
+        print("AVVIK:", name)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Benchmark: sekvensiell vs. batch prislasting mot lokal FakeSource (offline).
+
+Kjør: python scripts/bench_prices.py [--tickers 28] [--latency 0.25]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from engine.prices import BatchLoader, FakeSource, SequentialLoader  # noqa: E402
+
+
+def run(name, loader, source, tickers):
+    source.calls = 0
+    t0 = time.perf_counter()
+    result = loader.load(tickers)
+    elapsed = time.perf_counter() - t0
+    print(f"{name:<12} {elapsed:8.3f}s  kall={source.calls:<4} ok={len(result.frames):<5} feilet={len(result.errors)}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=28)
+    parser.add_argument("--latency", type=float, default=0.25, help="sekunder per kall")
+    parser.add_argument("--per-ticker", type=float, default=0.005, help="sekunder per symbol i et kall")
+    parser.add_argument("--chunk", type=int, default=100)
+    args = parser.parse_args()
+
+    tickers = [f"T{i:04d}.OL" for i in range(args.tickers)]
+    source = FakeSource(latency=args.latency, per_ticker=args.per_ticker, failing=tickers[:1])
+
+    seq = run("sekvensiell", SequentialLoader(source.download), source, tickers)
+    batch = run("batch", BatchLoader(source.download, chunk_size=args.chunk), source, tickers)
+    print(f"speedup: {seq / batch:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Benchmark: cachet resultat med DataFrames per rad vs. kompakt SummaryTable (offline).
+
+Måler det ``st.cache_data`` gjør ved hver rerun (pickle ut av cachen),
+størrelsen på det cachede objektet og minnet det tar når det er pakket ut,
+for voksende watchlister.
+
+Kjør: python scripts/bench_rerun.py [--tickers 28 200 1000 2000] [--repeat 5]
+"""
+import argparse
+import os
+import pickle
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from engine.prices import FakeSource, period_start  # noqa: E402
+from engine.signals import SIGNALS  # noqa: E402
+from engine.summary import FLOAT_FIELDS, SummaryTable  # noqa: E402
+
+
+def rows_for(frames, seed=0):
+    """Resultatrader som fetch_and_analyze lager, med ``df`` som før."""
+    rows = []
+    for i, (t, df) in enumerate(frames.items()):
+        row = {f: float(df["Close"].iloc[-1]) + k for k, f in enumerate(FLOAT_FIELDS)}
+        row.update(ticker=t, ticker_short=t.replace(".OL", ""), signal=SIGNALS[(i + seed) % 3],
+                   prob=(i * 7) % 100, df=df)
+        rows.append(row)
+    return rows
+
+
+def rerun(blob, repeat):
+    """Snittid for å pakke ut det cachede resultatet (det hver rerun betaler)."""
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        pickle.loads(blob)
+    return (time.perf_counter() - t0) / repeat
+
+
+def resident(blob):
+    """Bytes allokert når resultatet pakkes ut."""
+    tracemalloc.start()
+    obj = pickle.loads(blob)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del obj
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, nargs="+", default=[28, 200, 1000, 2000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    source = FakeSource()
+    start = period_start("1y")
+    print(f"{'tickere':>8} {'variant':<10} {'pickle':>10} {'minne':>10} {'rerun':>10}")
+    for n in args.tickers:
+        frames = {}
+        for i in range(n):
+            t = f"T{i:04d}.OL"
+            df = source.frame(t)
+            frames[t] = df[df.index >= start]
+        rows = rows_for(frames)
+        variants = {
+            "dicts+df": sorted(rows, key=lambda x: (SIGNALS.index(x["signal"]), -x["prob"], -x["pot_pct"])),
+            "tabell": SummaryTable.from_rows(rows),
+        }
+        timings = {}
+        for name, result in variants.items():
+            blob = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+            timings[name] = rerun(blob, args.repeat)
+            print(f"{n:>8} {name:<10} {len(blob) / 1e6:>8.2f}MB {resident(blob) / 1e6:>8.2f}MB "
+                  f"{timings[name] * 1000:>8.2f}ms")
+        print(f"{'':>8} speedup: {timings['dicts+df'] / timings['tabell']:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Oppstartsbudsjett for dashboardet: importtid, første visning og reruns.
+
+Hver måling kjøres i en ny prosess, så ingenting er cachet i minnet:
+
+  import          toppnivå-importene i app.py (``python -X importtime``), utover Streamlit
+  første_visning  første kjøring av app.py mot et lagret snapshot (AppTest), som etter
+                  en omstart av serveren
+  rerun           median av påfølgende reruns i samme økt
+
+Toppnivå-importene skal ikke dra inn ``LAZY`` (pandas, plotly, yfinance,
+pandas_ta) utover det Streamlit selv har importert; de hører hjemme på
+stiene som bruker dem (analysen, tabellen, grafen). Skriptet avslutter med
+kode 1 hvis de gjør det, eller hvis en måling er over budsjettet.
+Tallene er maskinavhengige; syntetiske kurser, så ingenting går på nett.
+
+  python scripts/bench_startup.py
+  python scripts/bench_startup.py --max-import-ms 300 --max-first-ms 2000 --max-rerun-ms 250
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+APP = os.path.join(ROOT, "app.py")
+LAZY = ("pandas", "plotly", "yfinance", "pandas_ta")
+
+_IMPORTS = """
+import json, sys
+sys.path.insert(0, {root!r})
+import streamlit
+before = set(sys.modules)
+{imports}
+print(json.dumps(sorted(set(sys.modules) - before)))
+"""
+
+_RUN = """
+import json, time
+from streamlit import config
+# AppTest skriver om skriptet (magic) ved hver kjøring; serveren cacher det kompilerte skriptet
+config.set_option("runner.magicEnabled", False)
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({app!r}, default_timeout=300)
+t0 = time.perf_counter()
+at.run()
+first = time.perf_counter() - t0
+reruns = []
+for _ in range({reruns}):
+    t0 = time.perf_counter()
+    at.run()
+    reruns.append(time.perf_counter() - t0)
+print(json.dumps({{"first": first, "reruns": reruns, "errors": [str(e.value) for e in at.exception]}}))
+"""
+
+
+def top_level_imports(path=APP):
+    """Import-setningene på toppnivå i ``path``, som kildekode."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    return "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def parse_importtime(stderr):
+    """[(modul, dybde, selv µs, kumulativt µs)] for alt som ble importert etter Streamlit."""
+    rows, after = [], False
+    for line in stderr.splitlines():
+        parts = line[len("import time:"):].split("|")
+        if not line.startswith("import time:") or len(parts) != 3 or "self [us]" in line:
+            continue
+        self_us, cum_us, name = parts
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        module = name.strip()
+        if after:
+            rows.append((module, depth, int(self_us), int(cum_us)))
+        elif depth == 0 and module == "streamlit":
+            after = True  # alt før dette er Streamlit selv
+    return rows
+
+
+def measure_imports(python):
+    code = _IMPORTS.format(root=ROOT, imports=top_level_imports())
+    proc = subprocess.run([python, "-X", "importtime", "-c", code], capture_output=True, text=True, cwd=ROOT)
+    if proc.returncode:
+        raise SystemExit(proc.stderr[-2000:])
+    rows = parse_importtime(proc.stderr)
+    total = sum(cum for _, depth, _, cum in rows if depth == 0) / 1000
+    heavy = sorted((r for r in rows if r[1] == 0), key=lambda r: -r[3])[:10]
+    loaded = json.loads(proc.stdout.strip().splitlines()[-1])
+    lazy = sorted({m.split(".")[0] for m in loaded} & set(LAZY))
+    return total, heavy, lazy
+
+
+def measure_runs(python, reruns):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "KMAN_PRICE_SOURCE": "fake", "KMAN_DATA_DIR": tmp, "KMAN_CACHE": ""}
+        code = _RUN.format(app=APP, reruns=reruns)
+        out = []
+        for _ in range(2):  # første kjøring lager snapshotet, andre måles
+            proc = subprocess.run([python, "-c", code], capture_output=True, text=True, cwd=tmp, env=env)
+            if proc.returncode:
+                raise SystemExit(proc.stderr[-2000:])
+            out.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return out[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Oppstarts- og rerun-budsjett for app.py")
+    parser.add_argument("--python", default=sys.executable, help="tolken som kjører appen")
+    parser.add_argument("--reruns", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=300)
+    parser.add_argument("--max-first-ms", type=float, default=2000)
+    parser.add_argument("--max-rerun-ms", type=float, default=250)
+    args = parser.parse_args()
+
+    failures = []
+    total, heavy, lazy = measure_imports(args.python)
+    print(f"import          {total:8.1f} ms  (toppnivå i app.py, utover Streamlit)")
+    for module, _, _, cum in heavy:
+        print(f"  {module:<40} {cum / 1000:8.1f} ms")
+    if lazy:
+        failures.append(f"toppnivå-importene laster {', '.join(lazy)}")
+    if total > args.max_import_ms:
+        failures.append(f"import {total:.0f} ms > {args.max_import_ms:.0f} ms")
+
+    if subprocess.run([args.python, "-c", "import streamlit.testing.v1"], capture_output=True).returncode:
+        print("første_visning/rerun: hoppet over (streamlit.testing mangler)")
+    else:
+        runs = measure_runs(args.python, args.reruns)
+        first, rerun = runs["first"] * 1000, statistics.median(runs["reruns"]) * 1000
+        print(f"første_visning  {first:8.1f} ms")
+        print(f"rerun           {rerun:8.1f} ms  (median av {len(runs['reruns'])})")
+        failures += [f"app.py feilet: {e}" for e in runs["errors"]]
+        if first > args.max_first_ms:
+            failures.append(f"første visning {first:.0f} ms > {args.max_first_ms:.0f} ms")
+        if rerun > args.max_rerun_ms:
+            failures.append(f"rerun {rerun:.0f} ms > {args.max_rerun_ms:.0f} ms")
+
+    for f in failures:
+        print("OVER BUDSJETT:", f)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+"""Felles oppsett: motoren importeres fra repoet, og ingenting skrives til data/."""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("KMAN_DATA_DIR", tempfile.mkdtemp(prefix="kman-test-"))
@@ -0,0 +1,17 @@
+"""Utvalget backtesten og sweepen kjører på."""
+from engine import store as store_module
+from engine.backtest import history_frames
+from engine.prices import FakeSource
+from engine.store import PriceStore
+from engine.strength import INDEX
+
+
+def test_stored_index_is_not_traded(tmp_path, monkeypatch):
+    monkeypatch.setattr(store_module, "DATA_DIR", str(tmp_path))
+    source = FakeSource(bars=300)
+    prices = PriceStore()
+    for t in ("AAA.OL", "BBB.OL", INDEX):
+        prices.upsert(t, source.frame(t))
+
+    assert sorted(history_frames("1y")) == ["AAA.OL", "BBB.OL"]
+    assert sorted(history_frames("1y", tickers=[INDEX, "AAA.OL"])) == ["AAA.OL", INDEX]
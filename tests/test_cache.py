@@ -0,0 +1,122 @@
+"""SharedCache på MemoryBackend: versjonerte nøkler, generasjoner og single-flight-lås."""
+import threading
+import time
+
+import pytest
+
+from engine.cache import LockTimeout, MemoryBackend, SharedCache, SharedSnapshotStore, SqliteBackend
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_backend_expiry_and_nx():
+    clock = Clock()
+    backend = MemoryBackend(clock)
+    assert backend.set("a", b"1", ex=10)
+    assert not backend.set("a", b"2", nx=True)
+    assert backend.mget(["a", "b"]) == [b"1", None]
+    clock.now += 10
+    assert backend.get("a") is None
+    assert backend.set("a", b"3", nx=True)
+    assert backend.incr("n") == 1 and backend.incr("n") == 2
+    assert backend.delete("a", "n", "b") == 2
+
+
+@pytest.mark.parametrize("kind", ["memory", "sqlite"])
+def test_renewal_does_not_take_over_an_expired_lock(kind, tmp_path):
+    clock = Clock()
+    backend = MemoryBackend(clock) if kind == "memory" else SqliteBackend(str(tmp_path / "cache.sqlite"), clock)
+    assert backend.set("lock", b"a", ex=3, nx=True)
+    assert backend.expire_if("lock", b"a", 3)
+    clock.now += 3  # eieren rakk ikke å fornye
+    assert backend.set("lock", b"b", ex=3, nx=True)
+    assert not backend.expire_if("lock", b"a", 3)
+    assert not backend.delete_if("lock", b"a")
+    assert backend.get("lock") == b"b"
+    assert backend.delete_if("lock", b"b") and backend.get("lock") is None
+
+
+def test_values_roundtrip_and_expire():
+    clock = Clock()
+    cache = SharedCache(MemoryBackend(clock), "test")
+    cache.set("x", {"rows": [1, 2]}, ttl=5)
+    cache.set_many({"y": 1, "z": None})
+    assert cache.get_many(["x", "y", "missing"]) == {"x": {"rows": [1, 2]}, "y": 1, "missing": None}
+    clock.now += 5
+    assert cache.get("x") is None and cache.get("y") == 1
+
+
+def test_invalidate_and_version_separate_keys():
+    backend = MemoryBackend()
+    cache, newer = SharedCache(backend, "test"), SharedCache(backend, "test", version=2)
+    cache.set("x", "v1")
+    assert newer.get("x") is None
+    other = SharedCache(backend, "test")  # en annen replika
+    assert other.get("x") == "v1"
+    other.invalidate()
+    assert cache.get("x") is None
+    cache.set("x", "ny")
+    assert other.get("x") == "ny"
+
+
+def test_get_or_compute_runs_once_across_threads():
+    cache = SharedCache(MemoryBackend(), "test", poll=0.01)
+    calls = []
+    barrier = threading.Barrier(5)
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return 42
+
+    def worker(out):
+        barrier.wait()
+        out.append(cache.get_or_compute("svar", compute))
+
+    out = []
+    threads = [threading.Thread(target=worker, args=(out,)) for _ in range(5)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    assert out == [42] * 5 and len(calls) == 1
+
+
+def test_busy_lock_raises_instead_of_running_unlocked():
+    cache = SharedCache(MemoryBackend(), "test", poll=0.01)
+    ran = []
+    with cache.lock("jobb") as waited:
+        assert not waited
+        with pytest.raises(LockTimeout):
+            with cache.lock("jobb", timeout=0.05):
+                ran.append(1)
+    assert not ran
+    with cache.lock("jobb", timeout=0.05) as waited:  # ledig igjen
+        assert not waited
+
+
+def test_lock_is_renewed_while_held():
+    cache = SharedCache(MemoryBackend(), "test", poll=0.01)
+    with cache.lock("jobb", ttl=1):
+        time.sleep(1.5)  # lengre enn utløpstiden
+        with pytest.raises(LockTimeout):
+            with cache.lock("jobb", timeout=0.05):
+                pass
+    assert cache.backend.get("test:lock:jobb") is None
+
+
+def test_snapshot_store_shared_between_replicas():
+    backend = MemoryBackend()
+    a = SharedSnapshotStore(SharedCache(backend, "snap"), "hoved")
+    b = SharedSnapshotStore(SharedCache(backend, "snap"), "hoved")
+    assert b.latest() is None
+    snap = a.publish({"rows": 3})
+    assert b.latest().result == {"rows": 3} and b.latest().created == snap.created
+    a.cache.invalidate()
+    assert b.latest().result == {"rows": 3}
@@ -0,0 +1,117 @@
+"""AsyncLoader mot FakeSource: delvise feil, retry, timeout og rate limiting.
+
+``FakeSource.download`` står i stedet for ``yf.download`` i prosessen (ingen
+HTTP), med de samme feilformene: tomme kolonner for ukjente symboler,
+forbigående unntak (``error_rate``) og trege kall (``slow``).
+"""
+import asyncio
+import random
+import time
+
+import pytest
+
+from engine.fetch import AsyncLoader, TokenBucket, backoff
+from engine.metrics import Metrics
+from engine.prices import FakeSource, period_start
+
+TICKERS = [f"T{i}.OL" for i in range(6)]
+
+
+def loader(source, **kwargs):
+    # Uten ventetid: ingen rate limiting eller backoff med mindre testen ber om det
+    options = dict(chunk_size=3, concurrency=2, rate=1000, burst=1000, backoff_base=0, seed=0,
+                   metrics=Metrics())
+    options.update(kwargs)
+    return AsyncLoader(download=source.download, **options)
+
+
+def requests(metrics, outcome):
+    return sum(c["value"] for c in metrics.snapshot()["counters"]
+               if c["name"] == "fetch_requests" and c["outcome"] == outcome)
+
+
+def test_loads_all_tickers_in_chunks():
+    source = FakeSource()
+    result = loader(source).load(TICKERS)
+    assert sorted(result.frames) == TICKERS and not result.errors and not result.stale
+    assert source.calls == 2  # to deler à tre
+    expected = source.frame("T0.OL")
+    expected = expected[expected.index >= period_start("1y")]
+    assert result.frames["T0.OL"].equals(expected)
+
+
+def test_unknown_ticker_fails_alone_without_retry():
+    source = FakeSource(failing={"T1.OL"})
+    result = loader(source, retries=3).load(TICKERS)
+    assert result.errors == {"T1.OL": "ingen data"}
+    assert sorted(result.frames) == [t for t in TICKERS if t != "T1.OL"]
+    assert source.calls == 2  # tomme kolonner er ikke forbigående
+
+
+def test_transient_errors_are_retried():
+    source = FakeSource(error_rate=0.5, seed=1)
+    fetcher = loader(source, retries=8)
+    result = fetcher.load(TICKERS)
+    assert sorted(result.frames) == TICKERS and not result.errors
+    assert requests(fetcher.metrics, "feil") > 0
+    assert source.calls == requests(fetcher.metrics, "feil") + requests(fetcher.metrics, "ok")
+
+
+def test_failed_chunk_falls_back_to_single_tickers():
+    source = FakeSource(error_rate=1.0)
+    result = loader(source, retries=1).load(TICKERS[:3])
+    assert set(result.errors) == set(TICKERS[:3]) and not result.frames
+    assert all(r.startswith("ConnectionError: 429") for r in result.errors.values())
+    # Delen: 2 forsøk; deretter hver ticker for seg: 3 × 2 forsøk
+    assert source.calls == 2 + 3 * 2
+
+
+def test_slow_ticker_times_out_alone():
+    source = FakeSource(slow={"T4.OL"}, slow_latency=1.0)
+    fetcher = loader(source, timeout=0.2, retries=0)
+    t0 = time.perf_counter()
+    result = fetcher.load(TICKERS)
+    assert time.perf_counter() - t0 < 1.0
+    assert result.errors == {"T4.OL": "timeout etter 0.2s"}
+    assert sorted(result.frames) == [t for t in TICKERS if t != "T4.OL"]
+    assert requests(fetcher.metrics, "timeout") == 2  # delen, så tickeren alene
+
+
+def test_abandoned_calls_do_not_exhaust_the_pool():
+    source = FakeSource(slow={"SLOW.OL"}, slow_latency=1.0)
+    with loader(source, concurrency=1, timeout=0.1, retries=0) as fetcher:
+        for _ in range(3):
+            assert fetcher.load(["SLOW.OL"]).errors == {"SLOW.OL": "timeout etter 0.1s"}
+        # Tre hengende kall; en pool med to tråder ville latt dette kallet gå ut på tid også
+        result = fetcher.load(["T0.OL"])
+    assert list(result.frames) == ["T0.OL"] and not result.errors
+
+
+def test_token_bucket_limits_rate_after_burst(monkeypatch):
+    now = [0.0]
+    slept = []
+
+    async def sleep(seconds):
+        slept.append(seconds)
+        now[0] += seconds
+
+    bucket = TokenBucket(rate=2.0, burst=3, clock=lambda: now[0])
+
+    async def take(n):
+        for _ in range(n):
+            await bucket.acquire()
+
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+    asyncio.run(take(7))
+    # Tre med en gang, deretter ett kall hvert halve sekund
+    assert now[0] == pytest.approx(2.0)
+    assert slept == pytest.approx([0.5] * 4)
+
+
+def test_backoff_is_bounded_full_jitter():
+    rng = random.Random(0)
+    for attempt in range(8):
+        limit = min(10.0, 0.5 * 2 ** attempt)
+        waits = [backoff(attempt, 0.5, 10.0, rng) for _ in range(200)]
+        assert all(0 <= w <= limit for w in waits)
+        assert max(waits) > 0.8 * limit  # hele intervallet brukes, ikke bare toppen
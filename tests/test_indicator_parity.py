@@ -0,0 +1,61 @@
+"""Paritet: panel-indikatorene mot pandas_ta per ticker.
+
+Syntetiske OHLCV-serier (med ulik lengde, hull og flate bars) må gi nøyaktig
+samme verdier i ``engine.indicators`` som ``ta.rsi``, ``ta.sma``, ``ta.atr``
+og ``ta.ema`` slik fetch_and_analyze kaller dem. Hoppes over uten pandas_ta.
+"""
+import numpy as np
+import pytest
+
+from engine.indicators import compute
+from engine.panel import PricePanel
+from engine.prices import synthetic_ohlcv
+
+ta = pytest.importorskip("pandas_ta")
+
+NAMES = ("rsi", "sma20", "sma50", "atr", "ema12", "ema26")
+
+
+def reference(df):
+    return {
+        "rsi": ta.rsi(df["Close"], length=14),
+        "sma20": ta.sma(df["Close"], length=20),
+        "sma50": ta.sma(df["Close"], length=50),
+        "atr": ta.atr(df["High"], df["Low"], df["Close"], length=14),
+        "ema12": ta.ema(df["Close"], length=12),
+        "ema26": ta.ema(df["Close"], length=26),
+    }
+
+
+def frames_for(n):
+    rng = np.random.default_rng(7)
+    frames = {}
+    for i in range(n):
+        t = f"P{i:03d}.OL"
+        df = synthetic_ohlcv(t, bars=int(rng.integers(60, 400)), seed=1)
+        if i % 5 == 0:
+            # Hull: dager tickeren ikke handlet
+            df = df.drop(df.index[rng.choice(len(df) - 1, 10, replace=False)])
+        if i % 7 == 0:
+            # Flat bar (High == Low) trigger pandas_ta sin epsilon-justering
+            df.iloc[len(df) // 2, [1, 2]] = df.iloc[len(df) // 2]["Close"]
+        frames[t] = df
+    return frames
+
+
+@pytest.fixture(scope="module")
+def computed():
+    frames = frames_for(50)
+    return frames, compute(PricePanel.from_frames(frames))
+
+
+@pytest.mark.parametrize("name", NAMES)
+def test_matches_pandas_ta(computed, name):
+    frames, result = computed
+    mismatches = {}
+    for t, df in frames.items():
+        ref = reference(df)[name].to_numpy()
+        got = result[name][t].reindex(df.index).to_numpy()
+        if not np.array_equal(got, ref, equal_nan=True):
+            mismatches[t] = float(np.nanmax(np.abs(got - ref)))
+    assert not mismatches, f"{name} avviker fra pandas_ta (maks per ticker): {mismatches}"
@@ -0,0 +1,131 @@
+"""StoreLoader: inkrementell henting, hull i historikken, nye noteringer og ny justering."""
+import pandas as pd
+import pytest
+
+from engine import indicators
+from engine.panel import PricePanel
+from engine.prices import BatchLoader, FakeSource, period_start
+from engine.store import PriceStore, StoreLoader
+from engine.streaming import IncrementalIndicators
+
+TICKERS = ["AAA.OL", "BBB.OL", "CCC.OL"]
+
+
+class Recording:
+    """BatchLoader som husker hvert kall (tickere, periode, start)."""
+
+    def __init__(self, download):
+        self.inner = BatchLoader(download)
+        self.calls = []
+
+    def load(self, tickers, period="1y", interval="1d", start=None):
+        self.calls.append((sorted(tickers), period, None if start is None else pd.Timestamp(start)))
+        return self.inner.load(tickers, period=period, interval=interval, start=start)
+
+
+@pytest.fixture
+def source():
+    return FakeSource(bars=600)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PriceStore(str(tmp_path / "prices.sqlite"))
+
+
+def test_second_load_fetches_from_second_to_last_bar(source, store):
+    loader = Recording(source.download)
+    first = StoreLoader(loader, store).load(TICKERS)
+    assert loader.calls == [(TICKERS, "1y", None)]
+
+    loader.calls.clear()
+    again = StoreLoader(loader, store).load(TICKERS)
+    since = source.frame("AAA.OL").index[-2]
+    assert loader.calls == [(TICKERS, "1y", since)]
+    for t in TICKERS:
+        pd.testing.assert_frame_equal(again.frames[t], first.frames[t], check_freq=False)
+
+
+def test_longer_period_downloads_the_gap(source, store):
+    loader = Recording(source.download)
+    StoreLoader(loader, store).load(TICKERS, period="3mo")
+    loader.calls.clear()
+    result = StoreLoader(loader, store).load(TICKERS, period="2y")
+    assert loader.calls == [(TICKERS, "2y", None)]
+    assert result.frames["AAA.OL"].index[0] < period_start("1y")
+
+
+def test_recent_listing_is_not_downloaded_again(source, store):
+    listed = source.frame("CCC.OL").index[-40]
+
+    def download(*args, **kwargs):
+        raw = source.download(*args, **kwargs)
+        if ("CCC.OL", "Close") in raw.columns:
+            raw.loc[raw.index < listed, "CCC.OL"] = float("nan")  # notert for 40 bars siden
+        return raw
+
+    loader = Recording(download)
+    first = StoreLoader(loader, store).load(TICKERS)
+    assert first.frames["CCC.OL"].index[0] == listed
+    assert store.listings() == {"CCC.OL": listed}
+
+    loader.calls.clear()
+    StoreLoader(loader, store).load(TICKERS)
+    assert [start for _, _, start in loader.calls] == [source.frame("AAA.OL").index[-2]]
+
+
+def split(source, ticker):
+    """``download`` der hele historikken til ``ticker`` er justert for en splitt 2:1."""
+    def download(*args, **kwargs):
+        raw = source.download(*args, **kwargs)
+        for c in ("Open", "High", "Low", "Close"):
+            raw[(ticker, c)] /= 2
+        return raw
+    return download
+
+
+def test_readjusted_history_is_downloaded_again(source, store):
+    StoreLoader(BatchLoader(source.download), store).load(TICKERS)
+
+    loader = Recording(split(source, "BBB.OL"))
+    result = StoreLoader(loader, store).load(TICKERS)
+    assert loader.calls[-1] == (["BBB.OL"], "1y", None)
+    old = source.frame("BBB.OL")
+    old = old[old.index >= period_start("1y")]
+    pd.testing.assert_series_equal(result.frames["BBB.OL"]["Close"], old["Close"] / 2,
+                                   check_freq=False, check_names=False)
+    pd.testing.assert_series_equal(result.frames["AAA.OL"]["Close"],
+                                   source.frame("AAA.OL")["Close"].loc[old.index],
+                                   check_freq=False, check_names=False)
+
+
+def test_indicator_state_is_rebuilt_after_readjustment(source, store, tmp_path):
+    state = IncrementalIndicators(str(tmp_path / "state.sqlite"))
+    state.latest(StoreLoader(BatchLoader(source.download), store).load(TICKERS).frames)
+
+    frames = StoreLoader(BatchLoader(split(source, "BBB.OL")), store).load(TICKERS).frames
+    streamed = state.latest(frames)
+    expected = indicators.latest(PricePanel.from_frames(frames, TICKERS))
+    pd.testing.assert_frame_equal(streamed.loc[["BBB.OL"]], expected.loc[["BBB.OL"], streamed.columns],
+                                  check_dtype=False)
+
+
+def test_failed_refresh_serves_stored_bars_as_stale(source, store):
+    StoreLoader(BatchLoader(source.download), store).load(TICKERS)
+
+    def down(*args, **kwargs):
+        raise ConnectionError("nettet er nede")
+
+    result = StoreLoader(BatchLoader(down), store).load(TICKERS + ["NEW.OL"])
+    assert sorted(result.frames) == TICKERS
+    assert set(result.stale) == set(TICKERS)
+    assert result.errors == {"NEW.OL": "ConnectionError: nettet er nede"}
+
+
+def test_max_history_is_downloaded_once(source, store):
+    loader = Recording(source.download)
+    StoreLoader(loader, store).history("AAA.OL", "max")
+    loader.calls.clear()
+    df = StoreLoader(loader, store).history("AAA.OL", "max")
+    assert len(df) == 600
+    assert loader.calls == [(["AAA.OL"], "max", source.frame("AAA.OL").index[-2])]
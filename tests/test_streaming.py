@@ -0,0 +1,42 @@
+"""IncrementalIndicators delt mellom tråder (shards og flere listers oppdateringer)."""
+import threading
+
+import pandas as pd
+
+from engine import indicators
+from engine.panel import PricePanel
+from engine.prices import FakeSource
+from engine.streaming import IncrementalIndicators
+
+TICKERS = [f"T{i}.OL" for i in range(10)]
+
+
+def test_shared_state_under_concurrent_updates(tmp_path):
+    source = FakeSource(bars=300)
+    full = {t: source.frame(t) for t in TICKERS}
+    state = IncrementalIndicators(str(tmp_path / "state.sqlite"))
+    state.latest({t: df.iloc[:250] for t, df in full.items()})
+
+    errors = []
+    barrier = threading.Barrier(8)
+
+    def refresh(worker):
+        barrier.wait()
+        try:
+            # Hver "liste" ser samme tickere, med én bar mer enn forrige gang
+            for end in range(251, 300, 8):
+                state.latest({t: df.iloc[:end + worker % 4] for t, df in full.items()})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=refresh, args=(i,)) for i in range(8)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    assert not errors
+
+    streamed = state.latest(full)
+    expected = indicators.latest(PricePanel.from_frames(full, TICKERS))
+    pd.testing.assert_series_equal(streamed["bars"], expected["bars"], check_dtype=False)
+    pd.testing.assert_series_equal(streamed["sma20"], expected["sma20"], check_exact=False)